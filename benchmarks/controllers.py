@@ -0,0 +1,124 @@
+"""Measure the Python overhead per call of the hot controller queries.
+
+Each controller runs against a session that compiles its statement through
+SQLAlchemy's compiled cache for the asyncpg dialect, exactly as a real session
+does, and processes the bind parameters, but never talks to a database. The
+"warm" column is what every request pays, "cold" what a compiled cache miss
+costs on top of it.
+
+No connection is made, but importing the controllers creates the engine:
+
+Usage:
+    DATABASE_URL=postgresql+asyncpg://localhost/glacier_watch \\
+        uv run python -m benchmarks.controllers --calls 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import date
+
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+from src.controller.glacier import (
+    fetch_glacier_area,
+    fetch_glacier_details,
+    fetch_glacier_timeseries,
+    fetch_glaciers_timeseries,
+)
+from src.controller.project import fetch_project_row, fetch_projects
+from src.controller.scene import (
+    count_scenes_by_project_id,
+    fetch_scene_row,
+    fetch_scenes_by_project_id,
+)
+
+GLACIER_ID = "RGI2000-v7.0-G-08-00761"
+PROJECT_ID = "benchmark"
+START, END = date(2020, 1, 1), date(2024, 12, 31)
+
+CONTROLLERS = {
+    "fetch_projects": lambda db: fetch_projects(db),
+    "fetch_project_row": lambda db: fetch_project_row(db, PROJECT_ID),
+    "fetch_scenes_by_project_id": lambda db: fetch_scenes_by_project_id(
+        db, PROJECT_ID, 100, 0, START, END
+    ),
+    "count_scenes_by_project_id": lambda db: count_scenes_by_project_id(
+        db, PROJECT_ID, START, END
+    ),
+    "fetch_scene_row": lambda db: fetch_scene_row(db, "S2A_MSIL2A_20230801"),
+    "fetch_glacier_area": lambda db: fetch_glacier_area(db, GLACIER_ID),
+    "fetch_glacier_details": lambda db: fetch_glacier_details(db, GLACIER_ID),
+    "fetch_glacier_timeseries": lambda db: fetch_glacier_timeseries(
+        db, GLACIER_ID, START, END
+    ),
+    "fetch_glaciers_timeseries": lambda db: fetch_glaciers_timeseries(
+        db, [GLACIER_ID] * 50, START, END
+    ),
+}
+
+
+class _EmptyResult:
+    def all(self):
+        return []
+
+    def first(self):
+        return None
+
+    def scalar_one(self):
+        return 0
+
+    def scalar_one_or_none(self):
+        return None
+
+
+class CompilingSession:
+    """Stands in for an AsyncSession, up to the point of sending the query."""
+
+    def __init__(self, cache_enabled: bool = True) -> None:
+        self.dialect = asyncpg_dialect()
+        self.cache_enabled = cache_enabled
+        self.compiled_cache = {}
+
+    async def execute(self, statement, params=None):
+        if not self.cache_enabled:
+            self.compiled_cache.clear()
+
+        compiled, extracted, *_ = statement._compile_w_cache(
+            self.dialect, compiled_cache=self.compiled_cache, column_keys=[]
+        )
+        compiled.construct_params(params, extracted_parameters=extracted)
+        return _EmptyResult()
+
+
+async def us_per_call(controller, db: CompilingSession, calls: int) -> float:
+    await controller(db)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        await controller(db)
+    return (time.perf_counter() - started) / calls * 1_000_000
+
+
+async def run(calls: int) -> None:
+    print(f"{'controller':<28} {'warm us/call':>13} {'cold us/call':>13}")
+    for name, controller in CONTROLLERS.items():
+        warm = await us_per_call(controller, CompilingSession(), calls)
+        cold = await us_per_call(
+            controller, CompilingSession(cache_enabled=False), max(calls // 10, 1)
+        )
+        print(f"{name:<28} {warm:>13.1f} {cold:>13.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.getLogger("glacier_watch").setLevel(logging.WARNING)
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
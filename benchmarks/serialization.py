@@ -0,0 +1,86 @@
+"""Compare the CPU cost of the validated and the raw-geometry response paths.
+
+Two minimal apps serve the same glacier details payload through real FastAPI
+routing: one the old way (json.loads into GlacierDetailsOut, re-validated
+against response_model), one the new way (ORJSONResponse with the GeoJSON text
+embedded via orjson.Fragment).
+
+Usage:
+    uv run python -m benchmarks.serialization --vertices 20000 --requests 200
+"""
+
+import argparse
+import json
+import time
+
+import shapely
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.schemas.glacier import GlacierDetailsOut
+from src.utils.responses import ORJSONResponse, raw_json
+
+
+def make_geojson(vertices: int) -> str:
+    polygon = shapely.Point(15.0, 47.0).buffer(0.05, quad_segs=max(1, vertices // 4))
+    return shapely.to_geojson(shapely.MultiPolygon([polygon]))
+
+
+def build_apps(geometry_geojson: str) -> tuple[FastAPI, FastAPI]:
+    validated_app = FastAPI()
+    raw_app = FastAPI()
+
+    @validated_app.get("/glacier", response_model=GlacierDetailsOut)
+    async def validated_details():
+        return GlacierDetailsOut(
+            glacier_id="RGI2000-v7.0-G-08-00761",
+            name="Benchmark",
+            area_m2=1.0,
+            geometry=json.loads(geometry_geojson),
+        )
+
+    @raw_app.get("/glacier", response_model=GlacierDetailsOut)
+    async def raw_details():
+        return ORJSONResponse(
+            {
+                "glacier_id": "RGI2000-v7.0-G-08-00761",
+                "name": "Benchmark",
+                "area_m2": 1.0,
+                "geometry": raw_json(geometry_geojson),
+            }
+        )
+
+    return validated_app, raw_app
+
+
+def cpu_ms_per_request(app: FastAPI, requests: int) -> float:
+    with TestClient(app) as client:
+        client.get("/glacier")
+
+        started = time.process_time()
+        for _ in range(requests):
+            response = client.get("/glacier")
+            response.raise_for_status()
+        return (time.process_time() - started) / requests * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vertices", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    geometry_geojson = make_geojson(args.vertices)
+    validated_app, raw_app = build_apps(geometry_geojson)
+
+    validated_ms = cpu_ms_per_request(validated_app, args.requests)
+    raw_ms = cpu_ms_per_request(raw_app, args.requests)
+
+    print(f"geometry: {args.vertices} vertices, {len(geometry_geojson) / 1024:.0f} KiB")
+    print(f"validated response_model: {validated_ms:.2f} ms CPU/request")
+    print(f"raw orjson passthrough:   {raw_ms:.2f} ms CPU/request")
+    print(f"saved: {validated_ms - raw_ms:.2f} ms ({1 - raw_ms / validated_ms:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Repair invalid glacier and AOI geometries and backfill missing glacier areas.
+
+Usage:
+    uv run python -m src.commands.backfill_geometry --dry-run
+"""
+
+import argparse
+import asyncio
+
+from src.controller.geometry_backfill import (
+    GLACIER_TABLE,
+    PROJECT_TABLE,
+    backfill_geometries,
+)
+from src.controller.schema import ensure_tables
+from src.controller.snow_data import invalidate_snow_data_versions
+from src.logger import get_logger
+
+logger = get_logger("glacier_watch")
+
+TABLES = {"glaciers": GLACIER_TABLE, "projects": PROJECT_TABLE}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--only", choices=sorted(TABLES), default=None, help="Scan a single table"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=5_000, help="Rows per fetch and update"
+    )
+    parser.add_argument(
+        "--recompute-areas",
+        action="store_true",
+        help="Recompute every glacier area, not only the missing ones",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report changes without writing them"
+    )
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> None:
+    names = [args.only] if args.only else list(TABLES)
+
+    for name in names:
+        stats = await backfill_geometries(
+            TABLES[name],
+            chunk_size=args.chunk_size,
+            recompute_areas=args.recompute_areas,
+            dry_run=args.dry_run,
+        )
+        logger.info(
+            f"Finished {name}{' (dry run)' if args.dry_run else ''}: "
+            f"{stats.scanned} scanned, {stats.repaired} repaired, "
+            f"{stats.unrepairable} unrepairable, {stats.areas_filled} areas filled "
+            f"in {stats.seconds:.1f}s ({stats.rate:.0f} rows/s)"
+        )
+
+        if name == "glaciers" and stats.areas_filled and not args.dry_run:
+            # cached snow matrices hold snow area fractions of the old areas
+            await ensure_tables()
+            await invalidate_snow_data_versions()
+
+
+def main() -> None:
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
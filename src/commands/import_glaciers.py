@@ -0,0 +1,61 @@
+"""Import RGI glacier outlines into the glacier table.
+
+Usage:
+    uv run python -m src.commands.import_glaciers RGI2000-v7.0-G-08_central_europe.shp
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+from src.controller.glacier_import import import_glaciers
+from src.controller.schema import ensure_tables
+from src.controller.snow_data import invalidate_snow_data_versions
+from src.logger import get_logger
+
+logger = get_logger("glacier_watch")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "path", type=Path, help="GeoJSON, GeoPackage or shapefile with outlines"
+    )
+    parser.add_argument("--layer", default=None, help="Layer to read from the file")
+    parser.add_argument(
+        "--id-field", default="rgi_id", help="Attribute holding the glacier id"
+    )
+    parser.add_argument(
+        "--name-field", default="glac_name", help="Attribute holding the glacier name"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=10_000, help="Features per COPY batch"
+    )
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> None:
+    stats = await import_glaciers(
+        args.path,
+        id_field=args.id_field,
+        name_field=args.name_field or None,
+        layer=args.layer,
+        batch_size=args.batch_size,
+    )
+    if stats.written:
+        # cached snow matrices hold snow area fractions of the old areas
+        await ensure_tables()
+        await invalidate_snow_data_versions()
+
+    logger.info(
+        f"Finished importing {args.path}: {stats.written} written, "
+        f"{stats.skipped} skipped in {stats.seconds:.1f}s ({stats.rate:.0f} features/s)"
+    )
+
+
+def main() -> None:
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
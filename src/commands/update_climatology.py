@@ -0,0 +1,53 @@
+"""Apply new snow data to the current snow data and the day-of-year climatology.
+
+Usage:
+    uv run python -m src.commands.update_climatology --rebuild
+"""
+
+import argparse
+import asyncio
+
+from src.controller.schema import ensure_tables
+from src.controller.snow_data import (
+    UPDATE_BATCH_SIZE,
+    reset_climatology,
+    update_snow_data,
+)
+from src.logger import get_logger
+
+logger = get_logger("glacier_watch")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=UPDATE_BATCH_SIZE,
+        help="Snow data rows per transaction",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Drop the aggregates, rebuild them from the current snow data",
+    )
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> None:
+    await ensure_tables()
+
+    if args.rebuild:
+        logger.info("Dropping the climatology aggregates")
+        await reset_climatology()
+
+    read = await update_snow_data(batch_size=args.batch_size)
+    logger.info(f"Snow data is up to date, {read} rows read")
+
+
+def main() -> None:
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
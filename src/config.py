@@ -1,5 +1,5 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -9,12 +9,141 @@ load_dotenv()
 CRS = "EPSG:32633"
 
 
+def _parse_mapping(value: str) -> dict[str, str]:
+    """Parse "key=value,key=value" settings, keys may contain spaces."""
+    mapping = {}
+    for item in value.split(","):
+        key, sep, item_value = item.partition("=")
+        if sep and key.strip():
+            mapping[key.strip()] = item_value.strip()
+    return mapping
+
+
 @dataclass
 class Config:
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./glacier_watch.db")
     api_key: str = os.getenv("API_KEY", "default_api_key")
 
+    database_replica_urls: list[str] = field(
+        default_factory=lambda: [
+            url.strip()
+            for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+            if url.strip()
+        ]
+    )
+    replica_health_interval_seconds: int = int(
+        os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", "10")
+    )
+    replica_max_lag_seconds: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+    read_your_writes_seconds: int = int(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # prepared statements asyncpg keeps per connection, 0 disables the cache
+    db_prepared_statement_cache_size: int = int(
+        os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "500")
+    )
+    # requests waiting longer than this for a database connection get a 503
+    admission_timeout_seconds: float = float(
+        os.getenv("ADMISSION_TIMEOUT_SECONDS", "2")
+    )
+    admission_max_queue: int = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+    # by route name, e.g. "Get project snow matrix=2"
+    route_concurrency_limits: dict[str, int] = field(
+        default_factory=lambda: {
+            name: int(limit)
+            for name, limit in _parse_mapping(
+                os.getenv("ROUTE_CONCURRENCY_LIMITS", "")
+            ).items()
+        }
+    )
+    # write, read or bulk by route name; write sessions always use write
+    route_priorities: dict[str, str] = field(
+        default_factory=lambda: _parse_mapping(
+            os.getenv(
+                "ROUTE_PRIORITIES",
+                "Get project snow matrix=bulk,Get project glacier geometries=bulk,"
+                "Export project data=bulk",
+            )
+        )
+    )
+
+    warmup_on_startup: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
     data_folder_path: Path = Path(os.getenv("DATA_FOLDER_PATH", "./data")).resolve()
+    # hidden, so it cannot collide with a project folder (data/<project_id>)
+    cache_folder_path: Path = Path(
+        os.getenv(
+            "CACHE_FOLDER_PATH",
+            os.path.join(os.getenv("DATA_FOLDER_PATH", "./data"), ".cache"),
+        )
+    ).resolve()
+
+    geojson_max_decimal_digits: int = int(os.getenv("GEOJSON_MAX_DECIMAL_DIGITS", "6"))
+
+    compression_minimum_size: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    compression_cache_mb: int = int(os.getenv("COMPRESSION_CACHE_MB", "64"))
+
+    glacier_index_refresh_seconds: int = int(
+        os.getenv("GLACIER_INDEX_REFRESH_SECONDS", "60")
+    )
+
+    snow_matrix_cache_size: int = int(os.getenv("SNOW_MATRIX_CACHE_SIZE", "64"))
+
+    # resampled timeseries requests above these get a 400: grid cells per
+    # series, and series x grid cells x smoothing window over the request
+    timeseries_max_grid_cells: int = int(
+        os.getenv("TIMESERIES_MAX_GRID_CELLS", "36600")
+    )
+    timeseries_max_window_values: int = int(
+        os.getenv("TIMESERIES_MAX_WINDOW_VALUES", "20000000")
+    )
+
+    # how long new or deleted snow data takes to show up in the routes reading
+    # the current snow data; the updater always runs, at least every second
+    snow_data_update_interval_seconds: int = int(
+        os.getenv("SNOW_DATA_UPDATE_INTERVAL_SECONDS", "60")
+    )
+    # how late the pipeline may commit a snow data row after creating it; the
+    # updater reads that far back behind the rows it already applied
+    snow_data_commit_lag_seconds: int = int(
+        os.getenv("SNOW_DATA_COMMIT_LAG_SECONDS", "600")
+    )
+    # the climatology is updated along with the current snow data
+    climatology_enabled: bool = (
+        os.getenv("CLIMATOLOGY_ENABLED", "true").lower() == "true"
+    )
+    climatology_window_days: int = int(os.getenv("CLIMATOLOGY_WINDOW_DAYS", "7"))
+    hydrological_year_start_month: int = int(
+        os.getenv("HYDROLOGICAL_YEAR_START_MONTH", "10")
+    )
+
+    # 0 disables the limit; both are checked every RAW_EVICTION_INTERVAL_SECONDS
+    raw_project_quota_gb: float = float(os.getenv("RAW_PROJECT_QUOTA_GB", "0"))
+    raw_min_free_gb: float = float(os.getenv("RAW_MIN_FREE_GB", "0"))
+    raw_eviction_interval_seconds: int = int(
+        os.getenv("RAW_EVICTION_INTERVAL_SECONDS", "600")
+    )
+
+    deletion_workers: int = int(os.getenv("DELETION_WORKERS", "2"))
+
+    profile_sample_interval_ms: float = float(
+        os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "1")
+    )
+
+    tile_size: int = int(os.getenv("TILE_SIZE", "256"))
+    tile_max_age_seconds: int = int(os.getenv("TILE_MAX_AGE_SECONDS", "3600"))
+    # least recently used tiles are removed once the tile cache is larger
+    tile_cache_max_mb: int = int(os.getenv("TILE_CACHE_MAX_MB", "2048"))
+    tile_cache_prune_interval_seconds: int = int(
+        os.getenv("TILE_CACHE_PRUNE_INTERVAL_SECONDS", "600")
+    )
+
+    preview_size: int = int(os.getenv("PREVIEW_SIZE", "256"))
+    preview_workers: int = int(os.getenv("PREVIEW_WORKERS", "2"))
+    preview_scan_interval_seconds: int = int(
+        os.getenv("PREVIEW_SCAN_INTERVAL_SECONDS", "60")
+    )
 
 
 config = Config()
@@ -0,0 +1,376 @@
+import enum
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, exists, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import config
+from src.logger import get_logger
+from src.models import Glacier, GlacierClimatology, GlacierSnowDataCurrent
+
+logger = get_logger("glacier_watch")
+
+# keeps a multi-row upsert well below the 32767 bind parameter limit
+_UPSERT_CHUNK_ROWS = 2000
+
+DAYS_IN_YEAR = 366
+
+
+class ClimatologyMetric(str, enum.Enum):
+    snow_area_fraction = "snow_area_fraction"
+    snowline_elevation_m = "snowline_elevation_m"
+
+
+@dataclass(frozen=True)
+class HistogramBins:
+    lower: float
+    upper: float
+    count: int
+
+    @property
+    def width(self) -> float:
+        return (self.upper - self.lower) / self.count
+
+    def index(self, values: np.ndarray) -> np.ndarray:
+        """Bin of each value; values outside the range go to the edge bins."""
+        bins = np.floor((values - self.lower) / self.width).astype("int64")
+        return np.clip(bins, 0, self.count - 1)
+
+
+BINS = {
+    ClimatologyMetric.snow_area_fraction: HistogramBins(0.0, 1.0, 50),
+    ClimatologyMetric.snowline_elevation_m: HistogramBins(0.0, 6000.0, 120),
+}
+
+
+@dataclass
+class Climatology:
+    """Per day-of-year aggregates of one glacier metric, indexed by day 1-366."""
+
+    metric: ClimatologyMetric
+    counts: np.ndarray
+    sums: np.ndarray
+    sums_sq: np.ndarray
+    histograms: np.ndarray
+
+    def windowed(self, window_days: int) -> "Climatology":
+        """Aggregates over +-window_days around each day, wrapping at year end."""
+        days = slice(1, DAYS_IN_YEAR + 1)
+        arrays = [self.counts, self.sums, self.sums_sq, self.histograms]
+        summed = [np.zeros_like(array[days]) for array in arrays]
+        for shift in range(-window_days, window_days + 1):
+            for total, array in zip(summed, arrays):
+                total += np.roll(array[days], shift, axis=0)
+
+        padded = [np.concatenate([np.zeros_like(total[:1]), total]) for total in summed]
+        return Climatology(self.metric, *padded)
+
+
+def _metric_values(
+    snow_area_m2: np.ndarray, area_m2: np.ndarray, snowline_elevation_m: np.ndarray
+) -> dict[ClimatologyMetric, np.ndarray]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(area_m2 > 0, snow_area_m2 / area_m2, np.nan)
+    return {
+        ClimatologyMetric.snow_area_fraction: fraction,
+        ClimatologyMetric.snowline_elevation_m: snowline_elevation_m,
+    }
+
+
+def compute_increments(rows, weights=None) -> list[dict]:
+    """Aggregate (glacier_id, day_of_year, snow_area_m2, area_m2, snowline) rows.
+
+    Args:
+        rows: The observations
+        weights: 1 to add, -1 to remove each observation; all 1 if None
+
+    Returns:
+        list[dict]: One glacier_climatology row per glacier, metric and day, to
+            be added to the stored aggregates
+    """
+    if not rows:
+        return []
+
+    glacier_ids, days, snow_area_m2, area_m2, snowline = zip(*rows)
+    glacier_axis, glacier_index = np.unique(
+        np.asarray(glacier_ids, dtype=object), return_inverse=True
+    )
+    days = np.asarray(days, dtype="int64")
+    weights = (
+        np.ones(len(rows), dtype="int64")
+        if weights is None
+        else np.asarray(weights, dtype="int64")
+    )
+    metrics = _metric_values(
+        np.asarray(snow_area_m2, dtype="float64"),
+        np.asarray(area_m2, dtype="float64"),
+        np.asarray(snowline, dtype="float64"),
+    )
+
+    increments = []
+    for metric, values in metrics.items():
+        valid = ~np.isnan(values)
+        if not valid.any():
+            continue
+
+        keys = glacier_index[valid] * (DAYS_IN_YEAR + 1) + days[valid]
+        group_keys, group_index = np.unique(keys, return_inverse=True)
+        metric_values = values[valid]
+        metric_weights = weights[valid]
+
+        counts = np.bincount(group_index, weights=metric_weights).astype("int64")
+        sums = np.bincount(group_index, weights=metric_weights * metric_values)
+        sums_sq = np.bincount(group_index, weights=metric_weights * metric_values**2)
+
+        bins = BINS[metric]
+        histograms = np.zeros((len(group_keys), bins.count), dtype="int64")
+        np.add.at(histograms, (group_index, bins.index(metric_values)), metric_weights)
+
+        for key, count, value_sum, value_sum_sq, histogram in zip(
+            group_keys, counts, sums, sums_sq, histograms
+        ):
+            increments.append(
+                {
+                    "glacier_id": glacier_axis[key // (DAYS_IN_YEAR + 1)],
+                    "metric": metric.value,
+                    "day_of_year": int(key % (DAYS_IN_YEAR + 1)),
+                    "sample_count": int(count),
+                    "value_sum": float(value_sum),
+                    "value_sum_sq": float(value_sum_sq),
+                    "histogram": histogram.tolist(),
+                }
+            )
+
+    return increments
+
+
+async def _add_increments(db: AsyncSession, increments: list[dict]) -> None:
+    stmt = insert(GlacierClimatology).values(increments)
+    table = GlacierClimatology.__tablename__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["glacier_id", "metric", "day_of_year"],
+        set_={
+            "sample_count": GlacierClimatology.sample_count
+            + stmt.excluded.sample_count,
+            "value_sum": GlacierClimatology.value_sum + stmt.excluded.value_sum,
+            "value_sum_sq": GlacierClimatology.value_sum_sq
+            + stmt.excluded.value_sum_sq,
+            # element-wise sum of the stored and the new histogram
+            "histogram": literal_column(
+                "(SELECT array_agg(stored + added ORDER BY bin) FROM unnest("
+                f"{table}.histogram, excluded.histogram"
+                ") WITH ORDINALITY AS bins(stored, added, bin))"
+            ),
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+
+# rows per increment computation when rebuilding from the current snow data
+_REBUILD_BATCH_ROWS = 10_000
+
+_CURRENT_OBSERVATIONS = (
+    select(
+        GlacierSnowDataCurrent.glacier_id,
+        GlacierSnowDataCurrent.acquisition_date,
+        GlacierSnowDataCurrent.snow_area_m2,
+        Glacier.area_m2,
+        GlacierSnowDataCurrent.snowline_elevation_m,
+    )
+    .join(Glacier, GlacierSnowDataCurrent.glacier_id == Glacier.glacier_id)
+    .where(GlacierSnowDataCurrent.acquisition_date.is_not(None))
+)
+
+
+async def add_to_climatology(db: AsyncSession, added: list, removed: list) -> None:
+    """Add snow data that became current and remove the rows no longer current.
+
+    Both are rows of glacier_snow_data_current with the glacier's area_m2, as
+    the snow data updater returns them, so a re-analysis replaces the scene's
+    earlier values in the aggregates and deleted snow data is taken out.
+    """
+    rows, weights = [], []
+    for weight, snow_data in ((1, added), (-1, removed)):
+        for row in snow_data:
+            if row.acquisition_date is None:
+                continue
+            rows.append(
+                (
+                    row.glacier_id,
+                    row.acquisition_date.timetuple().tm_yday,
+                    row.snow_area_m2,
+                    row.area_m2,
+                    row.snowline_elevation_m,
+                )
+            )
+            weights.append(weight)
+
+    increments = compute_increments(rows, weights)
+    for offset in range(0, len(increments), _UPSERT_CHUNK_ROWS):
+        await _add_increments(db, increments[offset : offset + _UPSERT_CHUNK_ROWS])
+
+
+async def clear_climatology(db: AsyncSession) -> None:
+    await db.execute(delete(GlacierClimatology))
+
+
+async def rebuild_climatology(db: AsyncSession) -> None:
+    """Aggregate all current snow data into the emptied climatology."""
+    result = await db.stream(
+        _CURRENT_OBSERVATIONS.execution_options(yield_per=_REBUILD_BATCH_ROWS)
+    )
+    async for rows in result.partitions(_REBUILD_BATCH_ROWS):
+        await add_to_climatology(db, rows, [])
+
+
+async def sync_climatology(db: AsyncSession) -> None:
+    """Bring the aggregates in line with the current snow data, if they are not.
+
+    Disabled, the climatology is dropped, as it would miss the snow data
+    applied in the meantime; enabled again, it is rebuilt from the current
+    snow data. Must run under the snow data updater's lock.
+    """
+    has_climatology = await db.scalar(select(exists().select_from(GlacierClimatology)))
+    if not config.climatology_enabled:
+        if has_climatology:
+            logger.info("Climatology is disabled, dropping the aggregates")
+            await clear_climatology(db)
+        return
+
+    if not has_climatology and await db.scalar(
+        select(exists().select_from(GlacierSnowDataCurrent))
+    ):
+        logger.info("Rebuilding the climatology from the current snow data")
+        await rebuild_climatology(db)
+
+
+async def fetch_climatology(
+    db: AsyncSession, glacier_id: str, metric: ClimatologyMetric
+) -> Climatology:
+    rows = await db.execute(
+        select(
+            GlacierClimatology.day_of_year,
+            GlacierClimatology.sample_count,
+            GlacierClimatology.value_sum,
+            GlacierClimatology.value_sum_sq,
+            GlacierClimatology.histogram,
+        ).where(
+            GlacierClimatology.glacier_id == glacier_id,
+            GlacierClimatology.metric == metric.value,
+        )
+    )
+
+    size = DAYS_IN_YEAR + 1
+    climatology = Climatology(
+        metric,
+        counts=np.zeros(size, dtype="int64"),
+        sums=np.zeros(size),
+        sums_sq=np.zeros(size),
+        histograms=np.zeros((size, BINS[metric].count), dtype="int64"),
+    )
+    for day, count, value_sum, value_sum_sq, histogram in rows:
+        climatology.counts[day] = count
+        climatology.sums[day] = value_sum
+        climatology.sums_sq[day] = value_sum_sq
+        climatology.histograms[day] = histogram
+
+    return climatology
+
+
+def histogram_quantiles(
+    histogram: np.ndarray, bins: HistogramBins, quantiles: list[float]
+) -> list[Optional[float]]:
+    """Quantiles of binned values, interpolated linearly within a bin."""
+    total = histogram.sum()
+    if total == 0:
+        return [None] * len(quantiles)
+
+    cumulative = np.cumsum(histogram)
+    results = []
+    for quantile in quantiles:
+        target = quantile * total
+        bin_index = min(int(np.searchsorted(cumulative, target)), bins.count - 1)
+        before = cumulative[bin_index - 1] if bin_index else 0
+        in_bin = histogram[bin_index]
+        fraction = (target - before) / in_bin if in_bin else 0.0
+        results.append(float(bins.lower + bins.width * (bin_index + fraction)))
+    return results
+
+
+def histogram_rank(histogram: np.ndarray, bins: HistogramBins, value: float) -> float:
+    """Fraction of the binned values below a value, between 0 and 1."""
+    total = histogram.sum()
+    bin_index = int(bins.index(np.array([value]))[0])
+    before = histogram[:bin_index].sum()
+    fraction = (value - bins.lower) / bins.width - bin_index
+    within = histogram[bin_index] * min(max(fraction, 0.0), 1.0)
+    return float((before + within) / total)
+
+
+def season_bounds(season: int) -> tuple[date, date]:
+    """First and last day of a hydrological year, named after the year it ends in."""
+    start_month = config.hydrological_year_start_month
+    first_day = date(season - 1 if start_month > 1 else season, start_month, 1)
+    next_first_day = date(first_day.year + 1, start_month, 1)
+    return first_day, next_first_day - timedelta(days=1)
+
+
+def current_season(today: date) -> int:
+    start_month = config.hydrological_year_start_month
+    if start_month > 1 and today.month >= start_month:
+        return today.year + 1
+    return today.year
+
+
+def compare_to_climatology(
+    climatology: Climatology, observations: list[tuple[date, float]]
+) -> list[dict]:
+    """Put each observation of a season in the context of its day of year."""
+    windowed = climatology.windowed(config.climatology_window_days)
+    bins = BINS[climatology.metric]
+
+    points = []
+    for acquisition_date, value in observations:
+        day = acquisition_date.timetuple().tm_yday
+        count = int(windowed.counts[day])
+
+        point = {
+            "acquisition_date": acquisition_date,
+            "value": value,
+            "climatology_count": count,
+            "mean": None,
+            "std": None,
+            "p10": None,
+            "p50": None,
+            "p90": None,
+            "anomaly": None,
+            "percentile_rank": None,
+        }
+        if count:
+            mean = float(windowed.sums[day] / count)
+            variance = max(float(windowed.sums_sq[day] / count) - mean**2, 0.0)
+            p10, p50, p90 = histogram_quantiles(
+                windowed.histograms[day], bins, [0.1, 0.5, 0.9]
+            )
+            point.update(
+                mean=mean,
+                std=variance**0.5,
+                p10=p10,
+                p50=p50,
+                p90=p90,
+            )
+            if value is not None:
+                point.update(
+                    anomaly=value - mean,
+                    percentile_rank=histogram_rank(
+                        windowed.histograms[day], bins, value
+                    ),
+                )
+        points.append(point)
+
+    return points
@@ -1,4 +1,7 @@
 from pathlib import Path
+from typing import Optional
+
+from src.config import config
 
 
 def get_folder_contents(folder_path: Path):
@@ -17,3 +20,27 @@ def bytes_to_readable(size_in_bytes: int) -> str:
             return f"{size_in_bytes:.2f} {unit}"
         size_in_bytes /= 1024
     return f"{size_in_bytes:.2f} PB"
+
+
+def resolve_result_file(
+    project_id: str, folder_name: str, file_name: str
+) -> Optional[Path]:
+    """Resolve a result file path, or None if it escapes the result folder."""
+    base_dir = (config.data_folder_path / "result").resolve()
+    file_path = (base_dir / project_id / folder_name / file_name).resolve()
+
+    if base_dir not in file_path.parents:
+        return None
+
+    return file_path
+
+
+def resolve_raw_folder(project_id: str, folder_name: str) -> Optional[Path]:
+    """Resolve a raw scene folder, or None if it escapes the project folders."""
+    base_dir = (config.data_folder_path / "raw").resolve()
+    folder_path = (base_dir / project_id / folder_name).resolve()
+
+    if folder_path.parent.parent != base_dir:
+        return None
+
+    return folder_path
@@ -0,0 +1,195 @@
+import enum
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from src.config import config
+from src.logger import get_logger
+
+logger = get_logger("glacier_watch")
+
+# finished jobs are forgotten oldest first once there are more than this many
+MAX_FINISHED_JOBS = 500
+
+
+def trash_folder_path() -> Path:
+    # inside the data folder, so moving a folder there is a rename on the same
+    # filesystem
+    return config.data_folder_path / ".trash"
+
+
+class DeletionJobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    finished = "finished"
+    failed = "failed"
+
+
+@dataclass
+class DeletionJob:
+    job_id: str
+    folders: list[str]
+    status: DeletionJobStatus = DeletionJobStatus.queued
+    bytes_removed: int = 0
+    files_removed: int = 0
+    errors: list[str] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    _trash_paths: list[Path] = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "folders": self.folders,
+            "bytes_removed": self.bytes_removed,
+            "files_removed": self.files_removed,
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class DeletionQueue:
+    """Deletes folders on a bounded thread pool.
+
+    Folders are first renamed into the trash folder, which is atomic and
+    instant, so they disappear from listings and usage scans as soon as the
+    job is submitted. Whatever is left in the trash after a restart is
+    deleted again by resume().
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="deletion"
+        )
+        self._jobs: OrderedDict[str, DeletionJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[DeletionJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[DeletionJob]:
+        return list(self._jobs.values())
+
+    def _add(self, job: DeletionJob) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            finished = [
+                job_id
+                for job_id, existing in self._jobs.items()
+                if existing.finished_at is not None
+            ]
+            for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self._jobs[job_id]
+
+    def submit(self, folders: list[Path]) -> DeletionJob:
+        """Move the folders to the trash and queue their deletion.
+
+        Folders that cannot be moved are reported in the job's errors.
+        """
+        job = DeletionJob(
+            job_id=uuid.uuid4().hex,
+            folders=[
+                str(folder.relative_to(config.data_folder_path)) for folder in folders
+            ],
+        )
+        trash = trash_folder_path()
+        trash.mkdir(parents=True, exist_ok=True)
+
+        for index, folder in enumerate(folders):
+            trash_path = trash / f"{job.job_id}-{index}-{folder.name}"
+            try:
+                folder.rename(trash_path)
+                job._trash_paths.append(trash_path)
+            except OSError as e:
+                job.errors.append(f"{job.folders[index]}: {e}")
+
+        self._add(job)
+        self.executor.submit(self._run, job)
+        return job
+
+    def _delete_tree(self, job: DeletionJob, path: Path) -> None:
+        if path.is_symlink() or path.is_file():
+            size = path.lstat().st_size
+            path.unlink()
+            job.bytes_removed += size
+            job.files_removed += 1
+            return
+
+        for root, dirs, files in os.walk(path, topdown=False):
+            for name in files:
+                file_path = os.path.join(root, name)
+                try:
+                    size = os.lstat(file_path).st_size
+                    os.unlink(file_path)
+                except OSError as e:
+                    job.errors.append(f"{file_path}: {e}")
+                    continue
+                job.bytes_removed += size
+                job.files_removed += 1
+            for name in dirs:
+                dir_path = os.path.join(root, name)
+                try:
+                    if os.path.islink(dir_path):
+                        os.unlink(dir_path)
+                    else:
+                        os.rmdir(dir_path)
+                except OSError as e:
+                    job.errors.append(f"{dir_path}: {e}")
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            job.errors.append(f"{path}: {e}")
+
+    def _run(self, job: DeletionJob) -> None:
+        job.status = DeletionJobStatus.running
+        try:
+            for trash_path in job._trash_paths:
+                self._delete_tree(job, trash_path)
+        except Exception as e:
+            job.errors.append(str(e))
+        finally:
+            job.status = (
+                DeletionJobStatus.failed if job.errors else DeletionJobStatus.finished
+            )
+            job.finished_at = datetime.now()
+            logger.info(
+                f"Deletion job {job.job_id} {job.status.value}: removed "
+                f"{job.files_removed} files, {job.bytes_removed} bytes"
+            )
+
+    def resume(self) -> Optional[DeletionJob]:
+        """Queue the deletion of folders left in the trash by a previous run."""
+        trash = trash_folder_path()
+        if not trash.is_dir():
+            return None
+
+        leftovers = list(trash.iterdir())
+        if not leftovers:
+            return None
+
+        job = DeletionJob(
+            job_id=uuid.uuid4().hex,
+            folders=[
+                str(path.relative_to(config.data_folder_path)) for path in leftovers
+            ],
+        )
+        job._trash_paths = leftovers
+        self._add(job)
+        self.executor.submit(self._run, job)
+        logger.info(f"Resuming deletion of {len(leftovers)} folders left in the trash")
+        return job
+
+    def shutdown(self) -> None:
+        # unfinished deletions stay in the trash and are resumed on startup
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+deletion_queue = DeletionQueue(config.deletion_workers)
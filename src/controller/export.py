@@ -0,0 +1,362 @@
+import asyncio
+import enum
+import json
+import shutil
+import tempfile
+import time
+import zipfile
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Select, String, func, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import config
+from src.controller.snow_data import snow_data_source
+from src.logger import get_logger
+from src.models import Glacier, Project, Scene
+
+logger = get_logger("glacier_watch")
+
+# rows per parquet row group, and per fetch from the server-side cursor
+EXPORT_BATCH_ROWS = 10_000
+# glacier outlines can be large, so fewer per batch
+GLACIER_BATCH_ROWS = 1_000
+# reads from the FlatGeobuf file per chunk sent
+COPY_CHUNK_BYTES = 1024 * 1024
+# temporary files older than this belong to an export that did not finish
+STALE_EXPORT_SECONDS = 3600
+
+
+class ExportFormat(str, enum.Enum):
+    parquet = "parquet"
+    fgb = "fgb"
+
+
+GEOPARQUET_METADATA = {
+    "version": "1.1.0",
+    "primary_column": "geometry",
+    # without a crs, GeoParquet readers assume OGC:CRS84, the lon/lat order of
+    # the stored EPSG:4326 geometries
+    "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["MultiPolygon"]}},
+}
+
+GLACIER_SCHEMA = pa.schema(
+    [
+        ("glacier_id", pa.string()),
+        ("name", pa.string()),
+        ("area_m2", pa.float64()),
+        ("geometry", pa.binary()),
+    ],
+    metadata={"geo": json.dumps(GEOPARQUET_METADATA)},
+)
+
+SCENE_SCHEMA = pa.schema(
+    [
+        ("scene_id", pa.string()),
+        ("acquisition_date", pa.timestamp("us")),
+        ("status", pa.string()),
+        ("stac_href", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("updated_at", pa.timestamp("us")),
+    ]
+)
+
+SNOW_DATA_SCHEMA = pa.schema(
+    [
+        ("glacier_id", pa.string()),
+        ("scene_id", pa.string()),
+        ("acquisition_date", pa.timestamp("us")),
+        ("analysis_id", pa.string()),
+        ("snow_area_m2", pa.int64()),
+        ("snowline_elevation_m", pa.int64()),
+        ("analyzed_at", pa.timestamp("us")),
+    ]
+)
+
+
+def _glaciers_select(project_id: str) -> Select:
+    return (
+        select(
+            Glacier.glacier_id,
+            Glacier.name,
+            Glacier.area_m2,
+            func.ST_AsBinary(Glacier.geometry),
+        )
+        .join(Project, func.ST_Within(Glacier.geometry, Project.area_of_interest))
+        .where(Project.project_id == project_id)
+        .order_by(Glacier.glacier_id)
+    )
+
+
+def _scenes_select(project_id: str) -> Select:
+    return (
+        select(
+            Scene.scene_id,
+            Scene.acquisition_date,
+            type_coerce(Scene.status, String),
+            Scene.stac_href,
+            Scene.created_at,
+            Scene.updated_at,
+        )
+        .where(Scene.project_id == project_id)
+        .order_by(Scene.acquisition_date, Scene.scene_id)
+    )
+
+
+def _snow_data_select(source, project_id: str) -> Select:
+    """The latest analysis of every glacier in every scene of the project."""
+    return (
+        select(
+            source.glacier_id,
+            source.scene_id,
+            source.acquisition_date,
+            source.analysis_id,
+            source.snow_area_m2,
+            source.snowline_elevation_m,
+            source.analyzed_at,
+        )
+        .where(source.project_id == project_id)
+        .order_by(source.glacier_id, source.acquisition_date)
+    )
+
+
+async def iter_parquet(
+    db: AsyncSession, statement: Select, schema: pa.Schema, sink, batch_rows: int
+) -> AsyncIterator[int]:
+    """Stream a query's rows into a parquet file, one row group per batch.
+
+    Rows come from a server-side cursor, so at most one batch is in memory.
+
+    Yields:
+        int: The rows of every row group once it is written
+    """
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        result = await db.stream(statement.execution_options(yield_per=batch_rows))
+        async for rows in result.partitions(batch_rows):
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [
+                    pa.array(column, type=field.type)
+                    for column, field in zip(columns, schema)
+                ],
+                schema=schema,
+            )
+            await asyncio.to_thread(writer.write_table, table)
+            yield len(rows)
+    finally:
+        await asyncio.to_thread(writer.close)
+
+
+async def write_parquet(
+    db: AsyncSession, statement: Select, schema: pa.Schema, sink, batch_rows: int
+) -> int:
+    """Write a query's rows into a parquet file, see iter_parquet.
+
+    Returns:
+        int: The number of rows written
+    """
+    rows_written = 0
+    async with aclosing(
+        iter_parquet(db, statement, schema, sink, batch_rows)
+    ) as batches:
+        async for rows in batches:
+            rows_written += rows
+    return rows_written
+
+
+def geoparquet_to_flatgeobuf(parquet_path: Path, fgb_path: Path) -> None:
+    """Convert batch by batch; GDAL spools the features to build the index."""
+    from pyogrio import write_arrow
+
+    parquet_file = pq.ParquetFile(parquet_path)
+    reader = pa.RecordBatchReader.from_batches(
+        parquet_file.schema_arrow, parquet_file.iter_batches()
+    )
+    write_arrow(
+        reader,
+        fgb_path,
+        driver="FlatGeobuf",
+        layer="glaciers",
+        geometry_name="geometry",
+        geometry_type="MultiPolygon",
+        crs="EPSG:4326",
+        SPATIAL_INDEX="YES",
+    )
+
+
+class _ZipStream:
+    """Write-only file for the zip writer, drained chunk by chunk into the response.
+
+    It cannot seek, so zipfile writes the sizes after every entry instead of
+    going back to its header.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _write_parquet_entry(
+    bundle: zipfile.ZipFile,
+    name: str,
+    db: AsyncSession,
+    statement: Select,
+    schema: pa.Schema,
+    batch_rows: int,
+) -> AsyncIterator[int]:
+    # parquet is already compressed, the zip only stores it
+    entry = bundle.open(name, "w", force_zip64=True)
+    try:
+        async with aclosing(
+            iter_parquet(
+                db, statement, schema, pa.PythonFile(entry, mode="w"), batch_rows
+            )
+        ) as batches:
+            async for rows in batches:
+                yield rows
+    finally:
+        await asyncio.to_thread(entry.close)
+
+
+async def _write_flatgeobuf_entry(
+    bundle: zipfile.ZipFile, db: AsyncSession, project_id: str
+) -> AsyncIterator[int]:
+    # GDAL needs all outlines to build the spatial index, so they go through
+    # temporary files before they are copied into the zip
+    export_dir = config.cache_folder_path / "exports"
+    export_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=export_dir, prefix=f".{project_id}-") as tmp:
+        parquet_path = Path(tmp) / "glaciers.parquet"
+        fgb_path = Path(tmp) / "glaciers.fgb"
+        rows = await write_parquet(
+            db,
+            _glaciers_select(project_id),
+            GLACIER_SCHEMA,
+            str(parquet_path),
+            GLACIER_BATCH_ROWS,
+        )
+        await asyncio.to_thread(geoparquet_to_flatgeobuf, parquet_path, fgb_path)
+
+        info = zipfile.ZipInfo("glaciers.fgb", datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with (
+            open(fgb_path, "rb") as source,
+            bundle.open(info, "w", force_zip64=True) as entry,
+        ):
+            while chunk := await asyncio.to_thread(source.read, COPY_CHUNK_BYTES):
+                await asyncio.to_thread(entry.write, chunk)
+                yield rows
+                rows = 0
+
+
+async def stream_export(
+    db: AsyncSession, project_id: str, export_format: ExportFormat
+) -> AsyncIterator[bytes]:
+    """Zip of a project's glaciers, scenes and snow data, sent while it is written.
+
+    The glaciers are GeoParquet or FlatGeobuf with a spatial index, scenes and
+    snow data are always parquet. A chunk is yielded after every row group,
+    memory use does not grow with the project's size.
+    """
+    stream = _ZipStream()
+    counts = {"glaciers": 0, "scenes": 0, "snow_data": 0}
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_STORED) as bundle:
+        if export_format == ExportFormat.parquet:
+            glaciers = _write_parquet_entry(
+                bundle,
+                "glaciers.parquet",
+                db,
+                _glaciers_select(project_id),
+                GLACIER_SCHEMA,
+                GLACIER_BATCH_ROWS,
+            )
+        else:
+            glaciers = _write_flatgeobuf_entry(bundle, db, project_id)
+
+        entries = [
+            ("glaciers", glaciers),
+            (
+                "scenes",
+                _write_parquet_entry(
+                    bundle,
+                    "scenes.parquet",
+                    db,
+                    _scenes_select(project_id),
+                    SCENE_SCHEMA,
+                    EXPORT_BATCH_ROWS,
+                ),
+            ),
+            (
+                "snow_data",
+                _write_parquet_entry(
+                    bundle,
+                    "snow_data.parquet",
+                    db,
+                    _snow_data_select(await snow_data_source(db), project_id),
+                    SNOW_DATA_SCHEMA,
+                    EXPORT_BATCH_ROWS,
+                ),
+            ),
+        ]
+        for key, entry in entries:
+            async with aclosing(entry) as batches:
+                async for rows in batches:
+                    counts[key] += rows
+                    # deflate may hold back a chunk's data
+                    if data := stream.take():
+                        yield data
+
+        manifest = {
+            "project_id": project_id,
+            "format": export_format.value,
+            "exported_at": datetime.now().isoformat(),
+            "rows": counts,
+        }
+        bundle.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    # the last entry's tail, the manifest and the central directory
+    yield stream.take()
+    logger.info(f"Exported project {project_id} ({counts})")
+
+
+def remove_stale_exports(max_age_seconds: int = STALE_EXPORT_SECONDS) -> int:
+    """Remove temporary export files a process left behind when it died.
+
+    Returns:
+        int: Number of files and folders removed
+    """
+    export_dir = config.cache_folder_path / "exports"
+    if not export_dir.is_dir():
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for path in export_dir.iterdir():
+        try:
+            if path.stat().st_mtime > cutoff:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except OSError:
+            continue
+        removed += 1
+    return removed
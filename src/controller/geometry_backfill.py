@@ -0,0 +1,205 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import shapely
+
+from src.db import engine
+from src.logger import get_logger
+from src.utils.geometry import areas_m2, repair, to_multipolygons
+
+logger = get_logger("glacier_watch")
+
+
+@dataclass(frozen=True)
+class GeometryTable:
+    table: str
+    key_column: str
+    geometry_column: str
+    area_column: Optional[str] = None
+
+
+GLACIER_TABLE = GeometryTable("glacier", "glacier_id", "geometry", "area_m2")
+PROJECT_TABLE = GeometryTable("project", "project_id", "area_of_interest")
+
+_STAGE_TABLE = "geometry_backfill_stage"
+_STAGE_COLUMNS = ["key", "geometry", "area_m2"]
+
+_CREATE_STAGE_SQL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {_STAGE_TABLE} (
+    key text NOT NULL,
+    geometry bytea,
+    area_m2 double precision
+) ON COMMIT DELETE ROWS
+"""
+
+
+@dataclass
+class ChunkUpdate:
+    records: list[tuple[str, Optional[bytes], Optional[float]]]
+    invalid: int
+    unrepairable: int
+    areas_filled: int
+
+
+@dataclass
+class BackfillStats:
+    total: int = 0
+    scanned: int = 0
+    repaired: int = 0
+    unrepairable: int = 0
+    areas_filled: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.scanned / self.seconds if self.seconds else 0.0
+
+
+def _select_chunk_sql(spec: GeometryTable) -> str:
+    area = spec.area_column or "NULL::double precision"
+    return f"""
+    SELECT {spec.key_column}, ST_AsBinary({spec.geometry_column}), {area}
+    FROM {spec.table}
+    WHERE {spec.geometry_column} IS NOT NULL AND {spec.key_column} > $1
+    ORDER BY {spec.key_column}
+    LIMIT $2
+    """
+
+
+def _update_sql(spec: GeometryTable) -> str:
+    assignments = [
+        (
+            f"{spec.geometry_column} = COALESCE(ST_GeomFromWKB(s.geometry, 4326), "
+            f"t.{spec.geometry_column})"
+        )
+    ]
+    if spec.area_column:
+        assignments.append(
+            f"{spec.area_column} = COALESCE(s.area_m2, t.{spec.area_column})"
+        )
+
+    return f"""
+    UPDATE {spec.table} AS t SET {", ".join(assignments)}
+    FROM {_STAGE_TABLE} AS s
+    WHERE t.{spec.key_column} = s.key
+    """
+
+
+def compute_chunk_update(
+    keys: list[str],
+    wkb: list[bytes],
+    areas: list[Optional[float]],
+    with_area: bool,
+    recompute_areas: bool = False,
+) -> ChunkUpdate:
+    """Validate and repair one chunk of geometries and compute the missing areas.
+
+    Only rows with a repaired geometry or a new area are returned for writing.
+    """
+    geoms = shapely.from_wkb(np.asarray(wkb, dtype=object))
+    geoms, invalid = repair(geoms)
+    geoms[invalid] = to_multipolygons(geoms[invalid])
+
+    unrepairable = invalid & shapely.is_missing(geoms)
+    repaired = invalid & ~unrepairable
+
+    area_values = np.asarray(areas, dtype=float)
+    needs_area = np.zeros(len(keys), dtype=bool)
+    if with_area:
+        needs_area = np.isnan(area_values) | repaired
+        if recompute_areas:
+            needs_area[:] = True
+        needs_area &= ~shapely.is_missing(geoms)
+        area_values[needs_area] = areas_m2(geoms[needs_area])
+
+    changed = repaired | needs_area
+    geometry_wkb = np.full(len(keys), None, dtype=object)
+    geometry_wkb[repaired] = shapely.to_wkb(geoms[repaired])
+
+    records = [
+        (keys[i], geometry_wkb[i], float(area_values[i]) if needs_area[i] else None)
+        for i in np.flatnonzero(changed)
+    ]
+
+    return ChunkUpdate(
+        records=records,
+        invalid=int(invalid.sum()),
+        unrepairable=int(unrepairable.sum()),
+        areas_filled=int(needs_area.sum()),
+    )
+
+
+async def backfill_geometries(
+    spec: GeometryTable,
+    chunk_size: int = 5_000,
+    recompute_areas: bool = False,
+    dry_run: bool = False,
+) -> BackfillStats:
+    """Scan a geometry table in key order, repair invalid rows and fill areas.
+
+    Args:
+        spec (GeometryTable): The table to scan
+        chunk_size (int): Rows fetched and written per round trip
+        recompute_areas (bool): Recompute every area instead of only missing ones
+        dry_run (bool): Compute and report the changes without writing them
+
+    Returns:
+        BackfillStats: Counts and timing of the run
+    """
+    stats = BackfillStats()
+    started = time.perf_counter()
+
+    select_sql = _select_chunk_sql(spec)
+    update_sql = _update_sql(spec)
+
+    async with engine.connect() as conn:
+        raw_connection = await conn.get_raw_connection()
+        pg_connection = raw_connection.driver_connection
+
+        stats.total = await pg_connection.fetchval(
+            f"SELECT count(*) FROM {spec.table} WHERE {spec.geometry_column} IS NOT NULL"
+        )
+        logger.info(f"Scanning {stats.total} rows of {spec.table}")
+
+        last_key = ""
+        while rows := await pg_connection.fetch(select_sql, last_key, chunk_size):
+            keys = [row[0] for row in rows]
+            last_key = keys[-1]
+
+            update = await asyncio.to_thread(
+                compute_chunk_update,
+                keys,
+                [row[1] for row in rows],
+                [row[2] for row in rows],
+                spec.area_column is not None,
+                recompute_areas,
+            )
+
+            if update.records and not dry_run:
+                async with pg_connection.transaction():
+                    await pg_connection.execute(_CREATE_STAGE_SQL)
+                    await pg_connection.copy_records_to_table(
+                        _STAGE_TABLE, records=update.records, columns=_STAGE_COLUMNS
+                    )
+                    await pg_connection.execute(update_sql)
+
+            stats.scanned += len(rows)
+            stats.repaired += update.invalid - update.unrepairable
+            stats.unrepairable += update.unrepairable
+            stats.areas_filled += update.areas_filled
+            stats.seconds = time.perf_counter() - started
+
+            remaining = (stats.total - stats.scanned) / stats.rate if stats.rate else 0
+            logger.info(
+                f"{spec.table}: {stats.scanned}/{stats.total} "
+                f"({stats.scanned / max(stats.total, 1):.0%}), "
+                f"{stats.repaired} repaired, {stats.unrepairable} unrepairable, "
+                f"{stats.areas_filled} areas filled, {stats.rate:.0f} rows/s, "
+                f"~{remaining:.0f}s left"
+            )
+
+    stats.seconds = time.perf_counter() - started
+    return stats
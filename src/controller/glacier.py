@@ -1,10 +1,15 @@
+from datetime import date
 from typing import Optional, TypedDict
 
-from sqlalchemy import func, select
+from sqlalchemy import Integer, String, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config import config
+from src.controller.scene import acquisition_date_params, date_range_statements
+from src.controller.snow_data import SNOW_DATA_SOURCES, current_snow_data
 from src.logger import get_logger
-from src.models import Glacier, GlacierSnowData, Scene
+from src.models import Glacier
 from src.schemas.glacier import GlacierListItem
 from src.utils.geo import geojson_point_to_latlng
 
@@ -17,10 +22,73 @@ class GlacierRow(TypedDict):
     geometry_geojson: Optional[str]
 
 
-async def fetch_glacier_area(db: AsyncSession, glacier_id: str) -> Optional[float]:
-    exists = await db.execute(
-        select(Glacier.area_m2).filter(Glacier.glacier_id == glacier_id)
+_GLACIER_AREA = select(Glacier.area_m2).where(
+    Glacier.glacier_id == bindparam("glacier_id")
+)
+
+_GLACIER_DETAILS_COLUMNS = (Glacier.glacier_id, Glacier.name, Glacier.area_m2)
+
+_GLACIER_DETAILS_GEOJSON = select(
+    *_GLACIER_DETAILS_COLUMNS,
+    func.ST_AsGeoJSON(Glacier.geometry, bindparam("precision", type_=Integer)).label(
+        "geometry_geojson"
+    ),
+).where(Glacier.glacier_id == bindparam("glacier_id"))
+
+_GLACIER_DETAILS_WKB = select(
+    *_GLACIER_DETAILS_COLUMNS,
+    func.ST_AsBinary(Glacier.geometry).label("geometry_wkb"),
+).where(Glacier.glacier_id == bindparam("glacier_id"))
+
+
+def _glacier_timeseries(source) -> dict:
+    return date_range_statements(
+        lambda date_bounds: (
+            select(source, source.acquisition_date)
+            .where(source.glacier_id == bindparam("glacier_id"), *date_bounds)
+            .order_by(source.acquisition_date, source.scene_id)
+        ),
+        source.acquisition_date,
     )
+
+
+# one array parameter instead of IN (...), so the SQL text and with it the
+# prepared statement do not change with the number of glaciers
+def _glaciers_timeseries(source) -> dict:
+    return date_range_statements(
+        lambda date_bounds: (
+            select(
+                source.glacier_id,
+                source.acquisition_date,
+                source.snow_area_m2,
+                source.snowline_elevation_m,
+                Glacier.area_m2,
+            )
+            .join(Glacier, source.glacier_id == Glacier.glacier_id)
+            .where(
+                source.glacier_id
+                == any_(bindparam("glacier_ids", type_=ARRAY(String))),
+                *date_bounds,
+            )
+        ),
+        source.acquisition_date,
+    )
+
+
+# both read the latest analysis of each scene only, by whether the current
+# snow data is filled
+_GLACIER_TIMESERIES = {
+    populated: _glacier_timeseries(source)
+    for populated, source in SNOW_DATA_SOURCES.items()
+}
+_GLACIERS_TIMESERIES = {
+    populated: _glaciers_timeseries(source)
+    for populated, source in SNOW_DATA_SOURCES.items()
+}
+
+
+async def fetch_glacier_area(db: AsyncSession, glacier_id: str) -> Optional[float]:
+    exists = await db.execute(_GLACIER_AREA, {"glacier_id": glacier_id})
     return exists.scalar_one_or_none()
 
 
@@ -38,35 +106,91 @@ async def fetch_glacier_in_geometry(db: AsyncSession, geometry) -> list[GlacierR
     return glacier_result.all()
 
 
-async def fetch_glacier_details(db: AsyncSession, glacier_id: str):
+def _geometry_column(precision: Optional[int], as_wkb: bool):
+    if as_wkb:
+        return func.ST_AsBinary(Glacier.geometry).label("geometry_wkb")
+
+    if precision is None:
+        precision = config.geojson_max_decimal_digits
+    return func.ST_AsGeoJSON(Glacier.geometry, precision).label("geometry_geojson")
+
+
+async def fetch_glacier_shapes_in_geometry(
+    db: AsyncSession,
+    geometry,
+    precision: Optional[int] = None,
+    as_wkb: bool = False,
+):
+    """Full geometries of the glaciers within a geometry, as GeoJSON or WKB."""
     glacier_result = await db.execute(
         select(
             Glacier.glacier_id,
             Glacier.name,
             Glacier.area_m2,
-            func.ST_AsGeoJSON(Glacier.geometry).label("geometry_geojson"),
-        ).filter(Glacier.glacier_id == glacier_id)
+            _geometry_column(precision, as_wkb),
+        )
+        .filter(func.ST_Within(Glacier.geometry, geometry))
+        .order_by(Glacier.glacier_id)
     )
 
+    return glacier_result.all()
+
+
+async def fetch_glacier_details(
+    db: AsyncSession,
+    glacier_id: str,
+    precision: Optional[int] = None,
+    as_wkb: bool = False,
+):
+    if as_wkb:
+        glacier_result = await db.execute(
+            _GLACIER_DETAILS_WKB, {"glacier_id": glacier_id}
+        )
+    else:
+        if precision is None:
+            precision = config.geojson_max_decimal_digits
+        glacier_result = await db.execute(
+            _GLACIER_DETAILS_GEOJSON,
+            {"glacier_id": glacier_id, "precision": precision},
+        )
+
     logger.info(f"Fetched glacier details for glacier_id={glacier_id}")
 
     return glacier_result.first()
 
 
-async def fetch_glacier_timeseries(db: AsyncSession, glacier_id: str):
-    snow_select = (
-        select(GlacierSnowData, Scene.acquisition_date)
-        .join(Scene, GlacierSnowData.scene_id == Scene.scene_id)
-        .where(GlacierSnowData.glacier_id == glacier_id)
-        .order_by(GlacierSnowData.created_at)
+async def fetch_glacier_timeseries(
+    db: AsyncSession,
+    glacier_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    statements = _GLACIER_TIMESERIES[await current_snow_data.is_populated(db)]
+    date_range, params = acquisition_date_params(start, end)
+    snow_data = await db.execute(
+        statements[date_range], {"glacier_id": glacier_id, **params}
     )
-
-    snow_data = await db.execute(snow_select)
     snow_data = snow_data.all()
 
     return snow_data
 
 
+async def fetch_glaciers_timeseries(
+    db: AsyncSession,
+    glacier_ids: list[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """Snow observations of many glaciers, with each glacier's area."""
+    statements = _GLACIERS_TIMESERIES[await current_snow_data.is_populated(db)]
+    date_range, params = acquisition_date_params(start, end)
+    snow_data = await db.execute(
+        statements[date_range], {"glacier_ids": glacier_ids, **params}
+    )
+
+    return snow_data.all()
+
+
 def __glacier_row_to_list_item(glacier: GlacierRow) -> GlacierListItem:
     return {
         "glacier_id": glacier.glacier_id,
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import shapely
+from pyogrio.raw import open_arrow
+
+from src.db import engine
+from src.logger import get_logger
+from src.utils.geometry import WGS84, areas_m2, repair, reproject, to_multipolygons
+
+logger = get_logger("glacier_watch")
+
+_STAGE_TABLE = "glacier_import_stage"
+_STAGE_COLUMNS = ["glacier_id", "name", "geometry", "area_m2"]
+
+_CREATE_STAGE_SQL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {_STAGE_TABLE} (
+    glacier_id text NOT NULL,
+    name text,
+    geometry bytea NOT NULL,
+    area_m2 double precision
+) ON COMMIT DELETE ROWS
+"""
+
+_UPSERT_SQL = f"""
+INSERT INTO glacier (glacier_id, name, geometry, area_m2, created_at)
+SELECT DISTINCT ON (glacier_id)
+    glacier_id, name, ST_GeomFromWKB(geometry, 4326), area_m2, LOCALTIMESTAMP
+FROM {_STAGE_TABLE}
+ORDER BY glacier_id
+ON CONFLICT (glacier_id) DO UPDATE SET
+    name = EXCLUDED.name,
+    geometry = EXCLUDED.geometry,
+    area_m2 = EXCLUDED.area_m2
+"""
+
+
+@dataclass
+class GlacierBatch:
+    records: list[tuple[str, Optional[str], bytes, float]]
+    skipped: int
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    written: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def _column_values(batch, name: Optional[str]) -> list:
+    if name is None:
+        return [None] * batch.num_rows
+    return batch.column(name).to_pylist()
+
+
+def prepare_batch(
+    ids: list, names: list, wkb: np.ndarray, src_crs: Optional[str]
+) -> GlacierBatch:
+    """Turn one batch of raw features into rows for the glacier table.
+
+    All geometry work runs on whole arrays: parse, drop Z, reproject to WGS84,
+    repair, normalize to MULTIPOLYGON and measure the area in the project CRS.
+    """
+    geoms = shapely.force_2d(shapely.from_wkb(wkb))
+    geoms = reproject(geoms, src_crs or WGS84, WGS84)
+    geoms, _ = repair(geoms)
+    geoms = to_multipolygons(geoms)
+
+    ids_arr = np.asarray(ids, dtype=object)
+    keep = ~shapely.is_missing(geoms) & np.not_equal(ids_arr, None)
+    geoms = geoms[keep]
+
+    records = list(
+        zip(
+            ids_arr[keep].astype(str).tolist(),
+            np.asarray(names, dtype=object)[keep].tolist(),
+            shapely.to_wkb(geoms).tolist(),
+            areas_m2(geoms).tolist(),
+        )
+    )
+
+    return GlacierBatch(records=records, skipped=int((~keep).sum()))
+
+
+def iter_glacier_batches(
+    path: Path,
+    id_field: str,
+    name_field: Optional[str] = None,
+    layer: Optional[str] = None,
+    batch_size: int = 10_000,
+) -> Iterator[GlacierBatch]:
+    """Stream a GeoJSON, GeoPackage or shapefile as prepared glacier batches.
+
+    Features are read as Arrow record batches, so only one batch is held in memory.
+    """
+    columns = [id_field] + ([name_field] if name_field else [])
+
+    with open_arrow(
+        path,
+        layer=layer,
+        columns=columns,
+        batch_size=batch_size,
+        use_pyarrow=True,
+    ) as (meta, reader):
+        geometry_column = meta["geometry_name"] or "wkb_geometry"
+        src_crs = meta["crs"]
+
+        logger.info(f"Reading glaciers from {path} (crs={src_crs})")
+
+        for batch in reader:
+            yield prepare_batch(
+                _column_values(batch, id_field),
+                _column_values(batch, name_field),
+                batch.column(geometry_column).to_numpy(zero_copy_only=False),
+                src_crs,
+            )
+
+
+async def copy_upsert_glaciers(pg_connection, records: list[tuple]) -> None:
+    """COPY rows into a temporary staging table and upsert them into glacier.
+
+    Args:
+        pg_connection: The asyncpg driver connection
+        records: Tuples of (glacier_id, name, wkb, area_m2)
+    """
+    async with pg_connection.transaction():
+        await pg_connection.execute(_CREATE_STAGE_SQL)
+        await pg_connection.copy_records_to_table(
+            _STAGE_TABLE, records=records, columns=_STAGE_COLUMNS
+        )
+        await pg_connection.execute(_UPSERT_SQL)
+
+
+async def import_glaciers(
+    path: Path,
+    id_field: str,
+    name_field: Optional[str] = None,
+    layer: Optional[str] = None,
+    batch_size: int = 10_000,
+) -> ImportStats:
+    stats = ImportStats()
+    started = time.perf_counter()
+
+    batches = iter_glacier_batches(path, id_field, name_field, layer, batch_size)
+
+    async with engine.connect() as conn:
+        raw_connection = await conn.get_raw_connection()
+        pg_connection = raw_connection.driver_connection
+
+        # read and prepare the next batch in a thread while the current one is copied
+        pending = asyncio.create_task(asyncio.to_thread(next, batches, None))
+        try:
+            while (batch := await pending) is not None:
+                pending = asyncio.create_task(asyncio.to_thread(next, batches, None))
+
+                if batch.records:
+                    await copy_upsert_glaciers(pg_connection, batch.records)
+
+                stats.read += len(batch.records) + batch.skipped
+                stats.written += len(batch.records)
+                stats.skipped += batch.skipped
+                stats.seconds = time.perf_counter() - started
+
+                logger.info(
+                    f"Imported {stats.written} glaciers ({stats.skipped} skipped), "
+                    f"{stats.rate:.0f} features/s"
+                )
+        finally:
+            if not pending.done():
+                await asyncio.wait([pending])
+            batches.close()
+
+    stats.seconds = time.perf_counter() - started
+    return stats
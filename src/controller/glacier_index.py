@@ -0,0 +1,202 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import shapely
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db import AsyncSessionLocal
+from src.logger import get_logger
+from src.models import Glacier
+
+logger = get_logger("glacier_watch")
+
+# RGI ids look like RGI2000-v7.0-G-08-00761, the fourth part is the region
+_REGION = func.split_part(Glacier.glacier_id, "-", 4)
+
+# inserts, updates and deletes on the glacier table since the statistics were
+# last reset; only the primary counts them
+_GLACIER_CHANGES_SQL = text(
+    "SELECT n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables "
+    "WHERE relname = :table"
+)
+
+
+@dataclass
+class RegionIndex:
+    glacier_ids: np.ndarray
+    names: np.ndarray
+    areas: np.ndarray
+    geometries: np.ndarray
+    tree: shapely.STRtree
+
+    @classmethod
+    def build(cls, rows) -> "RegionIndex":
+        glacier_ids, names, areas, wkb = zip(*rows) if rows else ((), (), (), ())
+        geometries = shapely.from_wkb([bytes(geometry) for geometry in wkb])
+        # prepared polygons make the point in polygon tests much cheaper
+        shapely.prepare(geometries)
+        return cls(
+            glacier_ids=np.asarray(glacier_ids, dtype=object),
+            names=np.asarray(names, dtype=object),
+            areas=np.asarray(areas, dtype="float64"),
+            geometries=geometries,
+            tree=shapely.STRtree(geometries),
+        )
+
+    def lookup(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """Index of the smallest glacier containing each point, -1 for none."""
+        points = shapely.points(lon, lat)
+        point_index, glacier_index = self.tree.query(points)
+
+        inside = shapely.contains_xy(
+            self.geometries[glacier_index], lon[point_index], lat[point_index]
+        )
+        point_index, glacier_index = point_index[inside], glacier_index[inside]
+
+        # nested or overlapping outlines: keep the smallest glacier per point
+        order = np.lexsort(
+            (np.nan_to_num(self.areas[glacier_index], nan=np.inf), point_index)
+        )
+        point_index, glacier_index = point_index[order], glacier_index[order]
+        first = np.unique(point_index, return_index=True)[1]
+
+        result = np.full(len(lon), -1)
+        result[point_index[first]] = glacier_index[first]
+        return result
+
+
+class GlacierIndex:
+    """In-memory STRtrees of the glacier outlines, one per RGI region.
+
+    Only the regions' extents are loaded up front; a region's outlines are
+    loaded on the first lookup that falls into its extent. All loaded data is
+    reloaded when the glacier table's change counter moves.
+    """
+
+    def __init__(self) -> None:
+        self.extents: Optional[dict[str, tuple[float, float, float, float]]] = None
+        self.regions: dict[str, RegionIndex] = {}
+        self.changes: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    async def _fetch_extents(self, db: AsyncSession) -> dict:
+        extent = func.ST_Extent(Glacier.geometry)
+        result = await db.execute(
+            select(
+                _REGION.label("region"),
+                func.ST_XMin(extent),
+                func.ST_YMin(extent),
+                func.ST_XMax(extent),
+                func.ST_YMax(extent),
+            ).group_by(_REGION)
+        )
+        return {region: tuple(bounds) for region, *bounds in result.all()}
+
+    async def _fetch_region(self, db: AsyncSession, region: str) -> RegionIndex:
+        result = await db.execute(
+            select(
+                Glacier.glacier_id,
+                Glacier.name,
+                Glacier.area_m2,
+                func.ST_AsBinary(Glacier.geometry),
+            ).where(_REGION == region)
+        )
+        rows = result.all()
+        index = await asyncio.to_thread(RegionIndex.build, rows)
+        logger.info(f"Loaded {len(rows)} glacier outlines of region {region!r}")
+        return index
+
+    async def _regions_for(self, lon: np.ndarray, lat: np.ndarray) -> list[RegionIndex]:
+        """The indexes of the regions the points may fall into, loading them."""
+        async with self._lock:
+            if self.extents is None:
+                async with AsyncSessionLocal() as db:
+                    self.extents = await self._fetch_extents(db)
+
+            wanted = [
+                region
+                for region, (min_lon, min_lat, max_lon, max_lat) in self.extents.items()
+                if np.any(
+                    (lon >= min_lon)
+                    & (lon <= max_lon)
+                    & (lat >= min_lat)
+                    & (lat <= max_lat)
+                )
+            ]
+
+            missing = [region for region in wanted if region not in self.regions]
+            if missing:
+                async with AsyncSessionLocal() as db:
+                    for region in missing:
+                        self.regions[region] = await self._fetch_region(db, region)
+
+            # resolved under the lock, a refresh may replace the regions after it
+            return [self.regions[region] for region in wanted]
+
+    async def lookup(self, lon: list[float], lat: list[float]) -> list[Optional[dict]]:
+        """The glacier under each point, or None for points outside all glaciers."""
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        results: list[Optional[dict]] = [None] * len(lon)
+
+        for index in await self._regions_for(lon, lat):
+            found = index.lookup(lon, lat)
+            for point in np.flatnonzero(found >= 0):
+                glacier = found[point]
+                if results[point] is None:
+                    results[point] = {
+                        "glacier_id": index.glacier_ids[glacier],
+                        "name": index.names[glacier],
+                        "area_m2": (
+                            None
+                            if np.isnan(index.areas[glacier])
+                            else float(index.areas[glacier])
+                        ),
+                    }
+
+        return results
+
+    async def refresh(self) -> bool:
+        """Reload everything loaded so far if the glacier table changed.
+
+        Returns:
+            bool: Whether the table changed since the last check
+        """
+        async with AsyncSessionLocal() as db:
+            changes = (
+                await db.execute(_GLACIER_CHANGES_SQL, {"table": Glacier.__tablename__})
+            ).scalar()
+
+            if self.changes is None or changes == self.changes:
+                self.changes = changes
+                return False
+
+            # lookups may load more regions while this one awaits
+            extents = await self._fetch_extents(db)
+            regions = {}
+            for region in list(self.regions):
+                if region in extents:
+                    regions[region] = await self._fetch_region(db, region)
+
+        async with self._lock:
+            self.extents = extents
+            self.regions = regions
+        # only now, a failed reload is retried on the next check
+        self.changes = changes
+        return True
+
+    async def run(self, interval_seconds: int) -> None:
+        while True:
+            try:
+                if await self.refresh():
+                    logger.info("Glacier table changed, reloaded the glacier index")
+            except Exception as e:
+                logger.error(f"Error refreshing the glacier index: {e}")
+
+            await asyncio.sleep(interval_seconds)
+
+
+glacier_index = GlacierIndex()
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import rasterio
+from rasterio.enums import Resampling
+
+from src.config import config
+from src.controller.raster import (
+    TileFormat,
+    encode_image,
+    is_raster,
+    resolve_value_range,
+    to_rgba,
+)
+from src.logger import get_logger
+from src.utils.files import write_bytes_atomic
+
+logger = get_logger("glacier_watch")
+
+MAX_PREVIEW_SIZE = 1024
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _previews_dir() -> Path:
+    return config.cache_folder_path / "previews"
+
+
+def _result_dir() -> Path:
+    return config.data_folder_path.resolve() / "result"
+
+
+def content_hash(path: Path) -> str:
+    """SHA-256 of the file content.
+
+    The hash is stored in a sidecar file together with the size and mtime it was
+    computed for, so the file is only read again after it changes.
+    """
+    stat = path.stat()
+    sidecar = _previews_dir() / "hashes" / f"{path.relative_to(_result_dir())}.json"
+
+    try:
+        cached = json.loads(sidecar.read_text())
+        if cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+
+    sha256 = digest.hexdigest()
+    write_bytes_atomic(
+        sidecar,
+        json.dumps(
+            {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        ).encode(),
+    )
+    return sha256
+
+
+def render_preview(path: Path, size: int) -> bytes:
+    """Render a PNG thumbnail that fits in a size x size box.
+
+    The whole raster is read with a decimated out_shape, which GDAL serves from
+    the closest overview when the file has them.
+    """
+    with rasterio.open(path) as src:
+        scale = size / max(src.width, src.height)
+        out_shape = (
+            max(1, round(src.height * scale)),
+            max(1, round(src.width * scale)),
+        )
+        indexes = [1, 2, 3] if src.count >= 3 else [1]
+        data = src.read(
+            indexes=indexes,
+            out_shape=(len(indexes), *out_shape),
+            masked=True,
+            resampling=Resampling.nearest,
+        )
+        value_range = resolve_value_range(path, src.dtypes[0], None)
+
+    return encode_image(to_rgba(data, value_range), TileFormat.png)
+
+
+def get_preview(path: Path, size: Optional[int] = None) -> Path:
+    """Return the cached preview of a raster file, rendering it on a cache miss."""
+    size = size or config.preview_size
+    sha256 = content_hash(path)
+    preview_path = _previews_dir() / sha256[:2] / f"{sha256}-{size}.png"
+
+    if not preview_path.exists():
+        write_bytes_atomic(preview_path, render_preview(path, size))
+        logger.info(f"Generated preview for {path} at {preview_path}")
+
+    return preview_path
+
+
+class PreviewWorker:
+    """Pre-generates previews for new or changed result folders.
+
+    The result folder is polled for folders whose mtime changed since the last
+    scan and their rasters are rendered on a bounded thread pool.
+    """
+
+    def __init__(self, workers: int):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="preview"
+        )
+        self.seen_folders: dict[Path, int] = {}
+        self.pending: set[Path] = set()
+
+    def _generate(self, path: Path) -> None:
+        try:
+            get_preview(path)
+        except Exception as e:
+            logger.error(f"Error generating preview for {path}: {e}")
+        finally:
+            self.pending.discard(path)
+
+    def scan(self) -> int:
+        """Queue preview generation for rasters in changed folders.
+
+        Returns:
+            int: The number of files queued
+        """
+        result_dir = _result_dir()
+        if not result_dir.exists():
+            return 0
+
+        queued = 0
+        for folder in result_dir.glob("*/*"):
+            if not folder.is_dir():
+                continue
+
+            mtime_ns = folder.stat().st_mtime_ns
+            if self.seen_folders.get(folder) == mtime_ns:
+                continue
+            self.seen_folders[folder] = mtime_ns
+
+            for path in folder.iterdir():
+                if path.is_file() and is_raster(path) and path not in self.pending:
+                    self.pending.add(path)
+                    self.executor.submit(self._generate, path)
+                    queued += 1
+
+        return queued
+
+    async def run(self, interval_seconds: int) -> None:
+        while True:
+            try:
+                queued = await asyncio.to_thread(self.scan)
+                if queued:
+                    logger.info(f"Queued {queued} result files for preview generation")
+            except Exception as e:
+                logger.error(f"Error scanning result folders for previews: {e}")
+
+            await asyncio.sleep(interval_seconds)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
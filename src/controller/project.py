@@ -1,12 +1,10 @@
-import yaml
 from pathlib import Path
 from typing import Optional, TypedDict
 
-from sqlalchemy import func, select
+from sqlalchemy import Integer, bindparam, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from geoalchemy2.shape import from_shape
-from shapely.geometry import shape
 
+from src.controller.project_config import config_store
 from src.models import Project
 from src.schemas.shared import GeoJSON
 from src.config import config
@@ -25,49 +23,59 @@ class ProjectRow(TypedDict):
     max_lat: Optional[float]
 
 
+_PROJECTS = select(
+    Project.project_id,
+    Project.name,
+    func.ST_AsGeoJSON(func.ST_PointOnSurface(Project.area_of_interest)).label(
+        "center_geojson"
+    ),
+)
+
+_PROJECTS_BOUNDS = select(
+    func.ST_XMin(func.ST_Extent(Project.area_of_interest)).label("min_lon"),
+    func.ST_YMin(func.ST_Extent(Project.area_of_interest)).label("min_lat"),
+    func.ST_XMax(func.ST_Extent(Project.area_of_interest)).label("max_lon"),
+    func.ST_YMax(func.ST_Extent(Project.area_of_interest)).label("max_lat"),
+).where(Project.area_of_interest.isnot(None))
+
+_PROJECT_ROW = select(
+    Project.project_id,
+    Project.name,
+    Project.description,
+    Project.area_of_interest,
+    func.ST_AsGeoJSON(
+        Project.area_of_interest, bindparam("precision", type_=Integer)
+    ).label("aoi"),
+    func.ST_AsGeoJSON(func.ST_PointOnSurface(Project.area_of_interest)).label(
+        "center_geojson"
+    ),
+    func.ST_XMin(Project.area_of_interest).label("min_lon"),
+    func.ST_YMin(Project.area_of_interest).label("min_lat"),
+    func.ST_XMax(Project.area_of_interest).label("max_lon"),
+    func.ST_YMax(Project.area_of_interest).label("max_lat"),
+).where(Project.project_id == bindparam("project_id"))
+
+
 async def fetch_projects(db: AsyncSession) -> list:
-    project_rows = await db.execute(
-        select(
-            Project.project_id,
-            Project.name,
-            func.ST_AsGeoJSON(func.ST_PointOnSurface(Project.area_of_interest)).label(
-                "center_geojson"
-            ),
-        )
-    )
+    project_rows = await db.execute(_PROJECTS)
 
     return [row for row in project_rows.all()]
 
 
 async def fetch_projects_bounds(db):
-    res = await db.execute(
-        select(
-            func.ST_XMin(func.ST_Extent(Project.area_of_interest)).label("min_lon"),
-            func.ST_YMin(func.ST_Extent(Project.area_of_interest)).label("min_lat"),
-            func.ST_XMax(func.ST_Extent(Project.area_of_interest)).label("max_lon"),
-            func.ST_YMax(func.ST_Extent(Project.area_of_interest)).label("max_lat"),
-        ).where(Project.area_of_interest.isnot(None))
-    )
+    res = await db.execute(_PROJECTS_BOUNDS)
 
     return res.first()
 
 
-async def fetch_project_row(db: AsyncSession, project_id: str) -> ProjectRow:
+async def fetch_project_row(
+    db: AsyncSession, project_id: str, precision: Optional[int] = None
+) -> ProjectRow:
+    if precision is None:
+        precision = config.geojson_max_decimal_digits
+
     project_result = await db.execute(
-        select(
-            Project.project_id,
-            Project.name,
-            Project.description,
-            Project.area_of_interest,
-            func.ST_AsGeoJSON(Project.area_of_interest).label("aoi"),
-            func.ST_AsGeoJSON(func.ST_PointOnSurface(Project.area_of_interest)).label(
-                "center_geojson"
-            ),
-            func.ST_XMin(Project.area_of_interest).label("min_lon"),
-            func.ST_YMin(Project.area_of_interest).label("min_lat"),
-            func.ST_XMax(Project.area_of_interest).label("max_lon"),
-            func.ST_YMax(Project.area_of_interest).label("max_lat"),
-        ).filter(Project.project_id == project_id)
+        _PROJECT_ROW, {"project_id": project_id, "precision": precision}
     )
 
     return project_result.first()
@@ -92,17 +100,24 @@ def read_project_config(project_id: str):
     project_path = get_project_folder_path(project_id)
     config_path = project_path / "config.yaml"
 
-    with open(config_path, "r") as config_file:
-        content = yaml.safe_load(config_file)
+    return config_store.read(config_path)
 
-    return content
+
+def read_project_configs(project_ids: list[str]) -> dict[str, dict]:
+    configs = {}
+    for project_id in project_ids:
+        try:
+            configs[project_id] = read_project_config(project_id)
+        except FileNotFoundError:
+            continue
+
+    return configs
 
 
 def save_project_config(project_path: Path, config_data: dict):
     config_path = project_path / "config.yaml"
 
-    with open(config_path, "w") as config_file:
-        yaml.dump(config_data, config_file)
+    config_store.save(config_path, config_data)
 
 
 async def create_project(
@@ -114,7 +129,17 @@ async def create_project(
 ) -> Project:
     geom = None
     if area_of_interest:
-        geom = from_shape(shape(area_of_interest.model_dump()), srid=4326)
+        import numpy as np
+        from geoalchemy2.shape import from_shape
+        from shapely.geometry import shape
+
+        from src.utils.geometry import repair, to_multipolygons
+
+        aoi, _ = repair(np.array([shape(area_of_interest.model_dump())]))
+        aoi = to_multipolygons(aoi)[0]
+        if aoi is None:
+            raise ValueError("Area of interest has no polygonal area")
+        geom = from_shape(aoi, srid=4326)
 
     new_project = Project(
         project_id=project_id,
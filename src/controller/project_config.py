@@ -0,0 +1,87 @@
+import threading
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+from src.utils.files import write_bytes_atomic
+
+
+@cache
+def _yaml():
+    """Import yaml on first use, preferring the libyaml based loader and dumper."""
+    import yaml
+
+    try:
+        from yaml import CSafeDumper as SafeDumper
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeDumper, SafeLoader
+
+    return yaml, SafeLoader, SafeDumper
+
+
+@dataclass
+class _CachedConfig:
+    mtime_ns: int
+    size: int
+    data: Any
+
+
+class ConfigStore:
+    """Cache of parsed YAML config files with atomic, locked saves.
+
+    A cached entry is reused as long as the file's mtime and size are unchanged,
+    so edits made outside the API are still picked up. Saves write a temporary
+    file and rename it over the old one under a per-file lock, so readers never
+    see a partially written config.
+
+    Returned configs are shared with the cache and must not be mutated.
+    """
+
+    def __init__(self) -> None:
+        self._cache: dict[Path, _CachedConfig] = {}
+        self._locks: dict[Path, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, path: Path) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def read(self, path: Path) -> Any:
+        """Read a config file, parsing it only if it changed since the last read.
+
+        Raises:
+            FileNotFoundError: If the config file does not exist
+        """
+        stat = path.stat()
+
+        cached = self._cache.get(path)
+        if (
+            cached
+            and cached.mtime_ns == stat.st_mtime_ns
+            and cached.size == stat.st_size
+        ):
+            return cached.data
+
+        yaml, SafeLoader, _ = _yaml()
+        with open(path, "rb") as config_file:
+            data = yaml.load(config_file, Loader=SafeLoader)
+
+        self._cache[path] = _CachedConfig(stat.st_mtime_ns, stat.st_size, data)
+        return data
+
+    def save(self, path: Path, data: Any) -> None:
+        yaml, _, SafeDumper = _yaml()
+        content = yaml.dump(data, Dumper=SafeDumper).encode()
+
+        with self._lock(path):
+            write_bytes_atomic(path, content)
+            stat = path.stat()
+            self._cache[path] = _CachedConfig(stat.st_mtime_ns, stat.st_size, data)
+
+    def invalidate(self, path: Path) -> None:
+        self._cache.pop(path, None)
+
+
+config_store = ConfigStore()
@@ -0,0 +1,299 @@
+import asyncio
+import enum
+import io
+import math
+import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import rasterio
+from PIL import Image
+from rasterio.coords import disjoint_bounds
+from rasterio.enums import Resampling
+from rasterio.transform import from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+
+from src.config import config
+from src.logger import get_logger
+from src.utils.files import write_bytes_atomic
+
+logger = get_logger("glacier_watch")
+
+WEB_MERCATOR = "EPSG:3857"
+RASTER_SUFFIXES = {".tif", ".tiff"}
+MAX_ZOOM = 24
+
+_MERCATOR_ORIGIN = 20037508.342789244
+
+# rescale bounds are rounded to this many significant digits, so nearby
+# ranges share their cached tiles
+RESCALE_SIGNIFICANT_DIGITS = 3
+# rescaled tile sets kept per raster, the least recently used ones are removed
+MAX_RESCALE_VERSIONS = 8
+
+
+class TileFormat(str, enum.Enum):
+    png = "png"
+    webp = "webp"
+
+
+MEDIA_TYPES = {TileFormat.png: "image/png", TileFormat.webp: "image/webp"}
+
+ValueRange = tuple[float, float]
+
+
+def is_raster(path: Path) -> bool:
+    return path.suffix.lower() in RASTER_SUFFIXES
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """Bounds of an XYZ tile in Web Mercator (left, bottom, right, top)."""
+    tile_span = 2 * _MERCATOR_ORIGIN / 2**z
+    left = -_MERCATOR_ORIGIN + x * tile_span
+    top = _MERCATOR_ORIGIN - y * tile_span
+    return left, top - tile_span, left + tile_span, top
+
+
+def parse_rescale(rescale: Optional[str]) -> Optional[ValueRange]:
+    """Parse a "min,max" query value, rounded to RESCALE_SIGNIFICANT_DIGITS."""
+    if not rescale:
+        return None
+
+    low, high = (
+        float(f"{float(value):.{RESCALE_SIGNIFICANT_DIGITS}g}")
+        for value in rescale.split(",")
+    )
+    if not (math.isfinite(low) and math.isfinite(high)) or low >= high:
+        raise ValueError("rescale must be 'min,max' with min < max")
+    return low, high
+
+
+def _overview_level(src, bounds: tuple, size: int) -> Optional[int]:
+    """Pick the coarsest overview that still has at least the output resolution."""
+    decimation = (bounds[2] - bounds[0]) / size / src.res[0]
+
+    level = None
+    for index, factor in enumerate(src.overviews(1)):
+        if factor <= decimation:
+            level = index
+    return level
+
+
+@lru_cache(maxsize=256)
+def _value_range(path: str, mtime_ns: int) -> ValueRange:
+    """Min and max of the raster, sampled from its coarsest overview."""
+    with rasterio.open(path) as src:
+        overviews = src.overviews(1)
+        factor = max(overviews[-1] if overviews else 1, src.width / 1024, 1)
+        out_shape = (
+            src.count,
+            max(1, int(src.height / factor)),
+            max(1, int(src.width / factor)),
+        )
+        data = src.read(out_shape=out_shape, masked=True)
+
+    if data.count() == 0:
+        return 0.0, 1.0
+    return float(data.min()), float(data.max())
+
+
+def resolve_value_range(
+    path: Path, dtype: str, rescale: Optional[ValueRange]
+) -> Optional[ValueRange]:
+    if rescale:
+        return rescale
+    if dtype == "uint8":
+        return None
+    return _value_range(str(path), path.stat().st_mtime_ns)
+
+
+def to_rgba(data: np.ma.MaskedArray, value_range: Optional[ValueRange]) -> np.ndarray:
+    """Turn a (bands, rows, cols) masked array into a (rows, cols, 4) RGBA image."""
+    bands = data.astype("float64")
+    if value_range:
+        low, high = value_range
+        bands = (bands - low) / (high - low) * 255
+
+    rgb = np.clip(bands.filled(0), 0, 255).astype("uint8")
+    if rgb.shape[0] == 1:
+        rgb = np.repeat(rgb, 3, axis=0)
+
+    alpha = np.where(np.ma.getmaskarray(data).any(axis=0), 0, 255).astype("uint8")
+    return np.dstack([rgb[0], rgb[1], rgb[2], alpha])
+
+
+def encode_image(rgba: np.ndarray, image_format: TileFormat) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(rgba).save(buffer, format=image_format.value.upper())
+    return buffer.getvalue()
+
+
+def render_tile(
+    path: Path,
+    z: int,
+    x: int,
+    y: int,
+    image_format: TileFormat,
+    rescale: Optional[ValueRange] = None,
+) -> Optional[bytes]:
+    """Render one Web Mercator tile of a raster, or None if the tile is empty.
+
+    The source is opened at the overview level matching the tile resolution and
+    warped straight onto the tile grid, so only the needed pixels are read.
+    """
+    size = config.tile_size
+    bounds = tile_bounds(z, x, y)
+
+    with rasterio.open(path) as src:
+        src_bounds = transform_bounds(WEB_MERCATOR, src.crs, *bounds)
+        if disjoint_bounds(src_bounds, tuple(src.bounds)):
+            return None
+
+        level = _overview_level(src, src_bounds, size)
+        indexes = [1, 2, 3] if src.count >= 3 else [1]
+        value_range = resolve_value_range(path, src.dtypes[0], rescale)
+
+    open_options = {} if level is None else {"overview_level": level}
+    with rasterio.open(path, **open_options) as src:
+        vrt_options = {"add_alpha": True} if src.nodata is None else {}
+        with WarpedVRT(
+            src,
+            crs=WEB_MERCATOR,
+            transform=from_bounds(*bounds, size, size),
+            width=size,
+            height=size,
+            resampling=Resampling.nearest,
+            **vrt_options,
+        ) as vrt:
+            data = vrt.read(indexes=indexes, masked=True)
+
+    if np.ma.getmaskarray(data).all():
+        return None
+
+    return encode_image(to_rgba(data, value_range), image_format)
+
+
+def _tile_cache_dir(path: Path) -> Path:
+    relative = path.relative_to(config.data_folder_path.resolve() / "result")
+    return config.cache_folder_path / "tiles" / relative
+
+
+def _prune_versions(file_cache_dir: Path, current: str) -> None:
+    """Remove the tiles of older file versions and of rarely used rescale ranges.
+
+    Leaves room for one more rescale range of the current version.
+    """
+    if not file_cache_dir.exists():
+        return
+
+    rescaled = []
+    for version_dir in file_cache_dir.iterdir():
+        if not version_dir.is_dir():
+            continue
+        if version_dir.name.split("-")[0] != current:
+            logger.info(f"Removing stale tile cache {version_dir}")
+            shutil.rmtree(version_dir, ignore_errors=True)
+        elif "-" in version_dir.name:
+            rescaled.append(version_dir)
+
+    # a version directory's mtime is bumped whenever one of its tiles is served
+    rescaled.sort(key=lambda version_dir: version_dir.stat().st_mtime, reverse=True)
+    for version_dir in rescaled[MAX_RESCALE_VERSIONS - 1 :]:
+        logger.info(f"Removing rarely used tile cache {version_dir}")
+        shutil.rmtree(version_dir, ignore_errors=True)
+
+
+def _touch(*paths: Path) -> None:
+    for path in paths:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def get_tile(
+    path: Path,
+    z: int,
+    x: int,
+    y: int,
+    image_format: TileFormat,
+    rescale: Optional[ValueRange] = None,
+) -> Optional[Path]:
+    """Return the cached tile file, rendering it on a cache miss.
+
+    Tiles are cached per file modification time, so a rewritten result file gets
+    fresh tiles and the tiles of older versions are removed.
+    """
+    mtime = str(path.stat().st_mtime_ns)
+    version = mtime if rescale is None else f"{mtime}-{rescale[0]:g}_{rescale[1]:g}"
+
+    file_cache_dir = _tile_cache_dir(path)
+    version_dir = file_cache_dir / version
+    tile_path = version_dir / str(z) / str(x) / f"{y}.{image_format.value}"
+
+    if tile_path.exists():
+        _touch(tile_path, version_dir)
+        return tile_path
+
+    if not version_dir.exists():
+        _prune_versions(file_cache_dir, mtime)
+
+    content = render_tile(path, z, x, y, image_format, rescale)
+    if content is None:
+        return None
+
+    write_bytes_atomic(tile_path, content)
+    return tile_path
+
+
+def prune_tile_cache(max_bytes: int) -> int:
+    """Remove the least recently served tiles until the cache fits in max_bytes.
+
+    Returns:
+        int: Number of tiles removed
+    """
+    tiles = []
+    total = 0
+    for root, _, files in os.walk(config.cache_folder_path / "tiles"):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            tiles.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+            total += stat.st_size
+
+    removed = 0
+    tiles.sort()
+    for _, size, path in tiles:
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+async def run_tile_cache_pruning(interval_seconds: int) -> None:
+    while True:
+        try:
+            removed = await asyncio.to_thread(
+                prune_tile_cache, config.tile_cache_max_mb * 1024 * 1024
+            )
+            if removed:
+                logger.info(f"Removed {removed} tiles from the tile cache")
+        except Exception as e:
+            logger.error(f"Error pruning the tile cache: {e}")
+
+        await asyncio.sleep(interval_seconds)
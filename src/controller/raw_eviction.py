@@ -0,0 +1,255 @@
+import asyncio
+import os
+import shutil
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import config
+from src.controller.deletion import deletion_queue
+from src.db import AsyncSessionLocal
+from src.logger import get_logger
+from src.models import Scene, SceneStatusEnum
+
+logger = get_logger("glacier_watch")
+
+GB = 1024**3
+
+# any constant works, it only has to be unique among the advisory locks in use
+_EVICTION_LOCK_KEY = 0x65766963  # "evic"
+
+
+def raw_folder_path() -> Path:
+    return config.data_folder_path / "raw"
+
+
+def directory_size(path: Path) -> int:
+    """Total size of the files below a directory, without following symlinks."""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            continue
+    return total
+
+
+def scan_raw_usage() -> dict[str, dict[str, int]]:
+    """Size in bytes of every scene folder, per project: {project: {folder: size}}."""
+    raw_folder = raw_folder_path()
+    if not raw_folder.is_dir():
+        return {}
+
+    usage = {}
+    for project_dir in raw_folder.iterdir():
+        if not project_dir.is_dir() or project_dir.name.startswith("."):
+            continue
+        usage[project_dir.name] = {
+            folder.name: directory_size(folder)
+            for folder in project_dir.iterdir()
+            if folder.is_dir() and not folder.name.startswith(".")
+        }
+    return usage
+
+
+def _scene_folder(project_id: str, scene_id: str, download_path: str) -> str:
+    """Name of the folder under raw/<project_id> holding a scene's download."""
+    project_dir = raw_folder_path() / project_id
+    path = Path(download_path)
+    if not path.is_absolute():
+        path = config.data_folder_path / path
+
+    try:
+        return path.resolve().relative_to(project_dir.resolve()).parts[0]
+    except (ValueError, IndexError):
+        return scene_id
+
+
+@dataclass
+class EvictionCandidate:
+    project_id: str
+    scene_id: str
+    folder_name: str
+    size_bytes: int
+    updated_at: datetime
+
+
+@dataclass
+class EvictionPlan:
+    usage: dict[str, int]
+    quota_bytes: Optional[int]
+    disk_total_bytes: int
+    disk_free_bytes: int
+    min_free_bytes: Optional[int]
+    evictable_bytes: int = 0
+    candidates: list[EvictionCandidate] = field(default_factory=list)
+
+    @property
+    def bytes_to_free(self) -> int:
+        return sum(candidate.size_bytes for candidate in self.candidates)
+
+
+async def _fetch_evictable_scenes(db: AsyncSession):
+    """Processed scenes that still have a download, least recently updated first."""
+    scenes_result = await db.execute(
+        select(
+            Scene.scene_id,
+            Scene.project_id,
+            Scene.download_path,
+            Scene.updated_at,
+        )
+        .where(
+            Scene.status == SceneStatusEnum.processed,
+            Scene.download_path.isnot(None),
+        )
+        .order_by(Scene.updated_at, Scene.scene_id)
+    )
+    return scenes_result.all()
+
+
+async def plan_eviction(db: AsyncSession) -> EvictionPlan:
+    """Decide which raw folders to evict to get back under the configured limits.
+
+    Projects over RAW_PROJECT_QUOTA_GB lose their least recently updated
+    processed scenes first; if the disk still has less than RAW_MIN_FREE_GB
+    free, processed scenes of all projects are evicted in the same order.
+    """
+    folder_sizes = await asyncio.to_thread(scan_raw_usage)
+    disk = await asyncio.to_thread(shutil.disk_usage, config.data_folder_path)
+
+    quota_bytes = int(config.raw_project_quota_gb * GB) or None
+    min_free_bytes = int(config.raw_min_free_gb * GB) or None
+
+    plan = EvictionPlan(
+        usage={project: sum(sizes.values()) for project, sizes in folder_sizes.items()},
+        quota_bytes=quota_bytes,
+        disk_total_bytes=disk.total,
+        disk_free_bytes=disk.free,
+        min_free_bytes=min_free_bytes,
+    )
+
+    candidates = []
+    seen = set()
+    for scene in await _fetch_evictable_scenes(db):
+        folder_name = _scene_folder(
+            scene.project_id, scene.scene_id, scene.download_path
+        )
+        size = folder_sizes.get(scene.project_id, {}).get(folder_name)
+        if size is None or (scene.project_id, folder_name) in seen:
+            continue
+        seen.add((scene.project_id, folder_name))
+        candidates.append(
+            EvictionCandidate(
+                scene.project_id, scene.scene_id, folder_name, size, scene.updated_at
+            )
+        )
+    plan.evictable_bytes = sum(candidate.size_bytes for candidate in candidates)
+
+    remaining = dict(plan.usage)
+    selected = set()
+    if quota_bytes:
+        for index, candidate in enumerate(candidates):
+            if remaining[candidate.project_id] > quota_bytes:
+                selected.add(index)
+                remaining[candidate.project_id] -= candidate.size_bytes
+
+    if min_free_bytes:
+        free = disk.free + sum(candidates[index].size_bytes for index in selected)
+        for index, candidate in enumerate(candidates):
+            if free >= min_free_bytes:
+                break
+            if index not in selected:
+                selected.add(index)
+                free += candidate.size_bytes
+
+    plan.candidates = [candidates[index] for index in sorted(selected)]
+    return plan
+
+
+async def lock_eviction(db: AsyncSession) -> bool:
+    """Take the eviction lock until the session's transaction ends.
+
+    Returns:
+        bool: False if another process is evicting
+    """
+    return bool(
+        await db.scalar(select(func.pg_try_advisory_xact_lock(_EVICTION_LOCK_KEY)))
+    )
+
+
+async def evict(db: AsyncSession, plan: EvictionPlan) -> list[EvictionCandidate]:
+    """Clear the download_path of the planned scenes, then queue their folders
+    for deletion.
+
+    Only scenes still processed and not cleared yet are cleared, and only their
+    folders removed, so a scene picked up again by the pipeline in the meantime
+    keeps its data and no folder is queued twice. Plan and clear under
+    lock_eviction, which the commit here releases.
+    updated_at is kept, it reflects the pipeline's last change to the scene.
+
+    Returns:
+        list[EvictionCandidate]: The evicted folders
+    """
+    if not plan.candidates:
+        return []
+
+    cleared_result = await db.execute(
+        update(Scene)
+        .where(
+            Scene.scene_id.in_([candidate.scene_id for candidate in plan.candidates]),
+            Scene.status == SceneStatusEnum.processed,
+            Scene.download_path.isnot(None),
+        )
+        .values(download_path=None, updated_at=Scene.updated_at)
+        .returning(Scene.scene_id)
+        .execution_options(synchronize_session=False)
+    )
+    cleared = set(cleared_result.scalars().all())
+    await db.commit()
+
+    evicted = [
+        candidate for candidate in plan.candidates if candidate.scene_id in cleared
+    ]
+    if evicted:
+        folders = [
+            raw_folder_path() / candidate.project_id / candidate.folder_name
+            for candidate in evicted
+        ]
+        job = await asyncio.to_thread(deletion_queue.submit, folders)
+        logger.info(
+            f"Evicting {len(evicted)} raw folders in deletion job {job.job_id}: "
+            + ", ".join(job.folders)
+        )
+
+    return evicted
+
+
+async def run_raw_eviction(interval_seconds: int) -> None:
+    while True:
+        try:
+            evicted = []
+            async with AsyncSessionLocal() as db:
+                if await lock_eviction(db):
+                    plan = await plan_eviction(db)
+                    evicted = await evict(db, plan)
+                else:
+                    logger.info("Another process is evicting raw downloads")
+            if evicted:
+                freed = sum(candidate.size_bytes for candidate in evicted)
+                logger.info(
+                    f"Evicted {len(evicted)} raw folders, freed {freed / GB:.2f} GB"
+                )
+        except Exception as e:
+            logger.error(f"Error evicting raw downloads: {e}")
+
+        await asyncio.sleep(interval_seconds)
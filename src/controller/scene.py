@@ -1,9 +1,24 @@
-from typing import Optional, TypedDict
+import base64
+import enum
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Optional, TypedDict
 
-from sqlalchemy import func, select
+import orjson
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    Select,
+    and_,
+    bindparam,
+    func,
+    select,
+    tuple_,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.models import Scene
+from src.controller.scene_stats import record_status_transition
+from src.models import Scene, SceneStatusEnum
 
 
 class SceneRow(TypedDict):
@@ -12,13 +27,91 @@ class SceneRow(TypedDict):
     status: str
 
 
+def acquisition_date_filter(
+    start: Optional[date], end: Optional[date], column=Scene.acquisition_date
+) -> list:
+    """Filter clauses for scenes acquired between two days, both inclusive."""
+    clauses = []
+    if start is not None:
+        clauses.append(column >= datetime.combine(start, time.min))
+    if end is not None:
+        clauses.append(column < datetime.combine(end + timedelta(days=1), time.min))
+    return clauses
+
+
+# a date range key: whether the statement bounds the start and the end
+DateRange = tuple[bool, bool]
+
+
+def _acquisition_date_bounds(with_start: bool, with_end: bool, column) -> list:
+    clauses = []
+    if with_start:
+        clauses.append(column >= bindparam("start", type_=DateTime))
+    if with_end:
+        clauses.append(column < bindparam("end", type_=DateTime))
+    return clauses
+
+
+def date_range_statements(
+    build: Callable[[list], Select], column=Scene.acquisition_date
+) -> dict[DateRange, Select]:
+    """Build a statement once for every combination of optional date bounds.
+
+    build gets the filter clauses on column, which bind the "start" and "end"
+    parameters; pick the statement and parameters with acquisition_date_params.
+    """
+    return {
+        (with_start, with_end): build(
+            _acquisition_date_bounds(with_start, with_end, column)
+        )
+        for with_start in (False, True)
+        for with_end in (False, True)
+    }
+
+
+def acquisition_date_params(
+    start: Optional[date], end: Optional[date]
+) -> tuple[DateRange, dict]:
+    """The date_range_statements key and parameters for days, both inclusive."""
+    params = {}
+    if start is not None:
+        params["start"] = datetime.combine(start, time.min)
+    if end is not None:
+        params["end"] = datetime.combine(end + timedelta(days=1), time.min)
+    return (start is not None, end is not None), params
+
+
+# hot statements are built once; SQLAlchemy caches their compiled form by
+# statement and asyncpg their server-side prepared statement by SQL text
+_SCENE_ROW = select(Scene).where(Scene.scene_id == bindparam("scene_id"))
+
+_SCENES_BY_PROJECT = date_range_statements(
+    lambda date_bounds: (
+        select(Scene.scene_id, Scene.acquisition_date, Scene.status)
+        .where(Scene.project_id == bindparam("project_id"), *date_bounds)
+        .order_by(Scene.acquisition_date.desc(), Scene.scene_id)
+        .limit(bindparam("limit", type_=Integer))
+        .offset(bindparam("offset", type_=Integer))
+    )
+)
+
+_COUNT_SCENES_BY_PROJECT = date_range_statements(
+    lambda date_bounds: (
+        select(func.count())
+        .select_from(Scene)
+        .where(Scene.project_id == bindparam("project_id"), *date_bounds)
+    )
+)
+
+
 async def fetch_scene_row(db: AsyncSession, scene_id: str) -> Optional[Scene]:
-    scene_result = await db.execute(select(Scene).filter(Scene.scene_id == scene_id))
+    scene_result = await db.execute(_SCENE_ROW, {"scene_id": scene_id})
 
     return scene_result.scalar_one_or_none()
 
 
 async def update_scene_status(db: AsyncSession, scene: Scene, new_status: str) -> Scene:
+    await record_status_transition(db, scene, new_status)
     scene.status = new_status
     db.add(scene)
     await db.commit()
@@ -27,21 +120,191 @@ async def update_scene_status(db: AsyncSession, scene: Scene, new_status: str) -
 
 
 async def fetch_scenes_by_project_id(
-    db: AsyncSession, project_id: str, limit: int, offset: int
+    db: AsyncSession,
+    project_id: str,
+    limit: int,
+    offset: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
 ) -> list[SceneRow]:
+    date_range, params = acquisition_date_params(start, end)
     scenes_result = await db.execute(
-        select(Scene.scene_id, Scene.acquisition_date, Scene.status)
-        .filter(Scene.project_id == project_id)
-        .order_by(Scene.acquisition_date.desc())
-        .limit(limit)
-        .offset(offset)
+        _SCENES_BY_PROJECT[date_range],
+        {"project_id": project_id, "limit": limit, "offset": offset, **params},
     )
 
     return scenes_result.all()
 
 
-async def count_scenes_by_project_id(db: AsyncSession, project_id: str) -> int:
+async def count_scenes_by_project_id(
+    db: AsyncSession,
+    project_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> int:
+    date_range, params = acquisition_date_params(start, end)
     total_scenes_result = await db.execute(
-        select(func.count()).select_from(Scene).filter(Scene.project_id == project_id)
+        _COUNT_SCENES_BY_PROJECT[date_range], {"project_id": project_id, **params}
     )
     return total_scenes_result.scalar_one()
+
+
+class CountMode(str, enum.Enum):
+    exact = "exact"
+    estimate = "estimate"
+    none = "none"
+
+
+@dataclass
+class SceneFilters:
+    project_ids: Optional[list[str]] = None
+    statuses: Optional[list[SceneStatusEnum]] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+    min_attempts_download: Optional[int] = None
+    min_attempts_processing: Optional[int] = None
+    has_error: Optional[bool] = None
+
+    def clauses(self) -> list:
+        clauses = acquisition_date_filter(self.start, self.end)
+        if self.project_ids:
+            clauses.append(Scene.project_id.in_(self.project_ids))
+        if self.statuses:
+            clauses.append(Scene.status.in_(self.statuses))
+        if self.min_attempts_download is not None:
+            clauses.append(Scene.attempts_download >= self.min_attempts_download)
+        if self.min_attempts_processing is not None:
+            clauses.append(Scene.attempts_processing >= self.min_attempts_processing)
+        if self.has_error is True:
+            clauses.append(Scene.last_error.isnot(None))
+        elif self.has_error is False:
+            clauses.append(Scene.last_error.is_(None))
+        return clauses
+
+
+SceneCursor = tuple[Optional[datetime], str]
+
+
+def encode_scene_cursor(acquisition_date: Optional[datetime], scene_id: str) -> str:
+    payload = orjson.dumps([acquisition_date, scene_id])
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_scene_cursor(cursor: str) -> SceneCursor:
+    """Decode a cursor from encode_scene_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        acquisition_date, scene_id = orjson.loads(payload)
+        if acquisition_date is not None:
+            acquisition_date = datetime.fromisoformat(acquisition_date)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(scene_id, str):
+        raise ValueError("Invalid cursor")
+    return acquisition_date, scene_id
+
+
+def _after_cursor(cursor: SceneCursor):
+    """Scenes after the cursor in (acquisition_date DESC NULLS LAST, scene_id DESC).
+
+    Only covers the scenes on the cursor's side of NULLS LAST: with a date, the
+    dated scenes after it, without one, the undated scenes after it. A single
+    row comparison is a range of the search index, which an OR would not be.
+    """
+    acquisition_date, scene_id = cursor
+    if acquisition_date is None:
+        return and_(Scene.acquisition_date.is_(None), Scene.scene_id < scene_id)
+    return tuple_(Scene.acquisition_date, Scene.scene_id) < tuple_(
+        acquisition_date, scene_id
+    )
+
+
+async def _fetch_scene_page(db: AsyncSession, clauses: list, limit: int) -> list:
+    result = await db.execute(
+        select(
+            Scene.scene_id,
+            Scene.project_id,
+            Scene.acquisition_date,
+            Scene.status,
+            Scene.attempts_download,
+            Scene.attempts_processing,
+            Scene.last_error,
+        )
+        .filter(*clauses)
+        .order_by(Scene.acquisition_date.desc().nulls_last(), Scene.scene_id.desc())
+        .limit(limit)
+    )
+    return result.all()
+
+
+async def search_scenes(
+    db: AsyncSession,
+    filters: SceneFilters,
+    limit: int,
+    cursor: Optional[SceneCursor] = None,
+) -> tuple[list, Optional[str]]:
+    """One page of scenes matching the filters, newest acquisitions first.
+
+    Returns:
+        tuple[list, Optional[str]]: The scenes and the cursor of the next page,
+            None on the last page
+    """
+    clauses = filters.clauses()
+    if cursor is None:
+        scenes = await _fetch_scene_page(db, clauses, limit + 1)
+    else:
+        scenes = await _fetch_scene_page(
+            db, [*clauses, _after_cursor(cursor)], limit + 1
+        )
+        if cursor[0] is not None and len(scenes) <= limit:
+            # past the last dated scene, the page goes on with the undated ones
+            scenes += await _fetch_scene_page(
+                db,
+                [*clauses, Scene.acquisition_date.is_(None)],
+                limit + 1 - len(scenes),
+            )
+
+    next_cursor = None
+    if len(scenes) > limit:
+        scenes = scenes[:limit]
+        next_cursor = encode_scene_cursor(
+            scenes[-1].acquisition_date, scenes[-1].scene_id
+        )
+
+    return scenes, next_cursor
+
+
+async def count_scenes(
+    db: AsyncSession, filters: SceneFilters, mode: CountMode
+) -> Optional[int]:
+    """Number of scenes matching the filters.
+
+    The estimate is the planner's row estimate for the filtered scan, which
+    costs a planning round trip instead of a scan of all matching rows.
+    """
+    if mode == CountMode.none:
+        return None
+
+    if mode == CountMode.exact:
+        count_result = await db.execute(
+            select(func.count()).select_from(Scene).filter(*filters.clauses())
+        )
+        return count_result.scalar_one()
+
+    # EXPLAIN takes no bind parameters, so the filter values are inlined; the
+    # statement goes to the driver as is, colons and percent signs included
+    conn = await db.connection()
+    filtered = select(Scene.scene_id).filter(*filters.clauses())
+    compiled = filtered.compile(
+        dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan_result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+    plan = plan_result.scalar_one()
+    if isinstance(plan, str):
+        plan = orjson.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
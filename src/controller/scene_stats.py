@@ -0,0 +1,198 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.controller.climatology import HistogramBins, histogram_quantiles
+from src.models import Scene, SceneStageHourly, SceneStatusEnum, SceneStatusTransition
+
+# log10 of the seconds spent in a stage, 1 second to about 115 days in steps of
+# a tenth of a decade
+DURATION_BINS = HistogramBins(0.0, 7.0, 70)
+
+STAGE_QUANTILES = [0.5, 0.9, 0.99]
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+async def _entered_current_status(db: AsyncSession, scene: Scene) -> datetime:
+    """When the scene entered its current status, as far as we know."""
+    last = (
+        await db.execute(
+            select(SceneStatusTransition.to_status, SceneStatusTransition.changed_at)
+            .where(SceneStatusTransition.scene_id == scene.scene_id)
+            .order_by(SceneStatusTransition.changed_at.desc())
+            .limit(1)
+        )
+    ).first()
+    if last is not None and last.to_status == SceneStatusEnum(scene.status).value:
+        return last.changed_at
+
+    # the pipeline changed the status without logging it, or nothing was ever
+    # logged; the last update of the row is the best guess
+    return scene.updated_at
+
+
+async def record_status_transition(
+    db: AsyncSession, scene: Scene, new_status: SceneStatusEnum
+) -> None:
+    """Log a status change and add it to the hourly aggregates.
+
+    Must be called before the scene's status is changed, in the transaction
+    that changes it. Does not commit.
+    """
+    from_status = SceneStatusEnum(scene.status).value
+    to_status = SceneStatusEnum(new_status).value
+    if from_status == to_status:
+        return
+
+    changed_at = datetime.now()
+    entered = await _entered_current_status(db, scene)
+    seconds = (changed_at - entered).total_seconds() if entered else None
+
+    db.add(
+        SceneStatusTransition(
+            scene_id=scene.scene_id,
+            from_status=from_status,
+            to_status=to_status,
+            changed_at=changed_at,
+            seconds_in_stage=seconds,
+        )
+    )
+
+    histogram = np.zeros(DURATION_BINS.count, dtype="int64")
+    if seconds is not None:
+        log_seconds = np.log10(np.array([max(seconds, 1.0)]))
+        histogram[DURATION_BINS.index(log_seconds)] += 1
+
+    stmt = insert(SceneStageHourly).values(
+        hour=_hour(changed_at),
+        from_status=from_status,
+        to_status=to_status,
+        transitions=1,
+        timed_transitions=int(seconds is not None),
+        seconds_sum=seconds or 0.0,
+        histogram=histogram.tolist(),
+    )
+    table = SceneStageHourly.__tablename__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["hour", "from_status", "to_status"],
+        set_={
+            "transitions": SceneStageHourly.transitions + stmt.excluded.transitions,
+            "timed_transitions": SceneStageHourly.timed_transitions
+            + stmt.excluded.timed_transitions,
+            "seconds_sum": SceneStageHourly.seconds_sum + stmt.excluded.seconds_sum,
+            # element-wise sum of the stored and the new histogram
+            "histogram": literal_column(
+                "(SELECT array_agg(stored + added ORDER BY bin) FROM unnest("
+                f"{table}.histogram, excluded.histogram"
+                ") WITH ORDINALITY AS bins(stored, added, bin))"
+            ),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def _fetch_hourly(db: AsyncSession, since: datetime):
+    result = await db.execute(
+        select(
+            SceneStageHourly.hour,
+            SceneStageHourly.from_status,
+            SceneStageHourly.to_status,
+            SceneStageHourly.transitions,
+            SceneStageHourly.timed_transitions,
+            SceneStageHourly.seconds_sum,
+            SceneStageHourly.histogram,
+        )
+        .where(SceneStageHourly.hour >= _hour(since))
+        .order_by(SceneStageHourly.hour)
+    )
+    return result.all()
+
+
+async def fetch_throughput(db: AsyncSession, hours: int) -> list[dict]:
+    """Transitions per stage change over the last hours, in total and per hour."""
+    stages = defaultdict(list)
+    for hour, from_status, to_status, transitions, *_ in await _fetch_hourly(
+        db, datetime.now() - timedelta(hours=hours)
+    ):
+        stages[(from_status, to_status)].append(
+            {"hour": hour, "transitions": transitions}
+        )
+
+    throughput = []
+    for (from_status, to_status), hourly in sorted(stages.items()):
+        total = sum(bucket["transitions"] for bucket in hourly)
+        throughput.append(
+            {
+                "from_status": from_status,
+                "to_status": to_status,
+                "transitions": total,
+                "per_hour": total / hours,
+                "hourly": hourly,
+            }
+        )
+    return throughput
+
+
+async def fetch_time_in_stage(db: AsyncSession, hours: int) -> list[dict]:
+    """Time spent in each stage by the scenes that left it in the last hours."""
+    totals = {}
+    for _, from_status, _, _, timed, seconds_sum, histogram in await _fetch_hourly(
+        db, datetime.now() - timedelta(hours=hours)
+    ):
+        count, total_seconds, summed = totals.get(
+            from_status, (0, 0.0, np.zeros(DURATION_BINS.count, dtype="int64"))
+        )
+        totals[from_status] = (
+            count + timed,
+            total_seconds + seconds_sum,
+            summed + np.asarray(histogram, dtype="int64"),
+        )
+
+    stages = []
+    for stage, (count, total_seconds, histogram) in sorted(totals.items()):
+        quantiles = histogram_quantiles(histogram, DURATION_BINS, STAGE_QUANTILES)
+        p50, p90, p99 = [None if q is None else 10**q for q in quantiles]
+        stages.append(
+            {
+                "stage": stage,
+                "count": count,
+                "mean_seconds": total_seconds / count if count else None,
+                "p50_seconds": p50,
+                "p90_seconds": p90,
+                "p99_seconds": p99,
+            }
+        )
+    return stages
+
+
+async def fetch_queue_depth(db: AsyncSession) -> list[dict]:
+    """Number of scenes in each status, and the age of the oldest one's last update."""
+    result = await db.execute(
+        select(Scene.status, func.count(), func.min(Scene.updated_at)).group_by(
+            Scene.status
+        )
+    )
+    depths = {
+        SceneStatusEnum(status): (count, oldest)
+        for status, count, oldest in result.all()
+    }
+
+    now = datetime.now()
+    queues = []
+    for status in SceneStatusEnum:
+        count, oldest = depths.get(status, (0, None))
+        queues.append(
+            {
+                "status": status.value,
+                "scenes": count,
+                "oldest_seconds": (now - oldest).total_seconds() if oldest else None,
+            }
+        )
+    return queues
@@ -0,0 +1,114 @@
+import asyncio
+from typing import Optional
+
+from sqlalchemy import Index, func, select, text
+from sqlalchemy.schema import CreateIndex
+
+from src.db import engine
+from src.logger import get_logger
+from src.models import (
+    Base,
+    GlacierClimatology,
+    GlacierSnowData,
+    GlacierSnowDataCurrent,
+    ProjectSnowDataVersion,
+    Scene,
+    SceneStageHourly,
+    SceneStatusTransition,
+    SnowDataWatermark,
+)
+
+logger = get_logger("glacier_watch")
+
+# tables only the API writes to; all other tables are created by the pipeline
+API_TABLES = [
+    GlacierClimatology.__table__,
+    GlacierSnowDataCurrent.__table__,
+    SnowDataWatermark.__table__,
+    ProjectSnowDataVersion.__table__,
+    SceneStatusTransition.__table__,
+    SceneStageHourly.__table__,
+]
+
+ENSURE_TABLES_TIMEOUT_SECONDS = 10
+
+# any constant works, it only has to be unique among the advisory locks in use
+_INDEX_LOCK_KEY = 0x69647873  # "idxs"
+
+_INDEX_VALID_SQL = text(
+    "SELECT i.indisvalid FROM pg_index i "
+    "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+)
+
+# indexes the API's queries rely on, on tables created by the pipeline
+API_INDEXES: list[Index] = [
+    index
+    for table in (Scene.__table__, GlacierSnowData.__table__)
+    for index in table.indexes
+    if len(index.columns) > 1
+]
+
+
+async def ensure_tables() -> None:
+    """Create the API's own tables if they do not exist yet."""
+    try:
+        async with asyncio.timeout(ENSURE_TABLES_TIMEOUT_SECONDS):
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all, tables=API_TABLES)
+    except Exception as e:
+        logger.error(f"Failed to ensure the API tables: {e}")
+
+
+def _create_concurrently(conn, index: Index) -> str:
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS, with the columns' ordering."""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+    return ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+
+
+async def _index_valid(conn, name: str) -> Optional[bool]:
+    """Whether an index is valid, None if it does not exist."""
+    result = await conn.execute(_INDEX_VALID_SQL, {"name": name})
+    return result.scalar_one_or_none()
+
+
+async def ensure_indexes() -> None:
+    """Create missing API indexes without blocking writes to the tables.
+
+    CREATE INDEX CONCURRENTLY cannot run inside a transaction, so the
+    statements run on an autocommit connection. A concurrent build that was
+    interrupted leaves an invalid index behind, which IF NOT EXISTS would keep
+    forever; those are dropped and built again. An advisory lock keeps the
+    API processes from working on the indexes at the same time, so an invalid
+    index is never one that another process is still building.
+    """
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.scalar(
+                select(func.pg_try_advisory_lock(_INDEX_LOCK_KEY))
+            )
+            if not locked:
+                logger.info("Another process is ensuring the API indexes")
+                return
+
+            try:
+                for index in API_INDEXES:
+                    valid = await _index_valid(conn, index.name)
+                    if valid:
+                        continue
+
+                    if valid is False:
+                        logger.warning(f"Rebuilding invalid index {index.name}")
+                        await conn.exec_driver_sql(
+                            f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"
+                        )
+
+                    await conn.exec_driver_sql(_create_concurrently(conn, index))
+                    if await _index_valid(conn, index.name):
+                        logger.info(f"Created index {index.name}")
+                    else:
+                        logger.error(f"Index {index.name} is still invalid")
+            finally:
+                await conn.scalar(select(func.pg_advisory_unlock(_INDEX_LOCK_KEY)))
+    except Exception as e:
+        logger.error(f"Failed to ensure the API indexes: {e}")
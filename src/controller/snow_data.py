@@ -0,0 +1,474 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    Select,
+    String,
+    any_,
+    bindparam,
+    delete,
+    exists,
+    func,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.config import config
+from src.controller.climatology import (
+    add_to_climatology,
+    clear_climatology,
+    sync_climatology,
+)
+from src.db import AsyncSessionLocal
+from src.logger import get_logger
+from src.models import (
+    Glacier,
+    GlaciersAnalysisResult,
+    GlacierSnowData,
+    GlacierSnowDataCurrent,
+    ProjectSnowDataVersion,
+    Scene,
+    SnowDataWatermark,
+)
+
+logger = get_logger("glacier_watch")
+
+# any constant works, it only has to be unique among the advisory locks in use
+_ADVISORY_LOCK_KEY = 0x736E6F77  # "snow"
+
+# keeps a multi-row upsert well below the 32767 bind parameter limit
+_UPSERT_CHUNK_ROWS = 2000
+
+# snow data rows per transaction
+UPDATE_BATCH_SIZE = 5000
+
+# how often readers check whether the table is filled, while it is not
+_POPULATED_CHECK_SECONDS = 5
+
+# the watermark table holds a single row
+_WATERMARK_ID = 1
+
+_CURRENT_COLUMNS = (
+    "glacier_id",
+    "scene_id",
+    "project_id",
+    "acquisition_date",
+    "snow_data_id",
+    "analysis_id",
+    "analyzed_at",
+    "snow_area_m2",
+    "snowline_elevation_m",
+)
+
+_SNOW_DATA_COLUMNS = (
+    GlacierSnowData.glacier_id,
+    GlacierSnowData.scene_id,
+    Scene.project_id,
+    Scene.acquisition_date,
+    GlacierSnowData.id.label("snow_data_id"),
+    GlacierSnowData.analysis_id,
+    GlaciersAnalysisResult.created_at.label("analyzed_at"),
+    GlacierSnowData.snow_area_m2,
+    GlacierSnowData.snowline_elevation_m,
+)
+
+
+def _latest_snow_data(*clauses) -> Select:
+    """The latest row per glacier and scene among the analyses matching clauses."""
+    return (
+        select(*_SNOW_DATA_COLUMNS)
+        .join(
+            GlaciersAnalysisResult,
+            GlacierSnowData.analysis_id == GlaciersAnalysisResult.id,
+        )
+        .join(Scene, GlacierSnowData.scene_id == Scene.scene_id)
+        .where(*clauses)
+        .distinct(GlacierSnowData.glacier_id, GlacierSnowData.scene_id)
+        .order_by(
+            GlacierSnowData.glacier_id,
+            GlacierSnowData.scene_id,
+            GlaciersAnalysisResult.created_at.desc(),
+            GlaciersAnalysisResult.id.desc(),
+        )
+    )
+
+
+_LATEST_SNOW_DATA = (
+    _latest_snow_data(
+        GlacierSnowData.scene_id == any_(bindparam("scene_ids", type_=ARRAY(String)))
+    )
+    .add_columns(Glacier.area_m2)
+    .join(Glacier, GlacierSnowData.glacier_id == Glacier.glacier_id)
+)
+
+_CURRENT_SNOW_DATA = (
+    select(
+        *(getattr(GlacierSnowDataCurrent, column) for column in _CURRENT_COLUMNS),
+        Glacier.area_m2,
+    )
+    .join(Glacier, GlacierSnowDataCurrent.glacier_id == Glacier.glacier_id)
+    .where(
+        GlacierSnowDataCurrent.scene_id
+        == any_(bindparam("scene_ids", type_=ARRAY(String)))
+    )
+)
+
+# rows after the cursor in (created_at, id) order that are not current, with
+# the glacier's area
+_NEW_SNOW_DATA = (
+    select(*_SNOW_DATA_COLUMNS, Glacier.area_m2, GlacierSnowData.created_at)
+    .join(
+        GlaciersAnalysisResult,
+        GlacierSnowData.analysis_id == GlaciersAnalysisResult.id,
+    )
+    .join(Scene, GlacierSnowData.scene_id == Scene.scene_id)
+    .join(Glacier, GlacierSnowData.glacier_id == Glacier.glacier_id)
+    .where(
+        tuple_(GlacierSnowData.created_at, GlacierSnowData.id)
+        > tuple_(
+            bindparam("created_at", type_=DateTime),
+            bindparam("snow_data_id", type_=String),
+        ),
+        ~exists().where(GlacierSnowDataCurrent.snow_data_id == GlacierSnowData.id),
+    )
+    .order_by(GlacierSnowData.created_at, GlacierSnowData.id)
+    .limit(bindparam("batch_size", type_=Integer))
+)
+
+# current rows whose snow data was deleted, with the glacier's area
+_DELETED_SNOW_DATA = (
+    select(
+        *(getattr(GlacierSnowDataCurrent, column) for column in _CURRENT_COLUMNS),
+        Glacier.area_m2,
+    )
+    .join(Glacier, GlacierSnowDataCurrent.glacier_id == Glacier.glacier_id)
+    .where(GlacierSnowDataCurrent.snow_data_id.is_(None))
+    .limit(bindparam("batch_size", type_=Integer))
+)
+
+# glacier_snow_data_current computed from all analyses on every read, for the
+# readers while the table is being filled; the analysis time stands in for
+# updated_at
+_all_latest = _latest_snow_data().add_columns(
+    GlaciersAnalysisResult.created_at.label("updated_at")
+)
+LatestSnowData = aliased(
+    GlacierSnowDataCurrent,
+    _all_latest.subquery("latest_snow_data"),
+    adapt_on_names=True,
+)
+
+_CAUGHT_UP = select(SnowDataWatermark.caught_up_at).where(
+    SnowDataWatermark.id == _WATERMARK_ID
+)
+
+
+class CurrentSnowDataState:
+    """Whether glacier_snow_data_current is filled, in this process.
+
+    It is once the updater got through all snow data for the first time, as
+    recorded in the watermark; from then on the table trails glacier_snow_data
+    by one update interval at most. That does not change back, so the answer
+    is kept once it is yes.
+    """
+
+    def __init__(self) -> None:
+        self.populated = False
+        self._checked_at = 0.0
+
+    async def is_populated(self, db: AsyncSession) -> bool:
+        if self.populated:
+            return True
+
+        now = time.monotonic()
+        if now - self._checked_at < _POPULATED_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+
+        # on the reader's session, a lagging replica only delays the switch
+        if await db.scalar(_CAUGHT_UP) is not None:
+            logger.info("Current snow data is filled, reading it from now on")
+            self.populated = True
+        return self.populated
+
+
+current_snow_data = CurrentSnowDataState()
+
+
+# by whether glacier_snow_data_current is filled, for statements built up front
+SNOW_DATA_SOURCES = {True: GlacierSnowDataCurrent, False: LatestSnowData}
+
+
+async def snow_data_source(db: AsyncSession):
+    """The entity holding the latest analysis of every glacier and scene.
+
+    glacier_snow_data_current, or LatestSnowData with the same columns while
+    the table is being filled.
+    """
+    return SNOW_DATA_SOURCES[await current_snow_data.is_populated(db)]
+
+
+def _supersedes(row, current) -> bool:
+    return (row.analyzed_at, row.analysis_id) > (
+        current.analyzed_at,
+        current.analysis_id,
+    )
+
+
+async def _upsert_current(db: AsyncSession, rows: list) -> None:
+    for offset in range(0, len(rows), _UPSERT_CHUNK_ROWS):
+        chunk = rows[offset : offset + _UPSERT_CHUNK_ROWS]
+        stmt = insert(GlacierSnowDataCurrent).values(
+            [
+                {column: getattr(row, column) for column in _CURRENT_COLUMNS}
+                for row in chunk
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["glacier_id", "scene_id"],
+            set_={
+                **{
+                    column: stmt.excluded[column]
+                    for column in _CURRENT_COLUMNS
+                    if column not in ("glacier_id", "scene_id")
+                },
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+
+
+async def apply_snow_data(db: AsyncSession, rows: list) -> tuple[list, list]:
+    """Make snow data rows current wherever they are the latest analysis.
+
+    Must run under the updater's lock, which keeps other updaters
+    from changing the rows between reading and replacing them.
+
+    Returns:
+        tuple[list, list]: The rows that became current and the rows they
+            replaced, both with the glacier's area_m2
+    """
+    latest = {}
+    for row in rows:
+        key = (row.glacier_id, row.scene_id)
+        if key not in latest or _supersedes(row, latest[key]):
+            latest[key] = row
+    if not latest:
+        return [], []
+
+    scene_ids = list({scene_id for _, scene_id in latest})
+    current = {
+        (row.glacier_id, row.scene_id): row
+        for row in await db.execute(_CURRENT_SNOW_DATA, {"scene_ids": scene_ids})
+    }
+
+    added, replaced = [], []
+    for key, row in latest.items():
+        existing = current.get(key)
+        if existing is not None:
+            # rows read out of order never override a later analysis
+            if not _supersedes(row, existing):
+                continue
+            replaced.append(existing)
+        added.append(row)
+
+    await _upsert_current(db, added)
+    return added, replaced
+
+
+async def remove_deleted_snow_data(
+    db: AsyncSession, batch_size: int
+) -> tuple[list, list]:
+    """Replace current rows whose snow data was deleted.
+
+    The latest remaining analysis of the glacier and scene takes their place,
+    if there is one. Must run under the updater's lock.
+
+    Returns:
+        tuple[list, list]: The rows that became current and the rows removed,
+            both with the glacier's area_m2
+    """
+    removed = (await db.execute(_DELETED_SNOW_DATA, {"batch_size": batch_size})).all()
+    if not removed:
+        return [], []
+
+    keys = {(row.glacier_id, row.scene_id) for row in removed}
+    await db.execute(
+        delete(GlacierSnowDataCurrent).where(
+            tuple_(
+                GlacierSnowDataCurrent.glacier_id, GlacierSnowDataCurrent.scene_id
+            ).in_(list(keys))
+        )
+    )
+
+    scene_ids = list({scene_id for _, scene_id in keys})
+    added = [
+        row
+        for row in await db.execute(_LATEST_SNOW_DATA, {"scene_ids": scene_ids})
+        if (row.glacier_id, row.scene_id) in keys
+    ]
+    await _upsert_current(db, added)
+    return added, removed
+
+
+async def _bump_versions(db: AsyncSession, project_ids: set[str]) -> None:
+    if not project_ids:
+        return
+
+    stmt = insert(ProjectSnowDataVersion).values(
+        [{"project_id": project_id, "version": 1} for project_id in sorted(project_ids)]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["project_id"],
+        set_={"version": ProjectSnowDataVersion.version + 1, "updated_at": func.now()},
+    )
+    await db.execute(stmt)
+
+
+async def invalidate_snow_data_versions() -> None:
+    """Change the snow data version of every project.
+
+    For changes to the glacier areas, which snow_area_fraction is relative to.
+    """
+    async with AsyncSessionLocal() as db, db.begin():
+        await db.execute(
+            update(ProjectSnowDataVersion).values(
+                version=ProjectSnowDataVersion.version + 1, updated_at=func.now()
+            )
+        )
+
+
+async def _watermark(db: AsyncSession) -> SnowDataWatermark:
+    await db.execute(
+        insert(SnowDataWatermark).values(id=_WATERMARK_ID).on_conflict_do_nothing()
+    )
+    return await db.get(SnowDataWatermark, _WATERMARK_ID)
+
+
+def _lookback_cursor(watermark: SnowDataWatermark) -> tuple[datetime, str]:
+    """Where reading starts, commit lag behind the latest row applied."""
+    if watermark.created_at is None:
+        return datetime.min, ""
+    lag = timedelta(seconds=config.snow_data_commit_lag_seconds)
+    return watermark.created_at - lag, ""
+
+
+async def _update_batch(
+    db: AsyncSession, cursor: Optional[tuple[datetime, str]], batch_size: int
+) -> Optional[tuple[int, tuple[datetime, str]]]:
+    """Apply the next batch of new and deleted snow data in one transaction.
+
+    Args:
+        db: Session in a transaction
+        cursor: (created_at, id) of the last row the previous batch read,
+            None to start at the watermark
+        batch_size: Rows to read
+
+    Returns:
+        Optional[tuple[int, tuple]]: Number of rows read and the cursor after
+            them, or None if another process holds the updater lock
+    """
+    locked = await db.scalar(select(func.pg_try_advisory_xact_lock(_ADVISORY_LOCK_KEY)))
+    if not locked:
+        return None
+
+    await sync_climatology(db)
+    watermark = await _watermark(db)
+    if cursor is None:
+        cursor = _lookback_cursor(watermark)
+
+    added, removed = await remove_deleted_snow_data(db, batch_size)
+
+    rows = (
+        await db.execute(
+            _NEW_SNOW_DATA,
+            {
+                "created_at": cursor[0],
+                "snow_data_id": cursor[1],
+                "batch_size": batch_size,
+            },
+        )
+    ).all()
+    new, replaced = await apply_snow_data(db, rows)
+
+    if config.climatology_enabled:
+        await add_to_climatology(db, added + new, removed + replaced)
+    await _bump_versions(
+        db,
+        {
+            row.project_id
+            for row in added + new + removed + replaced
+            if row.project_id is not None
+        },
+    )
+
+    if rows:
+        cursor = (rows[-1].created_at, rows[-1].snow_data_id)
+        if watermark.created_at is None or cursor[0] > watermark.created_at:
+            watermark.created_at = cursor[0]
+    if len(rows) < batch_size and watermark.caught_up_at is None:
+        logger.info("The current snow data caught up with all snow data")
+        watermark.caught_up_at = datetime.now()
+
+    return len(removed) + len(rows), cursor
+
+
+async def update_snow_data(batch_size: int = UPDATE_BATCH_SIZE) -> int:
+    """Apply new and deleted snow data to the current snow data and the climatology.
+
+    New rows are read in (created_at, id) order, starting commit lag behind
+    the watermark committed with every batch, so rows the pipeline commits
+    late are still applied; rows that are current already are skipped, and
+    an older analysis never replaces a later one. Deleted rows are the
+    current ones whose snow_data_id the database cleared. An advisory lock
+    keeps several API processes from working at the same time.
+
+    Returns:
+        int: Number of rows read
+    """
+    read = 0
+    cursor = None
+    started = time.perf_counter()
+    while True:
+        async with AsyncSessionLocal() as db, db.begin():
+            batch = await _update_batch(db, cursor, batch_size)
+
+        if batch is None:
+            break
+        count, cursor = batch
+        read += count
+        # a full batch of either kind means there may be more
+        if count < batch_size:
+            break
+
+    if read:
+        logger.info(
+            f"Applied {read} snow data rows to the current snow data "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+    return read
+
+
+async def reset_climatology() -> None:
+    """Drop the aggregates, the next update rebuilds them from the current snow data."""
+    async with AsyncSessionLocal() as db, db.begin():
+        await db.execute(select(func.pg_advisory_xact_lock(_ADVISORY_LOCK_KEY)))
+        await clear_climatology(db)
+
+
+async def run_snow_data_updates(interval_seconds: int) -> None:
+    while True:
+        try:
+            await update_snow_data()
+        except Exception as e:
+            logger.error(f"Error updating the current snow data: {e}")
+
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,142 @@
+import enum
+import hashlib
+from collections import OrderedDict
+from datetime import date
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import config
+from src.controller.scene import acquisition_date_filter
+from src.controller.snow_data import current_snow_data, snow_data_source
+from src.models import Glacier, ProjectSnowDataVersion
+
+
+class SnowMetric(str, enum.Enum):
+    snowline_elevation_m = "snowline_elevation_m"
+    snow_area_fraction = "snow_area_fraction"
+
+
+def _metric_column(source, metric: SnowMetric):
+    if metric == SnowMetric.snowline_elevation_m:
+        return source.snowline_elevation_m
+    return source.snow_area_m2 / func.nullif(Glacier.area_m2, 0)
+
+
+MatrixKey = tuple[str, SnowMetric, Optional[date], Optional[date]]
+
+
+class SnowMatrixCache:
+    """LRU of serialized matrices, valid as long as the project's data version is."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[MatrixKey, tuple[str, bytes]] = OrderedDict()
+
+    def get(self, key: MatrixKey, version: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: MatrixKey, version: str, content: bytes) -> None:
+        self._entries[key] = (version, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+snow_matrix_cache = SnowMatrixCache(config.snow_matrix_cache_size)
+
+
+_SNOW_DATA_VERSION = select(
+    ProjectSnowDataVersion.version, ProjectSnowDataVersion.updated_at
+).where(ProjectSnowDataVersion.project_id == bindparam("project_id"))
+
+
+async def fetch_snow_data_version(db: AsyncSession, project_id: str) -> Optional[str]:
+    """Fingerprint of a project's snow data that changes with every update.
+
+    The snow data updater bumps the version in the transaction that changes
+    the project's current snow data, and the glacier commands bump all of
+    them when areas change, as snow_area_fraction is relative to them. Read in
+    the matrix's snapshot, so it is also correct on a replica.
+
+    Returns:
+        Optional[str]: The fingerprint, None while the current snow data is
+            being filled and the matrix is computed from all analyses
+    """
+    if not await current_snow_data.is_populated(db):
+        return None
+
+    result = await db.execute(_SNOW_DATA_VERSION, {"project_id": project_id})
+    version, updated_at = result.one_or_none() or (0, None)
+
+    # updated_at tells versions apart if the table is ever recreated
+    fingerprint = f"{project_id}:{version}:{updated_at}"
+    return hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest()
+
+
+async def fetch_snow_matrix_cells(
+    db: AsyncSession,
+    project_id: str,
+    metric: SnowMetric,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """(glacier_id, day, value) for every glacier and acquisition day with data.
+
+    Only the latest analysis of each scene counts; results of several scenes
+    of the same glacier and day are averaged.
+    """
+    source = await snow_data_source(db)
+    day = func.date(source.acquisition_date).label("day")
+    cells = await db.execute(
+        select(
+            source.glacier_id,
+            day,
+            func.avg(_metric_column(source, metric)).label("value"),
+        )
+        .select_from(source)
+        .join(Glacier, source.glacier_id == Glacier.glacier_id)
+        .where(
+            source.project_id == project_id,
+            *acquisition_date_filter(start, end, source.acquisition_date),
+        )
+        .group_by(source.glacier_id, day)
+    )
+    return cells.all()
+
+
+def build_snow_matrix(cells) -> dict:
+    """Densify (glacier_id, day, value) cells into a columnar glacier x day matrix.
+
+    Returns:
+        dict: glacier_ids and dates (both sorted) and values, one row per
+            glacier with None where a glacier has no data for a day
+    """
+    if not cells:
+        return {"glacier_ids": [], "dates": [], "values": []}
+
+    glacier_ids, days, values = zip(*cells)
+    glacier_axis, glacier_index = np.unique(
+        np.asarray(glacier_ids, dtype=object), return_inverse=True
+    )
+    date_axis, date_index = np.unique(
+        np.asarray(days, dtype="datetime64[D]"), return_inverse=True
+    )
+
+    matrix = np.full((len(glacier_axis), len(date_axis)), np.nan)
+    matrix[glacier_index, date_index] = np.asarray(values, dtype="float64")
+
+    rows = matrix.astype(object)
+    rows[np.isnan(matrix)] = None
+
+    return {
+        "glacier_ids": glacier_axis.tolist(),
+        "dates": date_axis.astype(str).tolist(),
+        "values": rows.tolist(),
+    }
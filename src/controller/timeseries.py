@@ -0,0 +1,230 @@
+import enum
+import warnings
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# values the rolling median copies out of the windows at a time, 32 MB of float64
+_MEDIAN_CHUNK_VALUES = 4_000_000
+
+
+class Frequency(str, enum.Enum):
+    daily = "daily"
+    weekly = "weekly"
+
+    @property
+    def step_days(self) -> int:
+        return 7 if self == Frequency.weekly else 1
+
+
+class Interpolation(str, enum.Enum):
+    none = "none"
+    linear = "linear"
+    nearest = "nearest"
+
+
+class Smoothing(str, enum.Enum):
+    none = "none"
+    median = "median"
+    savgol = "savgol"
+
+
+@dataclass(frozen=True)
+class RegularizeOptions:
+    frequency: Frequency
+    interpolation: Interpolation = Interpolation.none
+    # gaps between observations longer than this are left empty
+    max_gap_days: Optional[int] = None
+    smoothing: Smoothing = Smoothing.none
+    # in grid steps, odd
+    window: int = 5
+    polyorder: int = 2
+
+    def validate(self) -> None:
+        """Raises ValueError for inconsistent smoothing parameters."""
+        if self.smoothing == Smoothing.none:
+            return
+        if self.window < 3 or self.window % 2 == 0:
+            raise ValueError("window must be an odd number of at least 3")
+        if self.smoothing == Smoothing.savgol and self.polyorder >= self.window:
+            raise ValueError("polyorder must be smaller than window")
+
+
+def grid_size(start: date, end: date, step_days: int) -> int:
+    """Number of grid cells from start to end, both included."""
+    return (end - start).days // step_days + 1
+
+
+def to_grid(
+    rows: np.ndarray,
+    days: np.ndarray,
+    values: np.ndarray,
+    n_rows: int,
+    start: date,
+    end: date,
+    step_days: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Average irregular observations into a rows x grid cells matrix.
+
+    Args:
+        rows (np.ndarray): Row index of every observation
+        days (np.ndarray): Observation days, datetime64[D]
+        values (np.ndarray): Observed values, NaN for missing
+        n_rows (int): Number of rows of the matrix
+        start (date): First day of the grid
+        end (date): Last day of the grid
+        step_days (int): Days per grid cell
+
+    Returns:
+        tuple: The grid days (first day of each cell), the matrix with NaN for
+            cells without observations, and the observation count per cell
+    """
+    first = np.datetime64(start, "D")
+    n_cells = grid_size(start, end, step_days)
+    grid = first + np.arange(n_cells) * np.timedelta64(step_days, "D")
+
+    cells = (days - first).astype(int) // step_days
+    keep = ~np.isnan(values) & (cells >= 0) & (cells < n_cells)
+
+    sums = np.zeros((n_rows, n_cells))
+    counts = np.zeros((n_rows, n_cells), dtype=np.int64)
+    np.add.at(sums, (rows[keep], cells[keep]), values[keep])
+    np.add.at(counts, (rows[keep], cells[keep]), 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = sums / counts
+
+    return grid, matrix, counts
+
+
+def fill_gaps(
+    matrix: np.ndarray, method: Interpolation, max_gap_steps: Optional[int] = None
+) -> np.ndarray:
+    """Fill empty cells between observations of each row.
+
+    Cells before the first or after the last observation of a row are never
+    filled, and neither are gaps between two observations more than
+    max_gap_steps cells apart.
+    """
+    if method == Interpolation.none:
+        return matrix
+
+    n_rows, n_cells = matrix.shape
+    valid = ~np.isnan(matrix)
+    index = np.arange(n_cells)
+
+    # index of the closest observation before and after every cell
+    previous = np.maximum.accumulate(np.where(valid, index, -1), axis=1)
+    reversed_index = np.where(valid, index, n_cells)[:, ::-1]
+    following = np.minimum.accumulate(reversed_index, axis=1)[:, ::-1]
+
+    fill = ~valid & (previous >= 0) & (following < n_cells)
+    if max_gap_steps is not None:
+        fill &= following - previous <= max_gap_steps
+
+    row_index = np.arange(n_rows)[:, None]
+    before = matrix[row_index, np.clip(previous, 0, n_cells - 1)]
+    after = matrix[row_index, np.clip(following, 0, n_cells - 1)]
+
+    if method == Interpolation.linear:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = (index - previous) / (following - previous)
+        filled = before + (after - before) * weight
+    else:
+        filled = np.where(index - previous <= following - index, before, after)
+
+    result = matrix.copy()
+    result[fill] = filled[fill]
+    return result
+
+
+def savgol_coefficients(window: int, polyorder: int) -> np.ndarray:
+    """Savitzky-Golay weights giving the fitted polynomial's value at the center."""
+    half = window // 2
+    vander = np.vander(np.arange(-half, half + 1), polyorder + 1, increasing=True)
+    return np.linalg.pinv(vander)[0]
+
+
+def _rolling_nanmedian(windows: np.ndarray) -> np.ndarray:
+    """Median of every window, copying a bounded block of windows at a time.
+
+    np.nanmedian copies its input, for all windows at once that is rows x
+    cells x window values.
+    """
+    n_rows, n_cells, window = windows.shape
+    block_cells = min(max(_MEDIAN_CHUNK_VALUES // window, 1), n_cells)
+    block_rows = max(_MEDIAN_CHUNK_VALUES // (window * block_cells), 1)
+
+    result = np.empty((n_rows, n_cells))
+    with warnings.catch_warnings():
+        # windows without any observation, their center is empty anyway
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for row in range(0, n_rows, block_rows):
+            for cell in range(0, n_cells, block_cells):
+                block = windows[row : row + block_rows, cell : cell + block_cells]
+                result[row : row + block_rows, cell : cell + block_cells] = (
+                    np.nanmedian(block, axis=-1)
+                )
+    return result
+
+
+def smooth(
+    matrix: np.ndarray, method: Smoothing, window: int, polyorder: int = 2
+) -> np.ndarray:
+    """Smooth each row with a centered rolling median or Savitzky-Golay filter.
+
+    Empty cells stay empty. The median ignores empty cells in the window; the
+    Savitzky-Golay filter needs a full window and keeps the unsmoothed value
+    next to gaps and at the ends of the series.
+    """
+    if method == Smoothing.none:
+        return matrix
+
+    half = window // 2
+    padded = np.pad(matrix, ((0, 0), (half, half)), constant_values=np.nan)
+    windows = sliding_window_view(padded, window, axis=1)
+
+    if method == Smoothing.median:
+        smoothed = _rolling_nanmedian(windows)
+    else:
+        smoothed = windows @ savgol_coefficients(window, polyorder)
+        smoothed = np.where(np.isnan(smoothed), matrix, smoothed)
+
+    return np.where(np.isnan(matrix), np.nan, smoothed)
+
+
+def regularize(
+    rows: np.ndarray,
+    days: np.ndarray,
+    values: np.ndarray,
+    n_rows: int,
+    start: date,
+    end: date,
+    options: RegularizeOptions,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Grid, gap fill and smooth the observations of many series at once.
+
+    Returns:
+        tuple: The grid days, the rows x days matrix and the observation count
+            per cell
+    """
+    step_days = options.frequency.step_days
+    grid, matrix, counts = to_grid(rows, days, values, n_rows, start, end, step_days)
+
+    max_gap_steps = (
+        options.max_gap_days // step_days if options.max_gap_days is not None else None
+    )
+    matrix = fill_gaps(matrix, options.interpolation, max_gap_steps)
+    matrix = smooth(matrix, options.smoothing, options.window, options.polyorder)
+
+    return grid, matrix, counts
+
+
+def to_nullable_lists(matrix: np.ndarray) -> list:
+    """Matrix as nested lists with None for NaN, ready for JSON."""
+    rows = matrix.astype(object)
+    rows[np.isnan(matrix)] = None
+    return rows.tolist()
@@ -0,0 +1,123 @@
+import asyncio
+import importlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from src.controller.glacier import (
+    fetch_glacier_area,
+    fetch_glacier_details,
+    fetch_glacier_in_geometry,
+    fetch_glacier_timeseries,
+)
+from src.controller.project import (
+    fetch_project_row,
+    fetch_projects,
+    fetch_projects_bounds,
+    read_project_configs,
+)
+from src.controller.scene import count_scenes_by_project_id, fetch_scenes_by_project_id
+from src.db import AsyncSessionLocal, replica_pool
+from src.logger import get_logger
+
+logger = get_logger("glacier_watch")
+
+# imported lazily by the request paths, loaded here so no request pays for them
+LAZY_MODULES = (
+    "numpy",
+    "shapely",
+    "geoalchemy2.shape",
+    "yaml",
+    "pyogrio",
+    "src.utils.geometry",
+    "src.utils.topojson",
+)
+
+WARMUP_TIMEOUT_SECONDS = 60
+
+# an id that matches nothing, used to run the single-row statements
+_MISSING_ID = "__warmup__"
+
+
+@dataclass
+class WarmupState:
+    finished: bool = False
+    duration_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+warmup_state = WarmupState()
+
+
+def _import_lazy_modules() -> None:
+    for module in LAZY_MODULES:
+        importlib.import_module(module)
+
+
+async def _warm_connection(session_factory) -> list[str]:
+    """Run the hot statements once on one pooled connection.
+
+    This compiles them into SQLAlchemy's statement cache, prepares them in
+    asyncpg's per-connection statement cache and makes the backend load PostGIS.
+    """
+    async with session_factory() as db:
+        projects = await fetch_projects(db)
+        await fetch_projects_bounds(db)
+
+        project_id = projects[0].project_id if projects else _MISSING_ID
+        project = await fetch_project_row(db, project_id)
+        if project is not None:
+            await fetch_glacier_in_geometry(db, project.area_of_interest)
+        await fetch_scenes_by_project_id(db, project_id, 100, 0)
+        await count_scenes_by_project_id(db, project_id)
+
+        await fetch_glacier_area(db, _MISSING_ID)
+        await fetch_glacier_details(db, _MISSING_ID)
+        await fetch_glacier_timeseries(db, _MISSING_ID)
+
+    return [project.project_id for project in projects]
+
+
+async def warm_up(connections: int) -> None:
+    """Prefill the connection pool and warm statement, module and config caches.
+
+    Failures are logged and never raised; readiness then only depends on the
+    database check.
+    """
+    started = time.perf_counter()
+    try:
+        async with asyncio.timeout(WARMUP_TIMEOUT_SECONDS):
+            await asyncio.to_thread(_import_lazy_modules)
+
+            # concurrent sessions check out distinct connections, filling the pools
+            session_factories = [AsyncSessionLocal, *replica_pool.session_factories]
+            results = await asyncio.gather(
+                *(
+                    _warm_connection(session_factory)
+                    for session_factory in session_factories
+                    for _ in range(max(connections, 1))
+                ),
+                return_exceptions=True,
+            )
+
+            failures = [r for r in results if isinstance(r, BaseException)]
+            if len(failures) == len(results):
+                raise failures[0]
+            if failures:
+                logger.warning(
+                    f"{len(failures)} warmup connections failed: {failures[0]}"
+                )
+
+            project_ids = next(r for r in results if not isinstance(r, BaseException))
+            configs = await asyncio.to_thread(read_project_configs, project_ids)
+    except Exception as e:
+        warmup_state.error = str(e) or type(e).__name__
+        logger.error(f"Warmup failed: {warmup_state.error}")
+    else:
+        logger.info(
+            f"Warmed up {connections} connections on {len(session_factories)} "
+            f"databases and {len(configs)} project configs"
+        )
+    finally:
+        warmup_state.duration_seconds = time.perf_counter() - started
+        warmup_state.finished = True
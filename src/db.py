@@ -1,24 +1,255 @@
 # app/db.py
+import asyncio
+import itertools
+import time
 from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Optional
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Request, Response
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from src.config import config
 from src.logger import get_logger
+from src.utils.admission import (
+    AdmissionGate,
+    AdmissionRejected,
+    Priority,
+    route_priority,
+    service_unavailable,
+)
+from src.utils.profiling import instrument_engine
 
 logger = get_logger("glacier_watch.db")
 
 logger.debug("Connecting to database")
 
-engine = create_async_engine(
-    config.database_url, echo=False, pool_pre_ping=True, future=True
-)
+# set after writes, so the same client reads from the primary for a while
+READ_PRIMARY_COOKIE = "gw_read_primary_until"
+# lets clients without cookies, like the pipeline, force reads from the primary
+READ_PRIMARY_HEADER = "x-read-primary"
+
+# replication lag in seconds, 0 when the replica has replayed everything it received
+_REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    url = make_url(url)
+    if (
+        url.get_driver_name() == "asyncpg"
+        and "prepared_statement_cache_size" not in url.query
+    ):
+        # statements are prepared once per connection and reused by every
+        # request on it while they stay in this LRU cache
+        url = url.update_query_dict(
+            {
+                "prepared_statement_cache_size": str(
+                    config.db_prepared_statement_cache_size
+                )
+            }
+        )
+
+    engine = create_async_engine(
+        url,
+        echo=False,
+        pool_pre_ping=True,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        future=True,
+    )
+    instrument_engine(engine)
+    return engine
+
+
+class GatedSessionFactory:
+    """Opens sessions only after the engine's admission gate lets the caller in.
+
+    The gate has as many slots as the pool has connections, so requests wait
+    in priority order in front of the pool instead of inside it, and give up
+    with a 503 once the wait exceeds ADMISSION_TIMEOUT_SECONDS.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, name: str) -> None:
+        self.session_factory = session_factory
+        self.gate = AdmissionGate(
+            name,
+            config.db_pool_size + config.db_max_overflow,
+            config.admission_max_queue,
+        )
+
+    @asynccontextmanager
+    async def __call__(
+        self, priority: Priority = Priority.read
+    ) -> AsyncGenerator[AsyncSession, None]:
+        try:
+            await self.gate.acquire(priority, config.admission_timeout_seconds)
+        except AdmissionRejected as e:
+            logger.warning(f"Shed {priority.name} request: {e}")
+            raise service_unavailable()
+
+        try:
+            async with self.session_factory() as session:
+                yield session
+        finally:
+            self.gate.release()
+
+
+engine = _create_engine(config.database_url)
 
 AsyncSessionLocal = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+primary_sessions = GatedSessionFactory(AsyncSessionLocal, "primary")
+
+
+class _Replica:
+    def __init__(self, url: str) -> None:
+        self.engine = _create_engine(url)
+        self.session_factory = async_sessionmaker(
+            self.engine, class_=AsyncSession, expire_on_commit=False
+        )
+        self.name = self.engine.url.render_as_string(hide_password=True)
+        self.sessions = GatedSessionFactory(self.session_factory, self.name)
+        self.healthy = True
+
+
+class ReplicaPool:
+    """Round-robin over the healthy read replicas.
+
+    Replicas that fail a health check, or lag behind the primary by more than
+    the configured limit, are skipped until a later check succeeds. Without any
+    healthy replica, reads fall back to the primary.
+    """
+
+    def __init__(self, urls: list[str], max_lag_seconds: float) -> None:
+        self.replicas = [_Replica(url) for url in urls]
+        self.max_lag_seconds = max_lag_seconds
+        self._counter = itertools.count()
+
+    @property
+    def session_factories(self) -> list[async_sessionmaker]:
+        return [replica.session_factory for replica in self.replicas]
+
+    def session_factory(self) -> GatedSessionFactory:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return primary_sessions
+        return healthy[next(self._counter) % len(healthy)].sessions
+
+    async def _check(self, replica: _Replica, timeout: float) -> None:
+        try:
+            async with asyncio.timeout(timeout):
+                async with replica.engine.connect() as conn:
+                    lag = (await conn.exec_driver_sql(_REPLICA_LAG_SQL)).scalar()
+            healthy = float(lag or 0) <= self.max_lag_seconds
+            reason = f"replication lag {float(lag or 0):.1f}s"
+        except Exception as e:
+            healthy = False
+            reason = str(e) or type(e).__name__
+
+        if healthy != replica.healthy:
+            if healthy:
+                logger.info(f"Read replica {replica.name} is healthy again")
+            else:
+                logger.warning(f"Read replica {replica.name} is unhealthy: {reason}")
+        replica.healthy = healthy
+
+    async def check_health(self, timeout: float = 2.0) -> None:
+        await asyncio.gather(
+            *(self._check(replica, timeout) for replica in self.replicas)
+        )
+
+    async def run(self, interval_seconds: int) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(interval_seconds)
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replica_pool = ReplicaPool(config.database_replica_urls, config.replica_max_lag_seconds)
+
+
+def _reads_from_primary(request: Request) -> bool:
+    if request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true"):
+        return True
+
+    read_primary_until: Optional[str] = request.cookies.get(READ_PRIMARY_COOKIE)
+    try:
+        return (
+            read_primary_until is not None and float(read_primary_until) > time.time()
+        )
+    except ValueError:
+        return False
+
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def read_session_factory(request: Request) -> GatedSessionFactory:
+    """Session factory for a read-only request, a replica when one is configured.
+
+    Clients that wrote recently (see get_write_db_session) or send the
+    X-Read-Primary header read from the primary instead.
+    """
+    if not replica_pool.replicas or _reads_from_primary(request):
+        return primary_sessions
+    return replica_pool.session_factory()
+
+
+async def get_read_db_session(
+    request: Request,
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only routes, see read_session_factory."""
+    async with read_session_factory(request)(route_priority(request)) as session:
+        yield session
+
+
+async def get_write_db_session(
+    response: Response,
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session on the primary for routes that write.
+
+    Sets a short-lived cookie so the client's following reads also go to the
+    primary and see its own writes, even while the replicas catch up.
+    """
+    if replica_pool.replicas:
+        window = config.read_your_writes_seconds
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(int(time.time()) + window),
+            max_age=window,
+            httponly=True,
+            samesite="lax",
+        )
+
+    async with primary_sessions(Priority.write) as session:
+        yield session
+
+
+async def check_database(timeout: float = 2.0) -> bool:
+    """Whether a pooled connection can run a trivial query within the timeout."""
+    try:
+        async with asyncio.timeout(timeout):
+            async with engine.connect() as conn:
+                await conn.exec_driver_sql("SELECT 1")
+        return True
+    except Exception as e:
+        logger.warning(f"Database check failed: {e}")
+        return False
@@ -1,13 +1,109 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.config import config
+from src.controller.deletion import deletion_queue
+from src.controller.export import remove_stale_exports
+from src.controller.glacier_index import glacier_index
+from src.controller.preview import PreviewWorker
+from src.controller.raster import run_tile_cache_pruning
+from src.controller.raw_eviction import run_raw_eviction
+from src.controller.schema import ensure_indexes, ensure_tables
+from src.controller.snow_data import run_snow_data_updates
+from src.controller.warmup import warm_up, warmup_state
+from src.db import engine, replica_pool
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.profiling import ProfilingMiddleware
 from src.routes.glacier import router as glacier_router
 from src.routes.project import router as project_router
 from src.routes.scene import router as scene_router
 from src.routes.data import router as data_router
+from src.routes.health import router as health_router
+from src.routes.metrics import router as metrics_router
+from src.utils.admission import limit_route
+from src.utils.responses import ORJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_tables()
+    background_tasks = [asyncio.create_task(ensure_indexes())]
+    await asyncio.to_thread(deletion_queue.resume)
+    await asyncio.to_thread(remove_stale_exports)
+
+    if config.warmup_on_startup:
+        background_tasks.append(asyncio.create_task(warm_up(config.db_pool_size)))
+    else:
+        warmup_state.finished = True
+
+    if replica_pool.replicas:
+        background_tasks.append(
+            asyncio.create_task(
+                replica_pool.run(config.replica_health_interval_seconds)
+            )
+        )
+
+    # the timeseries read the current snow data, so this one always runs
+    background_tasks.append(
+        asyncio.create_task(
+            run_snow_data_updates(max(config.snow_data_update_interval_seconds, 1))
+        )
+    )
+
+    if config.raw_eviction_interval_seconds > 0 and (
+        config.raw_project_quota_gb > 0 or config.raw_min_free_gb > 0
+    ):
+        background_tasks.append(
+            asyncio.create_task(run_raw_eviction(config.raw_eviction_interval_seconds))
+        )
+
+    if config.tile_cache_prune_interval_seconds > 0 and config.tile_cache_max_mb > 0:
+        background_tasks.append(
+            asyncio.create_task(
+                run_tile_cache_pruning(config.tile_cache_prune_interval_seconds)
+            )
+        )
+
+    if config.glacier_index_refresh_seconds > 0:
+        background_tasks.append(
+            asyncio.create_task(glacier_index.run(config.glacier_index_refresh_seconds))
+        )
+
+    preview_worker = PreviewWorker(config.preview_workers)
+    if config.preview_scan_interval_seconds > 0:
+        background_tasks.append(
+            asyncio.create_task(
+                preview_worker.run(config.preview_scan_interval_seconds)
+            )
+        )
 
-app = FastAPI()
+    yield
 
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    preview_worker.shutdown()
+    deletion_queue.shutdown()
+    await engine.dispose()
+    await replica_pool.dispose()
+
+
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+    dependencies=[Depends(limit_route)],
+)
+
+
+# innermost, so the profile covers the route and not compression
+app.add_middleware(
+    ProfilingMiddleware,
+    api_key=config.api_key,
+    interval_seconds=config.profile_sample_interval_ms / 1000,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,7 +119,15 @@ app.add_middleware(
     expose_headers=["x-total-count"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=config.compression_minimum_size,
+    cache_max_bytes=config.compression_cache_mb * 1024 * 1024,
+)
+
+app.include_router(health_router, tags=["Health"])
 app.include_router(project_router, prefix="/v1/project", tags=["Projects"])
 app.include_router(glacier_router, prefix="/v1/glacier", tags=["Glaciers"])
 app.include_router(scene_router, prefix="/v1/scene", tags=["Scenes"])
 app.include_router(data_router, prefix="/v1/data", tags=["Data"])
+app.include_router(metrics_router, prefix="/v1/metrics", tags=["Metrics"])
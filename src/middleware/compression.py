@@ -0,0 +1,295 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional, Protocol
+
+import anyio
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# server preference when the client weighs several encodings equally
+ENCODINGS = ("br", "zstd", "gzip")
+
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# bodies larger than this are compressed in a worker thread
+THREAD_THRESHOLD = 256 * 1024
+
+_INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/", "font/woff")
+_COMPRESSIBLE_IMAGES = {"image/svg+xml"}
+_INCOMPRESSIBLE_TYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/zstd",
+    "application/x-7z-compressed",
+    "application/vnd.apache.parquet",
+    "text/event-stream",
+}
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding for an Accept-Encoding header.
+
+    Returns:
+        Optional[str]: "br", "zstd" or "gzip", or None to send the body as is
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in _COMPRESSIBLE_IMAGES:
+        return True
+    if media_type in _INCOMPRESSIBLE_TYPES:
+        return False
+    return not media_type.startswith(_INCOMPRESSIBLE_PREFIXES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class StreamCompressor(Protocol):
+    def compress(self, chunk: bytes) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class _BrotliStream:
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _GzipStream:
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+_STREAMS = {"br": _BrotliStream, "zstd": _ZstdStream, "gzip": _GzipStream}
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by the digest of the uncompressed body.
+
+    Hot payloads (project details, glacier geometries) are byte-identical
+    between requests, so each one is compressed once per encoding.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[bytes, str], bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            compressed = self._entries.get((digest, encoding))
+            if compressed is not None:
+                self._entries.move_to_end((digest, encoding))
+            return compressed
+
+    def put(self, digest: bytes, encoding: str, compressed: bytes) -> None:
+        if len(compressed) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop((digest, encoding), None)
+            if previous is not None:
+                self._size -= len(previous)
+
+            self._entries[(digest, encoding)] = compressed
+            self._size += len(compressed)
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+
+        compressed = self.get(digest, encoding)
+        if compressed is None:
+            compressed = compress(body, encoding)
+            self.put(digest, encoding, compressed)
+        return compressed
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli, zstd or gzip based on Accept-Encoding.
+
+    Complete bodies below the minimum size are sent as is; larger ones go
+    through the compressed body cache. Streamed responses are compressed chunk
+    by chunk and flushed after each chunk, so clients still receive data as it
+    is produced. Already compressed media (PNG/WebP tiles, zips) is skipped.
+    """
+
+    def __init__(
+        self, app: ASGIApp, minimum_size: int = 1024, cache_max_bytes: int = 0
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = CompressedBodyCache(cache_max_bytes) if cache_max_bytes else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(
+        self, middleware: CompressionMiddleware, encoding: Optional[str], send: Send
+    ) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.stream: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            await self._start(start_message, message)
+            return
+
+        if self.passthrough or self.stream is None:
+            await self._send(message)
+            return
+
+        body = self.stream.compress(message.get("body", b""))
+        more_body = message.get("more_body", False)
+        if not more_body:
+            body += self.stream.finish()
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+    async def _start(self, start_message: Message, message: Message) -> None:
+        headers = MutableHeaders(raw=start_message["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if (
+            start_message["status"] in (204, 206, 304)
+            or "content-encoding" in headers
+            or "content-range" in headers
+            or not is_compressible(headers.get("content-type", ""))
+        ):
+            self.passthrough = True
+            await self._send(start_message)
+            await self._send(message)
+            return
+
+        headers.add_vary_header("Accept-Encoding")
+
+        if self.encoding is None or (
+            not more_body and len(body) < self.middleware.minimum_size
+        ):
+            self.passthrough = True
+            await self._send(start_message)
+            await self._send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        if "accept-ranges" in headers:
+            del headers["accept-ranges"]
+
+        if more_body:
+            del headers["content-length"]
+            self.stream = _STREAMS[self.encoding]()
+            await self._send(start_message)
+            await self._send(
+                {
+                    "type": "http.response.body",
+                    "body": self.stream.compress(body),
+                    "more_body": True,
+                }
+            )
+            return
+
+        compressed = await self._compress_body(body)
+        headers["Content-Length"] = str(len(compressed))
+        await self._send(start_message)
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _compress_body(self, body: bytes) -> bytes:
+        cache = self.middleware.cache
+        if cache is not None:
+            compress_body = cache.compress
+        else:
+            compress_body = compress
+
+        if len(body) > THREAD_THRESHOLD:
+            return await anyio.to_thread.run_sync(compress_body, body, self.encoding)
+        return compress_body(body, self.encoding)
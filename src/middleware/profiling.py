@@ -0,0 +1,99 @@
+import time
+from urllib.parse import parse_qs
+
+import orjson
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.profiling import (
+    RequestProfile,
+    StackSampler,
+    instrument_fastapi,
+    profiling,
+)
+
+PROFILE_VALUES = ("1", "true", "collapsed")
+
+
+class ProfilingMiddleware:
+    """Profile a single request when it is sent with ?profile=1&api_key=....
+
+    Instead of the normal response the client receives the time spent in the
+    database, in response serialization and in the rest of the handler, and the
+    sampled stacks in the collapsed flame graph format. With ?profile=collapsed
+    only the stacks are returned, as text for flamegraph.pl or speedscope.
+
+    Other requests in flight at the same time show up in the samples too.
+    """
+
+    def __init__(
+        self, app: ASGIApp, api_key: str, interval_seconds: float = 0.001
+    ) -> None:
+        self.app = app
+        self.api_key = api_key
+        self.interval_seconds = interval_seconds
+        instrument_fastapi()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        mode = params.get("profile", [""])[0].lower()
+        if mode not in PROFILE_VALUES:
+            await self.app(scope, receive, send)
+            return
+
+        if params.get("api_key", [""])[0] != self.api_key:
+            response = Response(
+                orjson.dumps({"detail": "Invalid API key"}),
+                status_code=403,
+                media_type="application/json",
+            )
+            await response(scope, receive, send)
+            return
+
+        status_code = None
+        response_bytes = 0
+
+        async def discard(message: Message) -> None:
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+
+        sampler = StackSampler(self.interval_seconds)
+        with profiling(RequestProfile()) as profile:
+            sampler.start()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                sampler.stop()
+        total = time.perf_counter() - profile.started
+
+        if mode == "collapsed":
+            await PlainTextResponse(sampler.collapsed())(scope, receive, send)
+            return
+
+        db = profile.phases["db"]
+        serialization = profile.phases["serialization"]
+        report = {
+            "path": scope["path"],
+            "status_code": status_code,
+            "response_bytes": response_bytes,
+            "total_ms": total * 1000,
+            "phases": {
+                "db_ms": db * 1000,
+                "db_queries": profile.db_queries,
+                "serialization_ms": serialization * 1000,
+                "handler_ms": max(0.0, total - db - serialization) * 1000,
+            },
+            "samples": sampler.samples,
+            "sample_interval_ms": self.interval_seconds * 1000,
+            "collapsed_stacks": sampler.collapsed(),
+        }
+        await Response(orjson.dumps(report), media_type="application/json")(
+            scope, receive, send
+        )
@@ -2,7 +2,17 @@ import enum
 from datetime import datetime
 
 from geoalchemy2 import Geometry
-from sqlalchemy import Column, DateTime, Enum, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    ARRAY,
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -37,6 +47,9 @@ class Scene(Base):
     """Circuit breaker entry for a single satellite scene."""
 
     __tablename__ = "scene"
+    __table_args__ = (
+        Index("ix_scene_project_id_acquisition_date", "project_id", "acquisition_date"),
+    )
 
     scene_id = Column(String, primary_key=True)
     project_id = Column(String, ForeignKey("project.project_id"), index=True)
@@ -66,6 +79,14 @@ class Scene(Base):
     )
 
 
+# in the scene search's order, so a page is a range scan from the cursor
+Index(
+    "ix_scene_acquisition_date_desc_scene_id_desc",
+    Scene.acquisition_date.desc().nulls_last(),
+    Scene.scene_id.desc(),
+)
+
+
 class Glacier(Base):
     __tablename__ = "glacier"
     glacier_id = Column(String, primary_key=True)
@@ -84,6 +105,11 @@ class Glacier(Base):
 
 class GlacierSnowData(Base):
     __tablename__ = "glacier_snow_data"
+    __table_args__ = (
+        Index("ix_glacier_snow_data_glacier_id_scene_id", "glacier_id", "scene_id"),
+        # the snow data updater reads new rows in this order
+        Index("ix_glacier_snow_data_created_at_id", "created_at", "id"),
+    )
     id = Column(String, primary_key=True)
     analysis_id = Column(String, ForeignKey("glacier_analysis_result.id"), index=True)
     glacier_id = Column(String, ForeignKey("glacier.glacier_id"), index=True)
@@ -110,3 +136,144 @@ class GlaciersAnalysisResult(Base):
     glaciers = relationship(
         "GlacierSnowData", back_populates="analysis", cascade="all, delete-orphan"
     )
+
+
+class GlacierSnowDataCurrent(Base):
+    """The latest analysis of every glacier in every scene, owned by the API.
+
+    glacier_snow_data keeps the rows of every analysis, so re-analyzed scenes
+    appear more than once there. This table is kept up to date from it by the
+    snow data updater (see src.controller.snow_data), which also replaces rows
+    whose snow data was deleted; snow_data_id is cleared for those meanwhile.
+    """
+
+    __tablename__ = "glacier_snow_data_current"
+    __table_args__ = (
+        Index(
+            "ix_glacier_snow_data_current_glacier_id_acquisition_date",
+            "glacier_id",
+            "acquisition_date",
+        ),
+        Index(
+            "ix_glacier_snow_data_current_project_id_acquisition_date",
+            "project_id",
+            "acquisition_date",
+        ),
+    )
+
+    glacier_id = Column(
+        String, ForeignKey("glacier.glacier_id", ondelete="CASCADE"), primary_key=True
+    )
+    # no foreign key, a cascade would skip the climatology; a scene's snow data
+    # is deleted before the scene, and the updater removes its rows from both
+    scene_id = Column(String, primary_key=True)
+    # copied from the scene, so the routes read a single table
+    project_id = Column(String, nullable=True)
+    acquisition_date = Column(DateTime, nullable=True)
+
+    snow_data_id = Column(
+        String,
+        ForeignKey("glacier_snow_data.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
+    analysis_id = Column(String, nullable=False)
+    # created_at of the analysis, the latest one wins
+    analyzed_at = Column(DateTime, nullable=False)
+    snow_area_m2 = Column(Integer)
+    snowline_elevation_m = Column(Integer)
+
+    updated_at = Column(
+        DateTime, default=datetime.now, nullable=False, onupdate=datetime.now
+    )
+
+
+class GlacierClimatology(Base):
+    """Day-of-year aggregates of a snow metric over all years, owned by the API.
+
+    The histogram has fixed bins per metric (see src.controller.climatology),
+    so percentiles can be derived and new observations added incrementally.
+    A deleted glacier takes its aggregates along, like its current snow data.
+    """
+
+    __tablename__ = "glacier_climatology"
+    glacier_id = Column(
+        String, ForeignKey("glacier.glacier_id", ondelete="CASCADE"), primary_key=True
+    )
+    metric = Column(String, primary_key=True)
+    day_of_year = Column(Integer, primary_key=True)
+    sample_count = Column(Integer, nullable=False)
+    value_sum = Column(Float, nullable=False)
+    value_sum_sq = Column(Float, nullable=False)
+    histogram = Column(ARRAY(Integer), nullable=False)
+
+    updated_at = Column(
+        DateTime, default=datetime.now, nullable=False, onupdate=datetime.now
+    )
+
+
+class SnowDataWatermark(Base):
+    """How far the snow data updater got through glacier_snow_data, one row."""
+
+    __tablename__ = "snow_data_watermark"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    # created_at of the latest row applied
+    created_at = Column(DateTime, nullable=True)
+    # when the updater first got through all rows, None while it is filling
+    # glacier_snow_data_current
+    caught_up_at = Column(DateTime, nullable=True)
+
+    updated_at = Column(
+        DateTime, default=datetime.now, nullable=False, onupdate=datetime.now
+    )
+
+
+class ProjectSnowDataVersion(Base):
+    """Changes with every update of a project's current snow data, owned by the API."""
+
+    __tablename__ = "project_snow_data_version"
+    # no foreign key, the updater bumps it when removing a deleted project's rows
+    project_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+
+    updated_at = Column(
+        DateTime, default=datetime.now, nullable=False, onupdate=datetime.now
+    )
+
+
+class SceneStatusTransition(Base):
+    """Append-only log of scene status changes made through the API."""
+
+    __tablename__ = "scene_status_transition"
+    __table_args__ = (
+        Index(
+            "ix_scene_status_transition_scene_id_changed_at", "scene_id", "changed_at"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    scene_id = Column(
+        String, ForeignKey("scene.scene_id", ondelete="CASCADE"), nullable=False
+    )
+    from_status = Column(String, nullable=False)
+    to_status = Column(String, nullable=False)
+    changed_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+    # time the scene spent in from_status, None if unknown
+    seconds_in_stage = Column(Float, nullable=True)
+
+
+class SceneStageHourly(Base):
+    """Transitions per hour, with a histogram of the time spent in the stage left.
+
+    The histogram has fixed log-scale bins (see src.controller.scene_stats), so
+    hours can be summed and percentiles derived without reading the log.
+    """
+
+    __tablename__ = "scene_stage_hourly"
+    hour = Column(DateTime, primary_key=True)
+    from_status = Column(String, primary_key=True)
+    to_status = Column(String, primary_key=True)
+    transitions = Column(Integer, nullable=False)
+    timed_transitions = Column(Integer, nullable=False)
+    seconds_sum = Column(Float, nullable=False)
+    histogram = Column(ARRAY(Integer), nullable=False)
@@ -1,11 +1,17 @@
-import shutil
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import FileResponse
 
 from src.config import config
+from src.controller.deletion import deletion_queue
+from src.db import get_read_db_session, get_write_db_session
 from src.logger import get_logger
 import src.controller.data as data_controller
+import src.controller.raw_eviction as raw_eviction_controller
+import src.controller.preview as preview_controller
+import src.controller.raster as raster_controller
+from src.schemas.data import DeletionJobOut, RawDeletionIn
 
 router = APIRouter()
 
@@ -32,6 +38,82 @@ def get_raw_project_folders():
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+def _eviction_candidates_out(candidates) -> list[dict]:
+    return [
+        {
+            "project_id": candidate.project_id,
+            "scene_id": candidate.scene_id,
+            "folder_name": candidate.folder_name,
+            "size": data_controller.bytes_to_readable(candidate.size_bytes),
+            "size_bytes": candidate.size_bytes,
+            "updated_at": candidate.updated_at,
+        }
+        for candidate in candidates
+    ]
+
+
+@router.get("/raw-usage")
+async def get_raw_usage(db=Depends(get_read_db_session)):
+    """Raw download usage per project, and what the next eviction would remove."""
+    try:
+        plan = await raw_eviction_controller.plan_eviction(db)
+
+        return {
+            "projects": [
+                {
+                    "project_id": project_id,
+                    "size": data_controller.bytes_to_readable(size),
+                    "size_bytes": size,
+                    "over_quota": plan.quota_bytes is not None
+                    and size > plan.quota_bytes,
+                }
+                for project_id, size in sorted(plan.usage.items())
+            ],
+            "quota_bytes": plan.quota_bytes,
+            "disk_total_bytes": plan.disk_total_bytes,
+            "disk_free_bytes": plan.disk_free_bytes,
+            "min_free_bytes": plan.min_free_bytes,
+            "evictable_bytes": plan.evictable_bytes,
+            "planned_eviction_bytes": plan.bytes_to_free,
+            "planned_evictions": _eviction_candidates_out(plan.candidates),
+        }
+    except Exception as e:
+        logger.error(f"Error fetching raw usage: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/raw-eviction")
+async def evict_raw_folders(
+    api_key: str,
+    dry_run: bool = Query(True),
+    db=Depends(get_write_db_session),
+):
+    """Evict raw folders of processed scenes until the configured limits are met."""
+    if api_key != config.api_key:
+        raise HTTPException(status_code=403, detail="Invalid API key")
+
+    try:
+        if not dry_run and not await raw_eviction_controller.lock_eviction(db):
+            raise HTTPException(status_code=409, detail="An eviction is running")
+
+        plan = await raw_eviction_controller.plan_eviction(db)
+        if dry_run:
+            evicted = plan.candidates
+        else:
+            evicted = await raw_eviction_controller.evict(db, plan)
+
+        return {
+            "dry_run": dry_run,
+            "freed_bytes": sum(candidate.size_bytes for candidate in evicted),
+            "evicted": _eviction_candidates_out(evicted),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error evicting raw folders: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @router.get("/raw/{project_id}")
 def get_raw_project_folder(project_id: str):
     try:
@@ -90,24 +172,29 @@ def get_raw_folder_contents(project_id: str, folder_name: str):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@router.delete("/raw/{project_id}/{folder_name}")
+@router.delete(
+    "/raw/{project_id}/{folder_name}",
+    status_code=202,
+    response_model=DeletionJobOut,
+)
 def delete_raw_folder(project_id: str, folder_name: str):
     try:
         logger.info(f"Deleting folder '{folder_name}' for project '{project_id}'")
 
-        folder_path = config.data_folder_path / "raw" / project_id / folder_name
-        if not folder_path.exists() or not folder_path.is_dir():
+        folder_path = data_controller.resolve_raw_folder(project_id, folder_name)
+        if folder_path is None or not folder_path.is_dir():
             logger.warning(
                 f"Folder '{folder_name}' for project '{project_id}' does not exist"
             )
             raise HTTPException(status_code=404, detail="Folder not found")
 
-        shutil.rmtree(folder_path)
+        job = deletion_queue.submit([folder_path])
         logger.info(
-            f"Folder '{folder_name}' for project '{project_id}' deleted successfully"
+            f"Folder '{folder_name}' for project '{project_id}' queued for "
+            f"deletion in job {job.job_id}"
         )
 
-        return {"message": "success"}
+        return job.to_dict()
     except HTTPException:
         raise
     except Exception as e:
@@ -117,6 +204,55 @@ def delete_raw_folder(project_id: str, folder_name: str):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.post("/raw-deletions", status_code=202, response_model=DeletionJobOut)
+def delete_raw_folders(api_key: str, body: RawDeletionIn):
+    """Delete many raw folders in one background job."""
+    if api_key != config.api_key:
+        raise HTTPException(status_code=403, detail="Invalid API key")
+
+    try:
+        folder_paths = []
+        missing = []
+        for folder in body.folders:
+            folder_path = data_controller.resolve_raw_folder(
+                folder.project_id, folder.folder_name
+            )
+            if folder_path is None or not folder_path.is_dir():
+                missing.append(f"{folder.project_id}/{folder.folder_name}")
+            elif folder_path not in folder_paths:
+                folder_paths.append(folder_path)
+
+        if missing:
+            logger.warning(f"Raw folders do not exist: {missing}")
+            raise HTTPException(
+                status_code=404, detail=f"Folders not found: {', '.join(missing)}"
+            )
+
+        job = deletion_queue.submit(folder_paths)
+        logger.info(f"{len(folder_paths)} raw folders queued in job {job.job_id}")
+
+        return job.to_dict()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting raw folders: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/raw-deletions", response_model=list[DeletionJobOut])
+def get_deletion_jobs():
+    return [job.to_dict() for job in deletion_queue.jobs()]
+
+
+@router.get("/raw-deletions/{job_id}", response_model=DeletionJobOut)
+def get_deletion_job(job_id: str):
+    job = deletion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+
+    return job.to_dict()
+
+
 @router.get("/result")
 def get_processed_results():
     try:
@@ -182,9 +318,16 @@ def get_result_folder_contents(project_id: str, folder_name: str):
             f"Contents of result folder '{folder_name}' for project '{project_id}': {contents}, size: {size} bytes"
         )
 
+        previews = {
+            name: f"/v1/data/result/{project_id}/{folder_name}/{name}/preview"
+            for name in contents
+            if raster_controller.is_raster(folder_path / name)
+        }
+
         return {
             "contents": contents,
             "size": data_controller.bytes_to_readable(size),
+            "previews": previews,
         }
     except HTTPException:
         raise
@@ -199,13 +342,9 @@ def get_result_folder_contents(project_id: str, folder_name: str):
     "/result/{project_id}/{folder_name}/{file_name}", response_class=FileResponse
 )
 def download_result_file(project_id: str, folder_name: str, file_name: str):
-    base_dir = (config.data_folder_path / "result").resolve()
-    folder_path = (
-        config.data_folder_path / "result" / project_id / folder_name
-    ).resolve()
-    file_path = (folder_path / file_name).resolve()
+    file_path = data_controller.resolve_result_file(project_id, folder_name, file_name)
 
-    if base_dir not in file_path.parents:
+    if file_path is None:
         logger.warning(
             f"Attempted path traversal attack detected for file '{file_name}' in folder '{folder_name}' for project '{project_id}'"
         )
@@ -222,3 +361,93 @@ def download_result_file(project_id: str, folder_name: str, file_name: str):
     )
 
     return file_path
+
+
+@router.get(
+    "/result/{project_id}/{folder_name}/{file_name}/preview",
+    name="Get Result Raster Preview",
+    response_class=FileResponse,
+)
+def get_result_preview(
+    project_id: str,
+    folder_name: str,
+    file_name: str,
+    size: int = Query(
+        config.preview_size, ge=16, le=preview_controller.MAX_PREVIEW_SIZE
+    ),
+):
+    file_path = data_controller.resolve_result_file(project_id, folder_name, file_name)
+
+    if file_path is None:
+        logger.warning(
+            f"Attempted path traversal attack detected for file '{file_name}' in folder '{folder_name}' for project '{project_id}'"
+        )
+        raise HTTPException(status_code=400, detail="Invalid file path")
+
+    if not file_path.is_file() or not raster_controller.is_raster(file_path):
+        raise HTTPException(status_code=404, detail="Raster file not found")
+
+    try:
+        preview_path = preview_controller.get_preview(file_path, size)
+    except Exception as e:
+        logger.error(f"Error generating preview of '{file_path}': {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    return FileResponse(
+        preview_path,
+        media_type="image/png",
+        headers={"Cache-Control": f"public, max-age={config.tile_max_age_seconds}"},
+    )
+
+
+@router.get(
+    "/result/{project_id}/{folder_name}/{file_name}/tiles/{z}/{x}/{y}.{tile_format}",
+    name="Get Result Raster Tile",
+    response_class=FileResponse,
+    responses={204: {"description": "The tile does not overlap the raster"}},
+)
+def get_result_tile(
+    project_id: str,
+    folder_name: str,
+    file_name: str,
+    z: int,
+    x: int,
+    y: int,
+    tile_format: raster_controller.TileFormat,
+    rescale: Optional[str] = None,
+):
+    file_path = data_controller.resolve_result_file(project_id, folder_name, file_name)
+
+    if file_path is None:
+        logger.warning(
+            f"Attempted path traversal attack detected for file '{file_name}' in folder '{folder_name}' for project '{project_id}'"
+        )
+        raise HTTPException(status_code=400, detail="Invalid file path")
+
+    if not file_path.is_file() or not raster_controller.is_raster(file_path):
+        raise HTTPException(status_code=404, detail="Raster file not found")
+
+    if not raster_controller.is_valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates")
+
+    try:
+        value_range = raster_controller.parse_rescale(rescale)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid rescale value")
+
+    try:
+        tile_path = raster_controller.get_tile(
+            file_path, z, x, y, tile_format, value_range
+        )
+    except Exception as e:
+        logger.error(f"Error rendering tile {z}/{x}/{y} of '{file_path}': {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    if tile_path is None:
+        return Response(status_code=204)
+
+    return FileResponse(
+        tile_path,
+        media_type=raster_controller.MEDIA_TYPES[tile_format],
+        headers={"Cache-Control": f"public, max-age={config.tile_max_age_seconds}"},
+    )
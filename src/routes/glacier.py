@@ -1,47 +1,261 @@
-import json
+from datetime import date
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
+from src.config import config
+from src.controller.climatology import (
+    ClimatologyMetric,
+    compare_to_climatology,
+    current_season,
+    fetch_climatology,
+    season_bounds,
+)
 from src.controller.glacier import (
     fetch_glacier_area,
     fetch_glacier_details,
     fetch_glacier_timeseries,
+    fetch_glaciers_timeseries,
+)
+from src.controller.glacier_index import glacier_index
+from src.controller.snow_matrix import SnowMetric
+from src.controller.timeseries import (
+    Frequency,
+    Interpolation,
+    RegularizeOptions,
+    Smoothing,
+    grid_size,
+    regularize,
+    to_nullable_lists,
 )
-from src.db import get_db_session
+from src.db import get_read_db_session
 from src.logger import get_logger
 from src.schemas.glacier import (
+    GlacierAnomalyOut,
+    GlacierAtBatchIn,
+    GlacierAtBatchOut,
+    GlacierAtOut,
     GlacierDetailsOut,
-    GlacierTimeSeriesDataPoint,
+    GlacierTimeSeriesBatchOut,
     GlacierTimeSeriesOut,
 )
+from src.utils.encoding import (
+    MAX_DECIMAL_DIGITS,
+    MEDIA_TYPES,
+    GeometryFormat,
+    negotiate_geometry_format,
+    write_flatgeobuf,
+)
+from src.utils.responses import ORJSONResponse, raw_json
 
 router = APIRouter()
 
 logger = get_logger("glacier_watch")
 
 
+MAX_BATCH_GLACIERS = 1000
+
+
+def regularize_options(
+    frequency: Optional[Frequency] = Query(
+        None, description="Resample onto a regular grid, default the raw series"
+    ),
+    interpolation: Interpolation = Query(
+        Interpolation.none, description="Fill grid cells between observations"
+    ),
+    max_gap_days: Optional[int] = Query(
+        None, ge=0, description="Do not interpolate across longer gaps"
+    ),
+    smoothing: Smoothing = Smoothing.none,
+    window: int = Query(5, le=365, description="Smoothing window in grid cells"),
+    polyorder: int = Query(2, ge=0, le=5, description="Savitzky-Golay order"),
+) -> Optional[RegularizeOptions]:
+    if frequency is None:
+        if interpolation != Interpolation.none or smoothing != Smoothing.none:
+            raise HTTPException(
+                status_code=400,
+                detail="interpolation and smoothing require a frequency",
+            )
+        return None
+
+    options = RegularizeOptions(
+        frequency, interpolation, max_gap_days, smoothing, window, polyorder
+    )
+    try:
+        options.validate()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return options
+
+
+def _check_grid_size(
+    n_series: int, start: date, end: date, options: RegularizeOptions
+) -> None:
+    """Reject resampling that would not fit in a request's memory."""
+    n_cells = grid_size(start, end, options.frequency.step_days)
+    if n_cells > config.timeseries_max_grid_cells:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {config.timeseries_max_grid_cells} grid cells, "
+            "shorten the date range or use a weekly frequency",
+        )
+
+    window = options.window if options.smoothing != Smoothing.none else 1
+    if n_series * n_cells * window > config.timeseries_max_window_values:
+        raise HTTPException(
+            status_code=400,
+            detail="Too many glaciers and grid cells for the smoothing window, "
+            "request fewer glaciers, a shorter date range or a smaller window",
+        )
+
+
+@router.get(
+    "/timeseries",
+    name="Get Snow Data Timeseries of Many Glaciers",
+    response_model=GlacierTimeSeriesBatchOut,
+)
+async def get_glaciers_timeseries(
+    glacier_id: list[str] = Query(..., description="Repeat for every glacier"),
+    metric: SnowMetric = SnowMetric.snow_area_fraction,
+    start: Optional[date] = Query(None, description="First acquisition day"),
+    end: Optional[date] = Query(None, description="Last acquisition day"),
+    options: Optional[RegularizeOptions] = Depends(regularize_options),
+    db=Depends(get_read_db_session),
+):
+    """Resampled series of many glaciers on a shared grid, one row per glacier.
+
+    Reads the same snow data as the single glacier timeseries, so it trails
+    the pipeline by up to SNOW_DATA_UPDATE_INTERVAL_SECONDS as well.
+    """
+    if options is None:
+        raise HTTPException(status_code=400, detail="frequency is required")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    glacier_ids = list(dict.fromkeys(glacier_id))
+    if len(glacier_ids) > MAX_BATCH_GLACIERS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_GLACIERS} glaciers"
+        )
+    if start and end:
+        _check_grid_size(len(glacier_ids), start, end, options)
+
+    logger.info(f"Fetching {metric.value} timeseries of {len(glacier_ids)} glaciers")
+    snow_data = await fetch_glaciers_timeseries(db, glacier_ids, start, end)
+
+    content = {"metric": metric.value, "frequency": options.frequency.value}
+    if not snow_data:
+        return ORJSONResponse(
+            {**content, "glacier_ids": glacier_ids, "dates": [], "values": []}
+        )
+
+    ids, acquired, snow_area, snowline, area = zip(*snow_data)
+    row_of = {glacier_id: row for row, glacier_id in enumerate(glacier_ids)}
+    rows = np.fromiter((row_of[glacier_id] for glacier_id in ids), dtype=np.int64)
+    days = np.asarray(acquired, dtype="datetime64[D]")
+
+    if metric == SnowMetric.snow_area_fraction:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.asarray(snow_area, dtype="float64") / np.asarray(
+                area, dtype="float64"
+            )
+    else:
+        values = np.asarray(snowline, dtype="float64")
+
+    start = start or days.min().item()
+    end = end or days.max().item()
+    _check_grid_size(len(glacier_ids), start, end, options)
+    grid, matrix, _ = regularize(
+        rows, days, values, len(glacier_ids), start, end, options
+    )
+
+    return ORJSONResponse(
+        {
+            **content,
+            "glacier_ids": glacier_ids,
+            "dates": grid.astype(str).tolist(),
+            "values": to_nullable_lists(matrix),
+        }
+    )
+
+
+@router.get("/at", name="Get Glacier at Point", response_model=GlacierAtOut)
+async def get_glacier_at(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+):
+    """The glacier whose outline contains the point, from the in-memory index."""
+    (glacier,) = await glacier_index.lookup([lon], [lat])
+    if glacier is None:
+        raise HTTPException(status_code=404, detail="No glacier at this point")
+
+    return ORJSONResponse(glacier)
+
+
+@router.post("/at", name="Get Glaciers at Points", response_model=GlacierAtBatchOut)
+async def get_glaciers_at(body: GlacierAtBatchIn):
+    glaciers = await glacier_index.lookup(
+        [point.lon for point in body.points], [point.lat for point in body.points]
+    )
+
+    return ORJSONResponse({"glaciers": glaciers})
+
+
 @router.get(
     "/{glacier_id}",
     name="Get Glacier Details",
     response_model=GlacierDetailsOut,
 )
 async def get_glacier_details(
-    glacier_id: str = "RGI2000-v7.0-G-08-00761", db=Depends(get_db_session)
+    request: Request,
+    glacier_id: str = "RGI2000-v7.0-G-08-00761",
+    geometry_format: Optional[GeometryFormat] = Query(None, alias="format"),
+    precision: Optional[int] = Query(None, ge=0, le=MAX_DECIMAL_DIGITS),
+    db=Depends(get_read_db_session),
 ):
+    geometry_format = negotiate_geometry_format(
+        geometry_format,
+        request.headers.get("accept"),
+        {GeometryFormat.geojson, GeometryFormat.wkb, GeometryFormat.fgb},
+    )
+    if geometry_format is None:
+        raise HTTPException(status_code=406, detail="Unsupported geometry format")
+
     logger.info(f"Fetching glacier details for glacier_id={glacier_id}")
-    glacier = await fetch_glacier_details(db, glacier_id)
+    as_wkb = geometry_format != GeometryFormat.geojson
+    glacier = await fetch_glacier_details(db, glacier_id, precision, as_wkb)
     if not glacier:
         raise HTTPException(status_code=404, detail="Glacier not found")
 
-    result = GlacierDetailsOut(
-        glacier_id=glacier.glacier_id,
-        name=glacier.name,
-        area_m2=glacier.area_m2,
-        geometry=json.loads(glacier.geometry_geojson),
-    )
+    if geometry_format == GeometryFormat.wkb:
+        return Response(
+            content=bytes(glacier.geometry_wkb),
+            media_type=MEDIA_TYPES[geometry_format],
+            headers={"X-Glacier-Id": glacier.glacier_id},
+        )
+
+    if geometry_format == GeometryFormat.fgb:
+        content = write_flatgeobuf(
+            [bytes(glacier.geometry_wkb)],
+            {
+                "glacier_id": [glacier.glacier_id],
+                "name": [glacier.name],
+                "area_m2": [glacier.area_m2],
+            },
+            layer="glaciers",
+        )
+        return Response(content=content, media_type=MEDIA_TYPES[geometry_format])
+
+    result = {
+        "glacier_id": glacier.glacier_id,
+        "name": glacier.name,
+        "area_m2": glacier.area_m2,
+        "geometry": raw_json(glacier.geometry_geojson),
+    }
 
     logger.info(f"Returning glacier details for glacier_id={glacier_id}")
-    return result
+    return ORJSONResponse(result)
 
 
 @router.get(
@@ -49,7 +263,27 @@ async def get_glacier_details(
     name="Get Glacier Snow Data Timeseries",
     response_model=GlacierTimeSeriesOut,
 )
-async def get_glacier_timeseries(glacier_id: str, db=Depends(get_db_session)):
+async def get_glacier_timeseries(
+    glacier_id: str,
+    start: Optional[date] = Query(None, description="First acquisition day"),
+    end: Optional[date] = Query(None, description="Last acquisition day"),
+    options: Optional[RegularizeOptions] = Depends(regularize_options),
+    db=Depends(get_read_db_session),
+):
+    """Snow observations of a glacier, as acquired or resampled onto a regular grid.
+
+    With a frequency, observations are averaged per day or week; the other
+    options fill gaps between observations and smooth the gridded series.
+
+    Observations come from the latest analysis of every scene, which the API
+    takes over from the pipeline every SNOW_DATA_UPDATE_INTERVAL_SECONDS
+    (60 by default); new and deleted analyses show up within that time.
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if options is not None and start and end:
+        _check_grid_size(3, start, end, options)
+
     logger.info(f"Fetching glacier timeseries for glacier_id={glacier_id}")
 
     glacier_area_m2 = await fetch_glacier_area(db, glacier_id)
@@ -58,24 +292,140 @@ async def get_glacier_timeseries(glacier_id: str, db=Depends(get_db_session)):
         logger.error(f"Glacier not found for glacier_id={glacier_id}")
         raise HTTPException(status_code=404, detail="Glacier not found")
 
-    snow_data = await fetch_glacier_timeseries(db, glacier_id)
+    snow_data = await fetch_glacier_timeseries(db, glacier_id, start, end)
+
+    if options is not None:
+        timeseries = _regularized_timeseries(
+            snow_data, glacier_area_m2, start, end, options
+        )
+        return ORJSONResponse({"glacier_id": glacier_id, "timeseries": timeseries})
 
     timeseries = []
     for glacier_snow_data, acquisition_date in snow_data:
         timeseries.append(
-            GlacierTimeSeriesDataPoint(
-                acquisition_date=acquisition_date,
-                snow_area_m2=glacier_snow_data.snow_area_m2,
-                snow_area_fraction=glacier_snow_data.snow_area_m2 / glacier_area_m2,
-                snowline_elevation_m=glacier_snow_data.snowline_elevation_m,
-            )
+            {
+                "acquisition_date": acquisition_date,
+                "snow_area_m2": glacier_snow_data.snow_area_m2,
+                "snow_area_fraction": glacier_snow_data.snow_area_m2 / glacier_area_m2,
+                "snowline_elevation_m": glacier_snow_data.snowline_elevation_m,
+            }
         )
 
     logger.info(
         f"Returning glacier timeseries for glacier_id={glacier_id}, found {len(timeseries)} records"
     )
 
-    return GlacierTimeSeriesOut(
-        glacier_id=glacier_id,
-        timeseries=timeseries,
+    return ORJSONResponse(
+        {
+            "glacier_id": glacier_id,
+            "timeseries": timeseries,
+        }
+    )
+
+
+def _regularized_timeseries(
+    snow_data,
+    glacier_area_m2: float,
+    start: Optional[date],
+    end: Optional[date],
+    options: RegularizeOptions,
+) -> list[dict]:
+    if not snow_data:
+        return []
+
+    days = np.asarray(
+        [acquisition_date for _, acquisition_date in snow_data],
+        dtype="datetime64[D]",
+    )
+    snow_area = np.asarray([row.snow_area_m2 for row, _ in snow_data], dtype="float64")
+    snowline = np.asarray(
+        [row.snowline_elevation_m for row, _ in snow_data], dtype="float64"
+    )
+
+    start = start or days.min().item()
+    end = end or days.max().item()
+    _check_grid_size(3, start, end, options)
+
+    # one row per metric, each gap filled and smoothed on its own
+    n = len(snow_data)
+    grid, matrix, counts = regularize(
+        np.repeat(np.arange(3), n),
+        np.tile(days, 3),
+        np.concatenate([snow_area, snow_area / glacier_area_m2, snowline]),
+        3,
+        start,
+        end,
+        options,
+    )
+    snow_area_m2, snow_area_fraction, snowline_elevation_m = to_nullable_lists(matrix)
+
+    return [
+        {
+            "acquisition_date": day,
+            "snow_area_m2": snow_area_m2[cell],
+            "snow_area_fraction": snow_area_fraction[cell],
+            "snowline_elevation_m": snowline_elevation_m[cell],
+            "observations": int(max(counts[0, cell], counts[2, cell])),
+        }
+        for cell, day in enumerate(grid.astype(str).tolist())
+    ]
+
+
+@router.get(
+    "/{glacier_id}/anomaly",
+    name="Get Glacier Snow Anomaly",
+    response_model=GlacierAnomalyOut,
+)
+async def get_glacier_anomaly(
+    glacier_id: str,
+    metric: ClimatologyMetric = ClimatologyMetric.snow_area_fraction,
+    season: Optional[int] = Query(
+        None, ge=1950, le=2100, description="Hydrological year, default the current"
+    ),
+    db=Depends(get_read_db_session),
+):
+    """Compare a season's observations to the glacier's day-of-year climatology.
+
+    Observations and climatology are updated together, up to
+    SNOW_DATA_UPDATE_INTERVAL_SECONDS after the pipeline's analyses.
+    """
+    logger.info(f"Fetching {metric.value} anomaly for glacier_id={glacier_id}")
+
+    glacier_area_m2 = await fetch_glacier_area(db, glacier_id)
+
+    if not glacier_area_m2:
+        logger.error(f"Glacier not found for glacier_id={glacier_id}")
+        raise HTTPException(status_code=404, detail="Glacier not found")
+
+    if season is None:
+        season = current_season(date.today())
+    season_start, season_end = season_bounds(season)
+
+    snow_data = await fetch_glacier_timeseries(db, glacier_id, season_start, season_end)
+    climatology = await fetch_climatology(db, glacier_id, metric)
+
+    observations = []
+    for glacier_snow_data, acquisition_date in snow_data:
+        if metric == ClimatologyMetric.snow_area_fraction:
+            value = (
+                glacier_snow_data.snow_area_m2 / glacier_area_m2
+                if glacier_snow_data.snow_area_m2 is not None
+                else None
+            )
+        else:
+            value = glacier_snow_data.snowline_elevation_m
+        observations.append((acquisition_date, value))
+
+    points = compare_to_climatology(climatology, observations)
+
+    return ORJSONResponse(
+        {
+            "glacier_id": glacier_id,
+            "metric": metric.value,
+            "season": season,
+            "season_start": season_start,
+            "season_end": season_end,
+            "window_days": config.climatology_window_days,
+            "points": points,
+        }
     )
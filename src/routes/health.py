@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+
+from src.controller.warmup import warmup_state
+from src.db import check_database
+from src.utils.responses import ORJSONResponse
+
+router = APIRouter()
+
+
+@router.get("/healthz", name="Liveness probe")
+async def healthz():
+    return {"status": "ok"}
+
+
+@router.get("/readyz", name="Readiness probe")
+async def readyz():
+    """Ready once the startup warmup has finished and the database answers."""
+    if not warmup_state.finished:
+        return ORJSONResponse({"status": "warming up"}, status_code=503)
+
+    if not await check_database():
+        return ORJSONResponse({"status": "database unavailable"}, status_code=503)
+
+    return {
+        "status": "ready",
+        "warmup_seconds": warmup_state.duration_seconds,
+        "warmup_error": warmup_state.error,
+    }
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+
+from src.utils.admission import AdmissionGate
+from src.utils.singleflight import SingleFlight
+
+router = APIRouter()
+
+
+@router.get("/", name="Get runtime metrics")
+async def get_metrics():
+    """In-process counters since the worker started."""
+    return {
+        "singleflight": {group.name: group.stats() for group in SingleFlight.groups},
+        "admission": {gate.name: gate.stats() for gate in AdmissionGate.groups},
+    }
@@ -1,56 +1,96 @@
 import shutil
-from fastapi import APIRouter, Depends, HTTPException, Response
+from datetime import date
+from typing import Optional
 
-from src.controller.glacier import fetch_glacier_in_geometry, glacier_rows_to_list_items
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from src.controller.glacier import (
+    fetch_glacier_in_geometry,
+    fetch_glacier_shapes_in_geometry,
+    glacier_rows_to_list_items,
+)
+from src.controller.export import ExportFormat, stream_export
 import src.controller.project as project_controller
 from src.controller.scene import count_scenes_by_project_id, fetch_scenes_by_project_id
-from src.db import get_db_session
+from src.controller.snow_matrix import (
+    SnowMetric,
+    build_snow_matrix,
+    fetch_snow_data_version,
+    fetch_snow_matrix_cells,
+    snow_matrix_cache,
+)
+from src.db import (
+    get_read_db_session,
+    get_write_db_session,
+    primary_sessions,
+    read_session_factory,
+)
 from src.logger import get_logger
 from src.schemas.project import (
     ListProjectsOut,
     ProjectDetailsOut,
-    ProjectList,
     ProjectCreateIn,
     ProjectListItem,
     ProjectConfig,
+    SnowMatrixOut,
+)
+from src.utils.geo import bounds_from_minmax, geojson_point_to_latlng
+from src.utils.encoding import (
+    MAX_DECIMAL_DIGITS,
+    MEDIA_TYPES,
+    GeometryFormat,
+    negotiate_geometry_format,
+    resolve_precision,
+    write_flatgeobuf,
 )
-from src.utils.geo import bounds_from_minmax, geojson_point_to_latlng, geojson_to_model
+from src.utils.responses import ORJSONResponse, raw_json
+from src.utils.singleflight import SingleFlight
 
 router = APIRouter()
 
 logger = get_logger("glacier_watch")
 
+# concurrent identical requests, e.g. when many dashboards open at once, share
+# one set of queries
+project_list_flight = SingleFlight("project_list")
+project_details_flight = SingleFlight("project_details")
+
 
 @router.get(
     "/",
     name="List Projects",
     response_model=ListProjectsOut,
 )
-async def list_projects(db=Depends(get_db_session)):
-    logger.info("Fetching list of projects")
-    projects = await project_controller.fetch_projects(db)
-
-    bounds = await project_controller.fetch_projects_bounds(db)
-
-    logger.info(f"Fetched {len(projects)} projects")
-
-    projects = [
-        ProjectList(
-            project_id=project.project_id,
-            name=project.name,
-            point=geojson_point_to_latlng(project.center_geojson),
-        )
-        for project in projects
-    ]
-
-    response = ListProjectsOut(
-        projects=projects,
-        map_bounds=bounds_from_minmax(
-            bounds.min_lat, bounds.min_lon, bounds.max_lat, bounds.max_lon
-        ),
-    )
+async def list_projects(request: Request):
+    session_factory = read_session_factory(request)
+
+    async def build() -> dict:
+        async with session_factory() as db:
+            logger.info("Fetching list of projects")
+            projects = await project_controller.fetch_projects(db)
+
+            bounds = await project_controller.fetch_projects_bounds(db)
+
+        logger.info(f"Fetched {len(projects)} projects")
+
+        return {
+            "projects": [
+                {
+                    "project_id": project.project_id,
+                    "name": project.name,
+                    "point": geojson_point_to_latlng(project.center_geojson),
+                }
+                for project in projects
+            ],
+            "map_bounds": bounds_from_minmax(
+                bounds.min_lat, bounds.min_lon, bounds.max_lat, bounds.max_lon
+            ),
+        }
 
-    return response
+    content = await project_list_flight.do(session_factory is primary_sessions, build)
+    return ORJSONResponse(content)
 
 
 @router.post(
@@ -58,7 +98,7 @@ async def list_projects(db=Depends(get_db_session)):
     name="Add Project",
     response_model=ProjectListItem,
 )
-async def add_project(project_data: ProjectCreateIn, db=Depends(get_db_session)):
+async def add_project(project_data: ProjectCreateIn, db=Depends(get_write_db_session)):
     try:
         existing_project = await project_controller.fetch_project_row(
             db, project_data.project_id
@@ -108,29 +148,90 @@ async def add_project(project_data: ProjectCreateIn, db=Depends(get_db_session))
             shutil.rmtree(project_folder_path)
             logger.info(f"Cleaned up project folder at: {project_folder_path}")
 
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid project data: {e}")
         raise HTTPException(status_code=500, detail="Failed to create project")
 
 
+@router.get(
+    "/configs",
+    name="Get all project configurations",
+    response_model=list[ProjectConfig],
+)
+async def get_all_project_configs(db=Depends(get_read_db_session)):
+    logger.info("Fetching configurations of all projects")
+
+    projects = await project_controller.fetch_projects(db)
+    project_ids = [project.project_id for project in projects]
+
+    configs = project_controller.read_project_configs(project_ids)
+
+    missing = set(project_ids) - configs.keys()
+    if missing:
+        logger.warning(f"Projects without a config file: {sorted(missing)}")
+
+    return list(configs.values())
+
+
 @router.get(
     "/{project_id}",
     name="Get Project Details",
     response_model=ProjectDetailsOut,
 )
 async def get_project_details(
-    response: Response,
+    request: Request,
     project_id: str,
-    db=Depends(get_db_session),
     limit: int = 100,
     offset: int = 0,
+    start: Optional[date] = Query(None, description="First scene acquisition day"),
+    end: Optional[date] = Query(None, description="Last scene acquisition day"),
+    precision: Optional[int] = Query(None, ge=0, le=MAX_DECIMAL_DIGITS),
 ):
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    session_factory = read_session_factory(request)
+
+    async def build() -> dict:
+        async with session_factory() as db:
+            return await _build_project_details(
+                db, project_id, limit, offset, start, end, precision
+            )
+
+    content = await project_details_flight.do(
+        (
+            project_id,
+            limit,
+            offset,
+            start,
+            end,
+            precision,
+            session_factory is primary_sessions,
+        ),
+        build,
+    )
+    return ORJSONResponse(
+        content, headers={"X-Total-Count": str(content["scene_total_count"])}
+    )
+
+
+async def _build_project_details(
+    db,
+    project_id: str,
+    limit: int,
+    offset: int,
+    start: Optional[date],
+    end: Optional[date],
+    precision: Optional[int],
+) -> dict:
     logger.info(f"Fetching project details for project_id={project_id}")
 
-    project = await project_controller.fetch_project_row(db, project_id)
+    project = await project_controller.fetch_project_row(db, project_id, precision)
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    aoi = geojson_to_model(project.aoi)
+    aoi = raw_json(project.aoi)
     center = geojson_point_to_latlng(project.center_geojson)
     bounds = bounds_from_minmax(
         project.min_lat, project.min_lon, project.max_lat, project.max_lon
@@ -141,17 +242,15 @@ async def get_project_details(
 
     logger.info(f"Fetched {len(glaciers)} glaciers for project_id={project_id}")
 
-    scenes = await fetch_scenes_by_project_id(db, project_id, limit, offset)
+    scenes = await fetch_scenes_by_project_id(db, project_id, limit, offset, start, end)
 
     logger.info(f"Fetched {len(scenes)} scenes for project_id={project_id}")
 
-    total_scenes = await count_scenes_by_project_id(db, project_id)
+    total_scenes = await count_scenes_by_project_id(db, project_id, start, end)
     logger.info(
         f"Total scenes for project_id={project_id}: {total_scenes} (limit={limit}, offset={offset})"
     )
 
-    response.headers["X-Total-Count"] = str(total_scenes)
-
     return {
         "project": {
             "project_id": project.project_id,
@@ -159,7 +258,7 @@ async def get_project_details(
             "description": project.description,
             "aoi": aoi,
             "glaciers": glaciers,
-            "scenes": scenes,
+            "scenes": [scene._asdict() for scene in scenes],
         },
         "map_center": center,
         "map_bounds": bounds,
@@ -167,12 +266,190 @@ async def get_project_details(
     }
 
 
+def _glaciers_topology(glaciers, precision: int) -> dict:
+    import shapely
+
+    from src.utils.topojson import encode_topology
+
+    geometries = shapely.from_wkb([bytes(glacier.geometry_wkb) for glacier in glaciers])
+    features = [
+        (
+            glacier.glacier_id,
+            {"name": glacier.name, "area_m2": glacier.area_m2},
+            geometry,
+        )
+        for glacier, geometry in zip(glaciers, geometries)
+    ]
+    return encode_topology(features, precision, object_name="glaciers")
+
+
+@router.get(
+    "/{project_id}/glaciers",
+    name="Get project glacier geometries",
+)
+async def get_project_glaciers(
+    request: Request,
+    project_id: str,
+    geometry_format: Optional[GeometryFormat] = Query(None, alias="format"),
+    precision: Optional[int] = Query(None, ge=0, le=MAX_DECIMAL_DIGITS),
+    db=Depends(get_read_db_session),
+):
+    """Full geometries of a project's glaciers as GeoJSON, TopoJSON or FlatGeobuf.
+
+    TopoJSON stores borders shared by neighbouring glaciers once and quantizes
+    coordinates to the requested precision (at most 7 digits).
+    """
+    geometry_format = negotiate_geometry_format(
+        geometry_format,
+        request.headers.get("accept"),
+        {GeometryFormat.geojson, GeometryFormat.topojson, GeometryFormat.fgb},
+    )
+    if geometry_format is None:
+        raise HTTPException(status_code=406, detail="Unsupported geometry format")
+
+    project = await project_controller.fetch_project_row(db, project_id)
+
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    precision = resolve_precision(precision)
+    as_wkb = geometry_format != GeometryFormat.geojson
+    glaciers = await fetch_glacier_shapes_in_geometry(
+        db, project.area_of_interest, precision, as_wkb
+    )
+
+    logger.info(
+        f"Fetched {len(glaciers)} glacier geometries for project_id={project_id} "
+        f"as {geometry_format.value}"
+    )
+
+    if geometry_format == GeometryFormat.fgb:
+        content = await run_in_threadpool(
+            write_flatgeobuf,
+            [bytes(glacier.geometry_wkb) for glacier in glaciers],
+            {
+                "glacier_id": [glacier.glacier_id for glacier in glaciers],
+                "name": [glacier.name for glacier in glaciers],
+                "area_m2": [glacier.area_m2 for glacier in glaciers],
+            },
+            "glaciers",
+        )
+        return Response(content=content, media_type=MEDIA_TYPES[geometry_format])
+
+    if geometry_format == GeometryFormat.topojson:
+        topology = await run_in_threadpool(_glaciers_topology, glaciers, precision)
+        return ORJSONResponse(topology, media_type=MEDIA_TYPES[geometry_format])
+
+    return ORJSONResponse(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "id": glacier.glacier_id,
+                    "properties": {"name": glacier.name, "area_m2": glacier.area_m2},
+                    "geometry": raw_json(glacier.geometry_geojson),
+                }
+                for glacier in glaciers
+            ],
+        },
+        media_type=MEDIA_TYPES[geometry_format],
+    )
+
+
+@router.get("/{project_id}/export", name="Export project data")
+async def get_project_export(
+    project_id: str,
+    export_format: ExportFormat = Query(ExportFormat.parquet, alias="format"),
+    db=Depends(get_read_db_session),
+):
+    """Zip of the project's glaciers, scenes and snow data for offline use.
+
+    Glaciers are GeoParquet (format=parquet) or FlatGeobuf with a spatial
+    index (format=fgb); scenes and snow data are parquet in both cases. The
+    snow data is as of the API's last update from the pipeline's analyses, at
+    most SNOW_DATA_UPDATE_INTERVAL_SECONDS ago.
+    """
+    project = await project_controller.fetch_project_row(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    logger.info(f"Exporting project {project_id} as {export_format.value}")
+    filename = f"{project_id}-{export_format.value}.zip"
+
+    return StreamingResponse(
+        stream_export(db, project_id, export_format),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get(
+    "/{project_id}/snow-matrix",
+    name="Get project snow matrix",
+    response_model=SnowMatrixOut,
+)
+async def get_project_snow_matrix(
+    request: Request,
+    project_id: str,
+    metric: SnowMetric = SnowMetric.snowline_elevation_m,
+    start: Optional[date] = Query(None, description="First acquisition day"),
+    end: Optional[date] = Query(None, description="Last acquisition day"),
+    db=Depends(get_read_db_session),
+):
+    """Glacier x acquisition day matrix of a snow metric for all project glaciers.
+
+    Responses are cached per data version and carry an ETag, so unchanged
+    matrices are answered with 304 Not Modified; neither while the API is still
+    filling its table of the latest snow data. The matrix trails the
+    pipeline's analyses by up to SNOW_DATA_UPDATE_INTERVAL_SECONDS.
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    # version and cells must come from the same snapshot to be cached together
+    await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+    project = await project_controller.fetch_project_row(db, project_id)
+
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    version = await fetch_snow_data_version(db, project_id)
+    headers = {"Cache-Control": "no-cache"}
+    key = (project_id, metric, start, end)
+    content = None
+    if version is not None:
+        etag = f'"{version}-{metric.value}-{start}-{end}"'
+        headers["ETag"] = etag
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        content = snow_matrix_cache.get(key, version)
+
+    if content is None:
+        cells = await fetch_snow_matrix_cells(db, project_id, metric, start, end)
+        matrix = build_snow_matrix(cells)
+
+        logger.info(
+            f"Built {metric.value} matrix for project_id={project_id}: "
+            f"{len(matrix['glacier_ids'])} glaciers x {len(matrix['dates'])} dates"
+        )
+
+        content = ORJSONResponse(
+            {"project_id": project_id, "metric": metric.value, **matrix}
+        ).body
+        if version is not None:
+            snow_matrix_cache.put(key, version, content)
+
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
 @router.get(
     "/{project_id}/config",
     name="Get project configuration",
     response_model=ProjectConfig,
 )
-async def get_project_config(project_id: str, db=Depends(get_db_session)):
+async def get_project_config(project_id: str, db=Depends(get_read_db_session)):
     logger.info(f"Fetching project details for project_id={project_id}")
 
     project = await project_controller.fetch_project_row(db, project_id)
@@ -193,7 +470,7 @@ async def get_project_config(project_id: str, db=Depends(get_db_session)):
 async def update_project_config(
     project_id: str,
     config_data: ProjectConfig,
-    db=Depends(get_db_session),
+    db=Depends(get_write_db_session),
 ):
     logger.info(f"Updating project config for project_id={project_id}")
 
@@ -1,19 +1,139 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from src.config import config
-from src.controller.scene import fetch_scene_row, update_scene_status
-from src.db import get_db_session
+from src.controller.scene import (
+    CountMode,
+    SceneFilters,
+    count_scenes,
+    decode_scene_cursor,
+    fetch_scene_row,
+    search_scenes,
+    update_scene_status,
+)
+from src.controller.scene_stats import (
+    fetch_queue_depth,
+    fetch_throughput,
+    fetch_time_in_stage,
+)
+from src.db import get_read_db_session, get_write_db_session
 from src.logger import get_logger
 from src.models import SceneStatusEnum
-from src.schemas.scene import SceneDetailsOut, ScenePatchStatusOut
+from src.schemas.scene import (
+    SceneDetailsOut,
+    ScenePatchStatusOut,
+    SceneQueueDepthOut,
+    SceneSearchOut,
+    SceneThroughputOut,
+    SceneTimeInStageOut,
+)
+from src.utils.responses import ORJSONResponse
 
 router = APIRouter()
 
 logger = get_logger("glacier_watch")
 
 
+@router.get("/", name="Search Scenes", response_model=SceneSearchOut)
+async def search_scene_catalog(
+    project_id: Optional[list[str]] = Query(None, description="Project IDs"),
+    status: Optional[list[SceneStatusEnum]] = Query(None, description="Statuses"),
+    start: Optional[date] = Query(None, description="First acquisition day"),
+    end: Optional[date] = Query(None, description="Last acquisition day"),
+    min_attempts_download: Optional[int] = Query(None, ge=0),
+    min_attempts_processing: Optional[int] = Query(None, ge=0),
+    has_error: Optional[bool] = Query(
+        None, description="Only scenes with (true) or without (false) a last error"
+    ),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the last page"),
+    count: CountMode = CountMode.none,
+    db=Depends(get_read_db_session),
+):
+    """Search scenes across all projects, paginated with an opaque cursor."""
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    try:
+        after = decode_scene_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    filters = SceneFilters(
+        project_ids=project_id,
+        statuses=status,
+        start=start,
+        end=end,
+        min_attempts_download=min_attempts_download,
+        min_attempts_processing=min_attempts_processing,
+        has_error=has_error,
+    )
+
+    scenes, next_cursor = await search_scenes(db, filters, limit, after)
+    total = await count_scenes(db, filters, count)
+
+    logger.info(
+        f"Scene search returned {len(scenes)} scenes (count={total}, mode={count.value})"
+    )
+
+    return ORJSONResponse(
+        {
+            "scenes": [
+                {
+                    "scene_id": scene.scene_id,
+                    "project_id": scene.project_id,
+                    "acquisition_date": scene.acquisition_date,
+                    "status": scene.status.name,
+                    "attempts_download": scene.attempts_download,
+                    "attempts_processing": scene.attempts_processing,
+                    "last_error": scene.last_error,
+                }
+                for scene in scenes
+            ],
+            "next_cursor": next_cursor,
+            "count": total,
+            "count_mode": count.value,
+        }
+    )
+
+
+@router.get(
+    "/stats/throughput", name="Get Scene Throughput", response_model=SceneThroughputOut
+)
+async def get_scene_throughput(
+    hours: int = Query(24, ge=1, le=24 * 90, description="Period, ending now"),
+    db=Depends(get_read_db_session),
+):
+    """Status changes per hour for each stage of the pipeline."""
+    return {"hours": hours, "stages": await fetch_throughput(db, hours)}
+
+
+@router.get(
+    "/stats/time-in-stage",
+    name="Get Scene Time In Stage",
+    response_model=SceneTimeInStageOut,
+)
+async def get_scene_time_in_stage(
+    hours: int = Query(24, ge=1, le=24 * 90, description="Period, ending now"),
+    db=Depends(get_read_db_session),
+):
+    """Time-in-stage percentiles of the scenes that left a stage in the period."""
+    return {"hours": hours, "stages": await fetch_time_in_stage(db, hours)}
+
+
+@router.get(
+    "/stats/queue-depth",
+    name="Get Scene Queue Depth",
+    response_model=SceneQueueDepthOut,
+)
+async def get_scene_queue_depth(db=Depends(get_read_db_session)):
+    return {"statuses": await fetch_queue_depth(db)}
+
+
 @router.get("/{scene_id}", name="Get Scene Details", response_model=SceneDetailsOut)
-async def get_scene_details(scene_id: str, db=Depends(get_db_session)):
+async def get_scene_details(scene_id: str, db=Depends(get_read_db_session)):
     scene = await fetch_scene_row(db, scene_id)
     if not scene:
         raise HTTPException(status_code=404, detail="Scene not found")
@@ -35,7 +155,10 @@ async def get_scene_details(scene_id: str, db=Depends(get_db_session)):
     response_model=ScenePatchStatusOut,
 )
 async def patch_scene_status(
-    scene_id: str, new_status: SceneStatusEnum, api_key: str, db=Depends(get_db_session)
+    scene_id: str,
+    new_status: SceneStatusEnum,
+    api_key: str,
+    db=Depends(get_write_db_session),
 ):
     if api_key != config.api_key:
         raise HTTPException(status_code=403, detail="Invalid API key")
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class RawFolderRef(BaseModel):
+    project_id: str = Field(..., description="Identifier of the project")
+    folder_name: str = Field(..., description="Name of the folder in the project")
+
+
+class RawDeletionIn(BaseModel):
+    folders: list[RawFolderRef] = Field(
+        ..., min_length=1, description="Raw folders to delete"
+    )
+
+
+class DeletionJobOut(BaseModel):
+    job_id: str = Field(..., description="Identifier of the deletion job")
+    status: str = Field(
+        ..., description="queued, running, finished or failed (finished with errors)"
+    )
+    folders: list[str] = Field(
+        ..., description="Deleted folders, relative to the data folder"
+    )
+    bytes_removed: int = Field(..., description="Bytes removed so far")
+    files_removed: int = Field(..., description="Files removed so far")
+    errors: list[str] = Field(..., description="Errors encountered while deleting")
+    created_at: datetime = Field(..., description="When the job was submitted")
+    finished_at: Optional[datetime] = Field(
+        None, description="When the job finished, null while it is running"
+    )
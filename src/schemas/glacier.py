@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field
@@ -39,6 +39,10 @@ class GlacierTimeSeriesDataPoint(BaseModel):
     snowline_elevation_m: Optional[float] = Field(
         None, description="Elevation of the snowline on the glacier in meters"
     )
+    observations: Optional[int] = Field(
+        None,
+        description="Observations averaged into the grid cell, resampled series only",
+    )
 
 
 class GlacierTimeSeriesOut(BaseModel):
@@ -46,3 +50,73 @@ class GlacierTimeSeriesOut(BaseModel):
     timeseries: list[GlacierTimeSeriesDataPoint] = Field(
         ..., description="List of glacier snow data timeseries points"
     )
+
+
+class GlacierAnomalyPoint(BaseModel):
+    acquisition_date: datetime = Field(
+        ..., description="Date when the data was acquired"
+    )
+    value: Optional[float] = Field(None, description="Observed value of the metric")
+    climatology_count: int = Field(
+        ..., description="Number of observations in the climatology window"
+    )
+    mean: Optional[float] = Field(None, description="Climatological mean")
+    std: Optional[float] = Field(None, description="Climatological standard deviation")
+    p10: Optional[float] = Field(None, description="Climatological 10th percentile")
+    p50: Optional[float] = Field(None, description="Climatological median")
+    p90: Optional[float] = Field(None, description="Climatological 90th percentile")
+    anomaly: Optional[float] = Field(
+        None, description="Observed value minus the climatological mean"
+    )
+    percentile_rank: Optional[float] = Field(
+        None, description="Share of climatological values below the observed value"
+    )
+
+
+class GlacierAnomalyOut(BaseModel):
+    glacier_id: str = Field(..., description="Unique identifier for the glacier")
+    metric: str = Field(..., description="Compared metric")
+    season: int = Field(..., description="Hydrological year, named after its end year")
+    season_start: date = Field(..., description="First day of the season")
+    season_end: date = Field(..., description="Last day of the season")
+    window_days: int = Field(
+        ..., description="Days around each day of year pooled into the climatology"
+    )
+    points: list[GlacierAnomalyPoint] = Field(
+        ..., description="Observations of the season compared to the climatology"
+    )
+
+
+class GlacierTimeSeriesBatchOut(BaseModel):
+    metric: str = Field(..., description="Resampled metric")
+    frequency: str = Field(..., description="Grid frequency, daily or weekly")
+    glacier_ids: list[str] = Field(..., description="Row labels of values")
+    dates: list[date] = Field(..., description="Column labels of values")
+    values: list[list[Optional[float]]] = Field(
+        ..., description="One row per glacier, null where no value could be derived"
+    )
+
+
+class GlacierAtOut(BaseModel):
+    glacier_id: str = Field(..., description="Unique identifier for the glacier")
+    name: Optional[str] = Field(None, description="Name of the glacier")
+    area_m2: Optional[float] = Field(
+        None, description="Area of the glacier in square meters"
+    )
+
+
+class GlacierAtPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90, description="Latitude")
+    lon: float = Field(..., ge=-180, le=180, description="Longitude")
+
+
+class GlacierAtBatchIn(BaseModel):
+    points: list[GlacierAtPoint] = Field(
+        ..., min_length=1, max_length=10000, description="Points to look up"
+    )
+
+
+class GlacierAtBatchOut(BaseModel):
+    glaciers: list[Optional[GlacierAtOut]] = Field(
+        ..., description="Glacier under each point, in order, null outside glaciers"
+    )
@@ -44,7 +44,9 @@ class ListProjectsOut(BaseModel):
 
 
 class ProjectDetails(ProjectListItem):
-    description: str = Field(..., description="Detailed description of the project")
+    description: Optional[str] = Field(
+        None, description="Detailed description of the project"
+    )
     aoi: Optional[GeoJSON] = Field(
         None, description="GeoJSON representation of the project's area of interest"
     )
@@ -82,3 +84,14 @@ class ProjectConfig(BaseModel):
         60,
         description="Minimum coverage percentage for scenes to be included in the project",
     )
+
+
+class SnowMatrixOut(BaseModel):
+    project_id: str = Field(..., description="Unique identifier for the project")
+    metric: str = Field(..., description="Metric contained in the matrix")
+    glacier_ids: list[str] = Field(..., description="Row labels, sorted glacier IDs")
+    dates: list[str] = Field(..., description="Column labels, sorted acquisition days")
+    values: list[list[Optional[float]]] = Field(
+        ...,
+        description="One row per glacier, one value per day, null where there is no data",
+    )
@@ -23,3 +23,66 @@ class SceneDetailsOut(BaseModel):
 class ScenePatchStatusOut(BaseModel):
     scene_id: str = Field(..., description="Unique identifier for the scene")
     status: str = Field(..., description="Updated processing status of the scene")
+
+
+class SceneSearchItem(SceneDetailsOut):
+    acquisition_date: Optional[datetime] = Field(
+        None, description="Acquisition date of the scene"
+    )
+
+
+class SceneSearchOut(BaseModel):
+    scenes: list[SceneSearchItem] = Field(
+        ..., description="Matching scenes, newest acquisition first"
+    )
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor of the next page, null on the last page"
+    )
+    count: Optional[int] = Field(
+        None, description="Number of matching scenes, exact or estimated"
+    )
+    count_mode: str = Field(..., description="How count was determined")
+
+
+class StageHourOut(BaseModel):
+    hour: datetime = Field(..., description="Start of the hour")
+    transitions: int = Field(..., description="Status changes in the hour")
+
+
+class StageThroughputOut(BaseModel):
+    from_status: str = Field(..., description="Status the scenes left")
+    to_status: str = Field(..., description="Status the scenes entered")
+    transitions: int = Field(..., description="Status changes in the period")
+    per_hour: float = Field(..., description="Average status changes per hour")
+    hourly: list[StageHourOut] = Field(..., description="Hours with status changes")
+
+
+class SceneThroughputOut(BaseModel):
+    hours: int = Field(..., description="Length of the period, ending now")
+    stages: list[StageThroughputOut]
+
+
+class StageDurationOut(BaseModel):
+    stage: str = Field(..., description="Status the scenes left")
+    count: int = Field(..., description="Status changes with a known time in stage")
+    mean_seconds: Optional[float] = Field(None, description="Mean time in stage")
+    p50_seconds: Optional[float] = Field(None, description="Median time in stage")
+    p90_seconds: Optional[float] = Field(None, description="90th percentile")
+    p99_seconds: Optional[float] = Field(None, description="99th percentile")
+
+
+class SceneTimeInStageOut(BaseModel):
+    hours: int = Field(..., description="Length of the period, ending now")
+    stages: list[StageDurationOut]
+
+
+class QueueDepthItem(BaseModel):
+    status: str = Field(..., description="Processing status")
+    scenes: int = Field(..., description="Number of scenes in the status")
+    oldest_seconds: Optional[float] = Field(
+        None, description="Seconds since the least recently updated scene changed"
+    )
+
+
+class SceneQueueDepthOut(BaseModel):
+    statuses: list[QueueDepthItem]
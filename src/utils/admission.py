@@ -0,0 +1,141 @@
+import asyncio
+import enum
+import heapq
+import itertools
+import math
+from collections import Counter
+from collections.abc import AsyncGenerator
+from typing import ClassVar, Optional
+
+from fastapi import HTTPException, Request
+
+from src.config import config
+
+
+class Priority(enum.IntEnum):
+    """Admission classes, lower values are admitted first."""
+
+    write = 0
+    read = 1
+    bulk = 2
+
+
+class AdmissionRejected(Exception):
+    pass
+
+
+class AdmissionGate:
+    """Bounded number of concurrent holders, waiters admitted by priority.
+
+    Callers that would wait longer than the timeout, or find the queue already
+    full, are rejected instead of queueing indefinitely.
+    """
+
+    groups: ClassVar[list["AdmissionGate"]] = []
+
+    def __init__(self, name: str, capacity: int, max_queue: int) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.in_use = 0
+        self.waiting = 0
+        self.admitted: Counter[str] = Counter()
+        self.shed: Counter[str] = Counter()
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        AdmissionGate.groups.append(self)
+
+    async def acquire(self, priority: Priority, timeout: float) -> None:
+        if self.in_use < self.capacity and not self.waiting:
+            self.in_use += 1
+            self.admitted[priority.name] += 1
+            return
+
+        if self.waiting >= self.max_queue:
+            self.shed[priority.name] += 1
+            raise AdmissionRejected(f"{self.name}: queue full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(timeout):
+                await future
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # the slot was handed over just as the wait ended, pass it on
+                self.release()
+            else:
+                future.cancel()
+            if isinstance(e, TimeoutError):
+                self.shed[priority.name] += 1
+                raise AdmissionRejected(f"{self.name}: timed out") from None
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.admitted[priority.name] += 1
+
+    def release(self) -> None:
+        # hand the slot directly to the next live waiter, if any
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
+
+
+def service_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, retry later",
+        headers={"Retry-After": str(math.ceil(config.admission_timeout_seconds))},
+    )
+
+
+def route_name(request: Request) -> Optional[str]:
+    route = request.scope.get("route")
+    return getattr(route, "name", None)
+
+
+def route_priority(request: Request) -> Priority:
+    name = route_name(request)
+    return Priority[config.route_priorities.get(name, Priority.read.name)]
+
+
+_route_gates: dict[str, AdmissionGate] = {}
+
+
+async def limit_route(request: Request) -> AsyncGenerator[None, None]:
+    """Caps concurrent requests to routes with a configured limit."""
+    name = route_name(request)
+    limit = config.route_concurrency_limits.get(name)
+    if not limit:
+        yield
+        return
+
+    gate = _route_gates.get(name)
+    if gate is None:
+        gate = _route_gates[name] = AdmissionGate(
+            f"route:{name}", limit, config.admission_max_queue
+        )
+
+    try:
+        await gate.acquire(route_priority(request), config.admission_timeout_seconds)
+    except AdmissionRejected:
+        raise service_unavailable()
+
+    try:
+        yield
+    finally:
+        gate.release()
@@ -0,0 +1,103 @@
+import enum
+import io
+from typing import Any, Optional
+
+import numpy as np
+
+from src.config import config
+
+MAX_DECIMAL_DIGITS = 15
+
+
+class GeometryFormat(str, enum.Enum):
+    geojson = "geojson"
+    topojson = "topojson"
+    wkb = "wkb"
+    fgb = "fgb"
+
+
+MEDIA_TYPES = {
+    GeometryFormat.geojson: "application/geo+json",
+    GeometryFormat.topojson: "application/json",
+    GeometryFormat.wkb: "application/wkb",
+    GeometryFormat.fgb: "application/vnd.flatgeobuf",
+}
+
+_ACCEPT_FORMATS = {
+    "application/json": GeometryFormat.geojson,
+    "application/geo+json": GeometryFormat.geojson,
+    "application/topo+json": GeometryFormat.topojson,
+    "application/wkb": GeometryFormat.wkb,
+    "application/vnd.ogc.wkb": GeometryFormat.wkb,
+    "application/vnd.flatgeobuf": GeometryFormat.fgb,
+    "application/flatgeobuf": GeometryFormat.fgb,
+}
+
+
+def _parse_accept(accept: str) -> list[str]:
+    """Media types of an Accept header, highest quality first."""
+    weighted = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            weighted.append((-quality, position, media_type.lower()))
+
+    return [media_type for _, _, media_type in sorted(weighted)]
+
+
+def negotiate_geometry_format(
+    requested: Optional[GeometryFormat],
+    accept: Optional[str],
+    allowed: set[GeometryFormat],
+) -> Optional[GeometryFormat]:
+    """Pick the response encoding from a ?format= value or the Accept header.
+
+    Returns:
+        Optional[GeometryFormat]: The format, or None if the explicitly requested
+            one is not offered by the route
+    """
+    if requested is not None:
+        return requested if requested in allowed else None
+
+    for media_type in _parse_accept(accept or ""):
+        geometry_format = _ACCEPT_FORMATS.get(media_type)
+        if geometry_format in allowed:
+            return geometry_format
+
+    return GeometryFormat.geojson
+
+
+def resolve_precision(precision: Optional[int]) -> int:
+    """Decimal digits for ST_AsGeoJSON, defaulting to the configured precision."""
+    if precision is None:
+        return config.geojson_max_decimal_digits
+    return precision
+
+
+def write_flatgeobuf(
+    wkb: list[bytes], fields: dict[str, list[Any]], layer: str
+) -> bytes:
+    """Encode WGS84 multipolygons with attributes as FlatGeobuf with a spatial index."""
+    from pyogrio.raw import write
+
+    buffer = io.BytesIO()
+    write(
+        buffer,
+        np.asarray(wkb, dtype=object),
+        field_data=[np.asarray(values, dtype=object) for values in fields.values()],
+        fields=list(fields),
+        driver="FlatGeobuf",
+        geometry_type="MultiPolygon",
+        crs="EPSG:4326",
+        layer=layer,
+        SPATIAL_INDEX="YES",
+    )
+    return buffer.getvalue()
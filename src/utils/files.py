@@ -0,0 +1,40 @@
+import os
+import stat
+import tempfile
+from pathlib import Path
+
+# os.umask can only be read by setting it, which is not thread safe; read it
+# once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path: Path) -> int:
+    """The existing file's permissions, or what open() would create it with."""
+    try:
+        return stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def write_bytes_atomic(path: Path, content: bytes) -> None:
+    """Write a file via a temporary sibling and rename it into place.
+
+    Readers see either the previous file or the complete new one, never a
+    partially written file. The file keeps its permissions, mkstemp alone
+    would leave it readable by its owner only.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mode = _file_mode(path)
+
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(content)
+            os.fchmod(tmp_file.fileno(), mode)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,71 @@
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from pyproj import CRS as ProjCRS
+from pyproj import Transformer
+
+from src.config import CRS
+
+WGS84 = "EPSG:4326"
+
+_POLYGON_TYPE_ID = 3
+
+
+@lru_cache(maxsize=16)
+def _get_transformer(src_crs: str, dst_crs: str) -> Transformer:
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+def is_same_crs(src_crs: str | None, dst_crs: str) -> bool:
+    if src_crs is None:
+        return True
+    return ProjCRS.from_user_input(src_crs) == ProjCRS.from_user_input(dst_crs)
+
+
+def reproject(geoms: np.ndarray, src_crs: str, dst_crs: str) -> np.ndarray:
+    """Reproject an array of geometries, transforming all coordinates in one call."""
+    if is_same_crs(src_crs, dst_crs):
+        return geoms
+
+    transformer = _get_transformer(src_crs, dst_crs)
+    return shapely.transform(geoms, transformer.transform, interleaved=False)
+
+
+def to_multipolygons(geoms: np.ndarray) -> np.ndarray:
+    """Normalize an array of geometries to MULTIPOLYGONs.
+
+    Polygonal parts of (multi)polygons and geometry collections are kept, anything
+    else (points, lines, empty geometries) is dropped. Entries without any
+    polygonal part become None.
+    """
+    parts, part_index = shapely.get_parts(geoms, return_index=True)
+    # make_valid can return collections holding multipolygons, so flatten twice
+    parts, sub_index = shapely.get_parts(parts, return_index=True)
+    part_index = part_index[sub_index]
+
+    keep = (shapely.get_type_id(parts) == _POLYGON_TYPE_ID) & ~shapely.is_empty(parts)
+
+    out = np.full(len(geoms), None, dtype=object)
+    if keep.any():
+        shapely.multipolygons(parts[keep], indices=part_index[keep], out=out)
+    return out
+
+
+def repair(geoms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Run make_valid on the invalid geometries of the array.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The repaired geometries and the mask of the
+            entries that were invalid.
+    """
+    invalid = ~shapely.is_valid(geoms) & ~shapely.is_missing(geoms)
+    if invalid.any():
+        geoms = geoms.copy()
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+    return geoms, invalid
+
+
+def areas_m2(geoms: np.ndarray, src_crs: str = WGS84) -> np.ndarray:
+    """Area of each geometry in square meters, measured in the project CRS."""
+    return shapely.area(reproject(geoms, src_crs, CRS))
@@ -0,0 +1,160 @@
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import PurePath
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# profiling never runs longer than this, even if the request does
+MAX_PROFILE_SECONDS = 60
+
+# leaf frames of threads that are blocked waiting for work
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+@dataclass
+class RequestProfile:
+    """Time spent in each phase of a profiled request, in seconds."""
+
+    started: float = field(default_factory=time.perf_counter)
+    phases: Counter = field(default_factory=Counter)
+    db_queries: int = 0
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+@contextmanager
+def phase(name: str):
+    """Add the time spent in the block to the current request's profile."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[name] += time.perf_counter() - started
+
+
+@contextmanager
+def profiling(profile: RequestProfile):
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Time the statements of profiled requests."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current_profile.get() is not None:
+            context._profile_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        started = getattr(context, "_profile_started", None)
+        if profile is not None and started is not None:
+            profile.phases["db"] += time.perf_counter() - started
+            profile.db_queries += 1
+
+
+_fastapi_instrumented = False
+
+
+def instrument_fastapi() -> None:
+    """Count response_model validation and encoding as serialization time."""
+    global _fastapi_instrumented
+    if _fastapi_instrumented:
+        return
+
+    import fastapi.routing
+
+    serialize_response = fastapi.routing.serialize_response
+
+    async def timed_serialize_response(*args, **kwargs):
+        with phase("serialization"):
+            return await serialize_response(*args, **kwargs)
+
+    # looked up as a module global on every request, so replacing it is enough
+    fastapi.routing.serialize_response = timed_serialize_response
+    _fastapi_instrumented = True
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = PurePath(code.co_filename)
+    return f"{code.co_name} ({'/'.join(path.parts[-2:])}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of all threads at a fixed interval.
+
+    The result is in the collapsed format ("frame;frame;frame count" per line)
+    read by flamegraph.pl, speedscope and most other flame graph tools. Idle
+    worker threads are left out; the event loop thread is always kept, its time
+    in select() is time spent waiting on the database or the network.
+    """
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+
+            leaf = (PurePath(frame.f_code.co_filename).name, frame.f_code.co_name)
+            if leaf in _IDLE_FRAMES:
+                continue
+
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(labels))] += 1
+
+        self.samples += 1
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + MAX_PROFILE_SECONDS
+        while not self._stop.wait(self.interval_seconds):
+            if time.monotonic() > deadline:
+                return
+            self._sample()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
@@ -0,0 +1,30 @@
+from typing import Any, Optional
+
+import orjson
+from fastapi.responses import Response
+
+from src.utils.profiling import phase
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson.
+
+    Handlers on hot paths return this directly with plain dicts, which skips
+    FastAPI's response_model validation; the response_model is then only used
+    for the OpenAPI schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with phase("serialization"):
+            return orjson.dumps(
+                content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            )
+
+
+def raw_json(json_str: Optional[str]) -> Optional[orjson.Fragment]:
+    """Embed an already serialized JSON document, e.g. from ST_AsGeoJSON, as is."""
+    if not json_str:
+        return None
+    return orjson.Fragment(json_str)
@@ -0,0 +1,163 @@
+from typing import Any, Optional
+
+import numpy as np
+import shapely
+
+MAX_PRECISION = 7
+
+
+class _ArcIndex:
+    """Deduplicates arcs, so a border shared by two glaciers is stored once."""
+
+    def __init__(self) -> None:
+        self.arcs: list[np.ndarray] = []
+        self._index: dict[bytes, int] = {}
+
+    def add(self, arc: np.ndarray, arc_keys: np.ndarray) -> int:
+        forward = arc_keys.tobytes()
+        if forward in self._index:
+            return self._index[forward]
+
+        backward = arc_keys[::-1].tobytes()
+        if backward in self._index:
+            return ~self._index[backward]
+
+        self._index[forward] = len(self.arcs)
+        self.arcs.append(arc)
+        return len(self.arcs) - 1
+
+
+def _quantized_rings(
+    geometry, translate: np.ndarray, scale: float
+) -> list[list[np.ndarray]]:
+    """Quantize a (multi)polygon into lists of open rings per polygon.
+
+    Consecutive duplicate points are dropped; rings that collapse are removed.
+    """
+    polygons = []
+    for polygon in shapely.get_parts(geometry):
+        rings = []
+        for ring in [polygon.exterior, *polygon.interiors]:
+            coords = shapely.get_coordinates(ring)[:-1]
+            points = np.rint((coords - translate) / scale).astype("int64")
+
+            moved = np.any(points != np.roll(points, 1, axis=0), axis=1)
+            points = points[moved]
+            if len(points) >= 3:
+                rings.append(points)
+            elif not rings:
+                break
+        if rings:
+            polygons.append(rings)
+    return polygons
+
+
+def _point_keys(points: np.ndarray, span_y: int) -> np.ndarray:
+    return points[:, 0] * (span_y + 1) + points[:, 1]
+
+
+def _find_junctions(rings: list[np.ndarray], span_y: int) -> np.ndarray:
+    """Keys of points where rings meet with different neighbours.
+
+    A point shared by several rings is a junction when it is reached with more
+    than one distinct (unordered) pair of neighbouring points, i.e. where a
+    shared border begins or ends.
+    """
+    if not rings:
+        return np.empty(0, dtype="int64")
+
+    points = np.concatenate([_point_keys(ring, span_y) for ring in rings])
+    previous = np.concatenate([np.roll(_point_keys(r, span_y), 1) for r in rings])
+    following = np.concatenate([np.roll(_point_keys(r, span_y), -1) for r in rings])
+
+    neighbours = np.column_stack(
+        [points, np.minimum(previous, following), np.maximum(previous, following)]
+    )
+    distinct = np.unique(neighbours, axis=0)
+    keys, counts = np.unique(distinct[:, 0], return_counts=True)
+    return keys[counts > 1]
+
+
+def _ring_arcs(
+    ring: np.ndarray, junctions: np.ndarray, span_y: int, arc_index: _ArcIndex
+) -> list[int]:
+    keys = _point_keys(ring, span_y)
+    cuts = np.flatnonzero(np.isin(keys, junctions))
+
+    if len(cuts) == 0:
+        # closed ring without junctions: start at its smallest point so the same
+        # ring is recognized regardless of where it was started
+        cuts = np.array([np.argmin(keys)])
+
+    rotated = np.roll(ring, -cuts[0], axis=0)
+    closed = np.vstack([rotated, rotated[:1]])
+    closed_keys = _point_keys(closed, span_y)
+    bounds = list(cuts - cuts[0]) + [len(ring)]
+
+    return [
+        arc_index.add(closed[start : end + 1], closed_keys[start : end + 1])
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def _delta_encode(arc: np.ndarray) -> list[list[int]]:
+    deltas = np.vstack([arc[:1], np.diff(arc, axis=0)])
+    return deltas.tolist()
+
+
+def encode_topology(
+    features: list[tuple[Any, dict, Any]],
+    precision: int,
+    object_name: str = "features",
+) -> dict:
+    """Encode (multi)polygon features as a quantized, delta-encoded TopoJSON.
+
+    Args:
+        features (list[tuple[Any, dict, Any]]): (id, properties, shapely geometry)
+        precision (int): Decimal digits kept, the quantization cell is 10^-precision
+        object_name (str): Name of the geometry collection in the topology
+
+    Returns:
+        dict: The TopoJSON topology
+    """
+    precision = min(precision, MAX_PRECISION)
+    scale = 10.0**-precision
+
+    geometries = np.array([geometry for _, _, geometry in features], dtype=object)
+    bounds = shapely.total_bounds(geometries) if len(geometries) else np.zeros(4)
+    translate = bounds[:2]
+    span_y = int(np.rint((bounds[3] - bounds[1]) / scale)) + 1
+
+    quantized = [
+        _quantized_rings(geometry, translate, scale) for geometry in geometries
+    ]
+    junctions = _find_junctions(
+        [ring for polygons in quantized for rings in polygons for ring in rings],
+        span_y,
+    )
+
+    arc_index = _ArcIndex()
+    topo_geometries: list[dict[str, Optional[Any]]] = []
+    for (feature_id, properties, _), polygons in zip(features, quantized):
+        arcs = [
+            [_ring_arcs(ring, junctions, span_y, arc_index) for ring in rings]
+            for rings in polygons
+        ]
+        topo_geometries.append(
+            {
+                "type": "MultiPolygon" if arcs else None,
+                "id": feature_id,
+                "properties": properties,
+                "arcs": arcs,
+            }
+        )
+
+    return {
+        "type": "Topology",
+        "bbox": bounds.tolist(),
+        "transform": {"scale": [scale, scale], "translate": translate.tolist()},
+        "objects": {
+            object_name: {"type": "GeometryCollection", "geometries": topo_geometries}
+        },
+        "arcs": [_delta_encode(arc) for arc in arc_index.arcs],
+    }
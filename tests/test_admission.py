@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from src.utils.admission import AdmissionGate, AdmissionRejected, Priority
+
+
+@pytest.fixture
+def gate():
+    gate = AdmissionGate("test", capacity=1, max_queue=2)
+    yield gate
+    AdmissionGate.groups.remove(gate)
+
+
+def test_admits_up_to_capacity_without_waiting(gate):
+    async def run():
+        await gate.acquire(Priority.read, timeout=1)
+        with pytest.raises(AdmissionRejected):
+            await gate.acquire(Priority.read, timeout=0.01)
+        gate.release()
+        await gate.acquire(Priority.read, timeout=0.01)
+
+    asyncio.run(run())
+    assert gate.stats() == {
+        "capacity": 1,
+        "in_use": 1,
+        "waiting": 0,
+        "admitted": {"read": 2},
+        "shed": {"read": 1},
+    }
+
+
+def test_waiters_are_admitted_by_priority_then_arrival(gate):
+    admitted = []
+
+    async def wait(priority, label):
+        await gate.acquire(priority, timeout=1)
+        admitted.append(label)
+        gate.release()
+
+    async def run():
+        await gate.acquire(Priority.write, timeout=1)
+        gate.max_queue = 3
+        waiters = [
+            asyncio.create_task(wait(Priority.bulk, "bulk")),
+            asyncio.create_task(wait(Priority.read, "first read")),
+            asyncio.create_task(wait(Priority.read, "second read")),
+        ]
+        await asyncio.sleep(0)
+        assert gate.waiting == 3
+        # the slot is handed over, so it stays in use in between
+        gate.release()
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    assert admitted == ["first read", "second read", "bulk"]
+    assert gate.in_use == 0
+
+
+def test_rejects_when_the_queue_is_full(gate):
+    async def run():
+        await gate.acquire(Priority.read, timeout=1)
+        waiters = [
+            asyncio.create_task(gate.acquire(Priority.read, timeout=1))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected, match="queue full"):
+            await gate.acquire(Priority.write, timeout=1)
+        for _ in waiters:
+            gate.release()
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    assert gate.shed == {"write": 1}
+    assert gate.in_use == 1
+
+
+def test_new_callers_queue_behind_waiters(gate):
+    async def run():
+        await gate.acquire(Priority.read, timeout=1)
+        waiter = asyncio.create_task(gate.acquire(Priority.bulk, timeout=1))
+        await asyncio.sleep(0)
+        gate.release()
+        # the slot went to the waiter, not to a caller arriving meanwhile
+        with pytest.raises(AdmissionRejected, match="timed out"):
+            await gate.acquire(Priority.write, timeout=0.01)
+        await waiter
+
+    asyncio.run(run())
+    assert gate.in_use == 1
+    assert gate.admitted == {"read": 1, "bulk": 1}
+
+
+def test_timed_out_waiter_is_skipped(gate):
+    async def run():
+        await gate.acquire(Priority.read, timeout=1)
+        with pytest.raises(AdmissionRejected):
+            await gate.acquire(Priority.write, timeout=0.01)
+        gate.release()
+
+    asyncio.run(run())
+    assert gate.in_use == 0
+    assert gate.waiting == 0
@@ -0,0 +1,143 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from src.config import config
+from src.controller.climatology import (
+    BINS,
+    DAYS_IN_YEAR,
+    Climatology,
+    ClimatologyMetric,
+    compare_to_climatology,
+    compute_increments,
+    histogram_quantiles,
+    histogram_rank,
+)
+
+FRACTION = ClimatologyMetric.snow_area_fraction
+SNOWLINE = ClimatologyMetric.snowline_elevation_m
+
+
+def _by_metric(increments, metric):
+    return {
+        (row["glacier_id"], row["day_of_year"]): row
+        for row in increments
+        if row["metric"] == metric.value
+    }
+
+
+def _climatology(metric, day, values) -> Climatology:
+    """A climatology holding the values on one day of the year."""
+    bins = BINS[metric]
+    counts = np.zeros(DAYS_IN_YEAR + 1, dtype="int64")
+    sums = np.zeros(DAYS_IN_YEAR + 1)
+    sums_sq = np.zeros(DAYS_IN_YEAR + 1)
+    histograms = np.zeros((DAYS_IN_YEAR + 1, bins.count), dtype="int64")
+    values = np.array(values)
+    counts[day] = len(values)
+    sums[day] = values.sum()
+    sums_sq[day] = (values**2).sum()
+    np.add.at(histograms[day], bins.index(values), 1)
+    return Climatology(metric, counts, sums, sums_sq, histograms)
+
+
+def test_compute_increments_groups_by_glacier_and_day():
+    rows = [
+        ("G1", 200, 500.0, 1000.0, 3000.0),
+        ("G1", 200, 250.0, 1000.0, 3100.0),
+        ("G2", 200, 100.0, 1000.0, None),
+        ("G2", 201, 100.0, 0.0, 2900.0),
+    ]
+
+    increments = compute_increments(rows)
+
+    fraction = _by_metric(increments, FRACTION)
+    assert set(fraction) == {("G1", 200), ("G2", 200)}
+    assert fraction["G1", 200]["sample_count"] == 2
+    assert fraction["G1", 200]["value_sum"] == pytest.approx(0.75)
+    assert fraction["G1", 200]["value_sum_sq"] == pytest.approx(0.3125)
+    assert sum(fraction["G1", 200]["histogram"]) == 2
+
+    snowline = _by_metric(increments, SNOWLINE)
+    assert set(snowline) == {("G1", 200), ("G2", 201)}
+    assert snowline["G1", 200]["value_sum"] == pytest.approx(6100.0)
+
+
+def test_compute_increments_removal_cancels_an_addition():
+    row = ("G1", 10, 500.0, 1000.0, 3000.0)
+
+    increments = compute_increments([row, row], weights=[1, -1])
+
+    for increment in increments:
+        assert increment["sample_count"] == 0
+        assert increment["value_sum"] == pytest.approx(0.0)
+        assert not any(increment["histogram"])
+
+
+def test_compute_increments_without_rows():
+    assert compute_increments([]) == []
+
+
+def test_histogram_quantiles_interpolate_within_bins():
+    bins = BINS[FRACTION]
+    histogram = np.zeros(bins.count, dtype="int64")
+    histogram[[10, 20]] = 5
+
+    p25, p50, p75 = histogram_quantiles(histogram, bins, [0.25, 0.5, 0.75])
+
+    assert p25 == pytest.approx(bins.width * 10.5)
+    assert p50 == pytest.approx(bins.width * 11)
+    assert p75 == pytest.approx(bins.width * 20.5)
+
+
+def test_histogram_quantiles_of_an_empty_histogram():
+    bins = BINS[FRACTION]
+
+    assert histogram_quantiles(np.zeros(bins.count), bins, [0.5]) == [None]
+
+
+def test_histogram_rank():
+    bins = BINS[FRACTION]
+    histogram = np.zeros(bins.count, dtype="int64")
+    histogram[[10, 20]] = 5
+
+    assert histogram_rank(histogram, bins, 0.0) == 0.0
+    assert histogram_rank(histogram, bins, bins.width * 10.5) == pytest.approx(0.25)
+    assert histogram_rank(histogram, bins, bins.width * 15) == pytest.approx(0.5)
+    assert histogram_rank(histogram, bins, 1.0) == 1.0
+
+
+def test_windowed_wraps_at_the_end_of_the_year():
+    climatology = _climatology(FRACTION, 1, [0.5])
+
+    windowed = climatology.windowed(2)
+
+    assert windowed.counts.shape == climatology.counts.shape
+    assert np.flatnonzero(windowed.counts).tolist() == [1, 2, 3, 365, 366]
+    assert windowed.sums[366] == pytest.approx(0.5)
+    assert windowed.histograms[3].sum() == 1
+
+
+def test_compare_to_climatology(monkeypatch):
+    monkeypatch.setattr(config, "climatology_window_days", 0)
+    observed = date(2024, 7, 18)
+    day = observed.timetuple().tm_yday
+    climatology = _climatology(FRACTION, day, [0.2, 0.4, 0.6])
+
+    with_value, without_value, elsewhere = compare_to_climatology(
+        climatology, [(observed, 0.7), (observed, None), (date(2024, 1, 5), 0.1)]
+    )
+
+    assert with_value["climatology_count"] == 3
+    assert with_value["mean"] == pytest.approx(0.4)
+    assert with_value["std"] == pytest.approx(np.std([0.2, 0.4, 0.6]))
+    assert with_value["anomaly"] == pytest.approx(0.3)
+    assert with_value["percentile_rank"] == 1.0
+    assert with_value["p10"] <= with_value["p50"] <= with_value["p90"]
+
+    assert without_value["mean"] == pytest.approx(0.4)
+    assert without_value["anomaly"] is None
+
+    assert elsewhere["climatology_count"] == 0
+    assert elsewhere["mean"] is None
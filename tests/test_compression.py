@@ -0,0 +1,27 @@
+import pytest
+
+from src.middleware.compression import negotiate_encoding
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,expected",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, deflate, br, zstd", "br"),
+        ("gzip, zstd", "zstd"),
+        ("BR;q=0.5, GZIP", "gzip"),
+        ("br;q=0.8, gzip;q=0.9", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("br;q=0, zstd;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("*;q=0.5, gzip", "gzip"),
+        ("*, br;q=0", "zstd"),
+        ("*;q=0", None),
+        ("gzip;q=invalid, zstd;q=0.1", "zstd"),
+        (" gzip ; q=1.0 ,, ", "gzip"),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
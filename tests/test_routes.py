@@ -0,0 +1,262 @@
+"""The routes answer with ORJSONResponse, which bypasses their response_model.
+
+These tests feed the routes controller rows shaped like the real queries'
+and validate the JSON against the declared model, including that it holds
+no field the model does not declare.
+"""
+
+import json
+from collections import namedtuple
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+import src.controller.project as project_controller
+import src.routes.glacier as glacier_routes
+import src.routes.project as project_routes
+import src.routes.scene as scene_routes
+from src.models import SceneStatusEnum
+from src.schemas.glacier import (
+    GlacierAnomalyOut,
+    GlacierAtBatchOut,
+    GlacierAtOut,
+    GlacierDetailsOut,
+    GlacierTimeSeriesBatchOut,
+    GlacierTimeSeriesOut,
+)
+from src.schemas.project import ListProjectsOut, ProjectDetailsOut, SnowMatrixOut
+from src.schemas.scene import SceneDetailsOut, SceneSearchOut
+
+AOI = {
+    "type": "MultiPolygon",
+    "coordinates": [[[[10.0, 46.0], [10.1, 46.0], [10.1, 46.1], [10.0, 46.0]]]],
+}
+POINT = json.dumps({"type": "Point", "coordinates": [10.05, 46.03]})
+
+SceneListRow = namedtuple("SceneListRow", ["scene_id", "acquisition_date", "status"])
+
+
+def assert_matches(response, model: type[BaseModel]) -> BaseModel:
+    assert response.status_code == 200, response.text
+    data = response.json()
+    validated = model.model_validate(data)
+    _assert_declared(validated, data)
+    return validated
+
+
+def _assert_declared(value, data) -> None:
+    """Fail on keys the model does not declare, a response_model would drop them."""
+    if isinstance(value, BaseModel):
+        assert set(data) <= set(type(value).model_fields), (
+            f"{type(value).__name__} does not declare "
+            f"{sorted(set(data) - set(type(value).model_fields))}"
+        )
+        for name in data:
+            _assert_declared(getattr(value, name), data[name])
+    elif isinstance(value, (list, tuple)) and isinstance(data, list):
+        for item, item_data in zip(value, data):
+            _assert_declared(item, item_data)
+
+
+def _returning(value):
+    async def fake(*args, **kwargs):
+        return value
+
+    return fake
+
+
+def _scene(scene_id: str, acquisition_date) -> SimpleNamespace:
+    return SimpleNamespace(
+        scene_id=scene_id,
+        project_id="alps",
+        acquisition_date=acquisition_date,
+        status=SceneStatusEnum.processed,
+        attempts_download=1,
+        attempts_processing=2,
+        last_error=None,
+    )
+
+
+def _project_row(description="Glaciers of the Alps") -> SimpleNamespace:
+    return SimpleNamespace(
+        project_id="alps",
+        name="Alps",
+        description=description,
+        area_of_interest=object(),
+        aoi=json.dumps(AOI),
+        center_geojson=POINT,
+        min_lon=10.0,
+        min_lat=46.0,
+        max_lon=10.1,
+        max_lat=46.1,
+    )
+
+
+def _snow_data(snow_area_m2, snowline_elevation_m):
+    return SimpleNamespace(
+        snow_area_m2=snow_area_m2, snowline_elevation_m=snowline_elevation_m
+    )
+
+
+def test_search_scenes(client, monkeypatch):
+    scenes = [_scene("S2B_2", datetime(2024, 8, 2, 10, 20)), _scene("S2A_1", None)]
+    monkeypatch.setattr(scene_routes, "search_scenes", _returning((scenes, "abc")))
+    monkeypatch.setattr(scene_routes, "count_scenes", _returning(2))
+
+    response = client.get("/v1/scene/", params={"count": "exact"})
+
+    result = assert_matches(response, SceneSearchOut)
+    assert [scene.scene_id for scene in result.scenes] == ["S2B_2", "S2A_1"]
+    assert result.scenes[0].status == "processed"
+    assert result.next_cursor == "abc"
+
+
+def test_scene_details(client, monkeypatch):
+    scene = _scene("S2B_2", datetime(2024, 8, 2, 10, 20))
+    monkeypatch.setattr(scene_routes, "fetch_scene_row", _returning(scene))
+
+    assert_matches(client.get("/v1/scene/S2B_2"), SceneDetailsOut)
+
+
+def test_list_projects(client, monkeypatch):
+    projects = [SimpleNamespace(project_id="alps", name="Alps", center_geojson=POINT)]
+    bounds = SimpleNamespace(min_lat=46.0, min_lon=10.0, max_lat=46.1, max_lon=10.1)
+    monkeypatch.setattr(project_controller, "fetch_projects", _returning(projects))
+    monkeypatch.setattr(project_controller, "fetch_projects_bounds", _returning(bounds))
+
+    result = assert_matches(client.get("/v1/project/"), ListProjectsOut)
+    assert result.projects[0].point == (46.03, 10.05)
+
+
+@pytest.mark.parametrize("description", ["Glaciers of the Alps", None])
+def test_project_details(client, monkeypatch, description):
+    glaciers = [SimpleNamespace(glacier_id="G1", name="Hintereis", pt_geojson=POINT)]
+    scenes = [SceneListRow("S2B_2", datetime(2024, 8, 2), SceneStatusEnum.processed)]
+    monkeypatch.setattr(
+        project_controller, "fetch_project_row", _returning(_project_row(description))
+    )
+    monkeypatch.setattr(
+        project_routes, "fetch_glacier_in_geometry", _returning(glaciers)
+    )
+    monkeypatch.setattr(
+        project_routes, "fetch_scenes_by_project_id", _returning(scenes)
+    )
+    monkeypatch.setattr(project_routes, "count_scenes_by_project_id", _returning(1))
+
+    response = client.get("/v1/project/alps")
+
+    result = assert_matches(response, ProjectDetailsOut)
+    assert response.headers["x-total-count"] == "1"
+    assert result.project.scenes[0].status == "processed"
+
+
+def test_project_snow_matrix(client, monkeypatch):
+    cells = [("G1", date(2024, 8, 2), 0.5), ("G2", date(2024, 8, 3), 0.25)]
+    monkeypatch.setattr(
+        project_controller, "fetch_project_row", _returning(_project_row())
+    )
+    monkeypatch.setattr(project_routes, "fetch_snow_data_version", _returning(None))
+    monkeypatch.setattr(project_routes, "fetch_snow_matrix_cells", _returning(cells))
+
+    result = assert_matches(client.get("/v1/project/alps/snow-matrix"), SnowMatrixOut)
+    assert result.values == [[0.5, None], [None, 0.25]]
+
+
+def test_glacier_details(client, monkeypatch):
+    glacier = SimpleNamespace(
+        glacier_id="G1",
+        name="Hintereis",
+        area_m2=6_500_000.0,
+        geometry_geojson=json.dumps(AOI),
+    )
+    monkeypatch.setattr(glacier_routes, "fetch_glacier_details", _returning(glacier))
+
+    assert_matches(client.get("/v1/glacier/G1"), GlacierDetailsOut)
+
+
+def test_glacier_at(client, monkeypatch):
+    found = {"glacier_id": "G1", "name": "Hintereis", "area_m2": 6_500_000.0}
+    monkeypatch.setattr(glacier_routes.glacier_index, "lookup", _returning([found]))
+
+    response = client.get("/v1/glacier/at", params={"lat": 46.8, "lon": 10.77})
+
+    assert_matches(response, GlacierAtOut)
+
+
+def test_glaciers_at(client, monkeypatch):
+    found = {"glacier_id": "G1", "name": None, "area_m2": None}
+    monkeypatch.setattr(
+        glacier_routes.glacier_index, "lookup", _returning([found, None])
+    )
+
+    response = client.post(
+        "/v1/glacier/at",
+        json={"points": [{"lat": 46.8, "lon": 10.77}, {"lat": 0.0, "lon": 0.0}]},
+    )
+
+    result = assert_matches(response, GlacierAtBatchOut)
+    assert result.glaciers[1] is None
+
+
+TIMESERIES = [
+    (_snow_data(3_000_000, 2900), datetime(2024, 8, 2, 10, 20)),
+    (_snow_data(2_000_000, 3000), datetime(2024, 8, 9, 10, 20)),
+]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"frequency": "daily", "interpolation": "linear", "smoothing": "median"},
+    ],
+)
+def test_glacier_timeseries(client, monkeypatch, params):
+    monkeypatch.setattr(glacier_routes, "fetch_glacier_area", _returning(6_500_000.0))
+    monkeypatch.setattr(
+        glacier_routes, "fetch_glacier_timeseries", _returning(TIMESERIES)
+    )
+
+    response = client.get("/v1/glacier/G1/timeseries", params=params)
+
+    result = assert_matches(response, GlacierTimeSeriesOut)
+    assert len(result.timeseries) == (8 if params else 2)
+
+
+def test_glaciers_timeseries(client, monkeypatch):
+    rows = [
+        ("G1", datetime(2024, 8, 2), 3_000_000, 2900, 6_500_000.0),
+        ("G2", datetime(2024, 8, 4), 1_000_000, 3100, 2_000_000.0),
+    ]
+    monkeypatch.setattr(glacier_routes, "fetch_glaciers_timeseries", _returning(rows))
+
+    response = client.get(
+        "/v1/glacier/timeseries",
+        params={"glacier_id": ["G1", "G2", "G3"], "frequency": "daily"},
+    )
+
+    result = assert_matches(response, GlacierTimeSeriesBatchOut)
+    assert result.glacier_ids == ["G1", "G2", "G3"]
+    assert result.values[2] == [None, None, None]
+
+
+def test_glacier_anomaly(client, monkeypatch):
+    climatology = glacier_routes.fetch_climatology
+    monkeypatch.setattr(glacier_routes, "fetch_glacier_area", _returning(6_500_000.0))
+    monkeypatch.setattr(
+        glacier_routes, "fetch_glacier_timeseries", _returning(TIMESERIES)
+    )
+
+    async def fetch_climatology(db, glacier_id, metric):
+        # no stored aggregates, an empty climatology
+        db = SimpleNamespace(execute=_returning([]))
+        return await climatology(db, glacier_id, metric)
+
+    monkeypatch.setattr(glacier_routes, "fetch_climatology", fetch_climatology)
+
+    response = client.get("/v1/glacier/G1/anomaly", params={"season": 2024})
+
+    result = assert_matches(response, GlacierAnomalyOut)
+    assert [point.climatology_count for point in result.points] == [0, 0]
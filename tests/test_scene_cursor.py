@@ -0,0 +1,37 @@
+import base64
+from datetime import datetime
+
+import pytest
+
+from src.controller.scene import decode_scene_cursor, encode_scene_cursor
+
+
+@pytest.mark.parametrize(
+    "acquisition_date",
+    [datetime(2024, 8, 2, 10, 20, 31), datetime(2024, 8, 2, 10, 20, 31, 24), None],
+)
+def test_cursor_round_trip(acquisition_date):
+    cursor = encode_scene_cursor(acquisition_date, "S2B_MSIL2A_20240802")
+
+    assert "=" not in cursor
+    assert decode_scene_cursor(cursor) == (acquisition_date, "S2B_MSIL2A_20240802")
+
+
+def _encoded(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor!",
+        _encoded(b"not json"),
+        _encoded(b'["2024-08-02T10:20:31"]'),
+        _encoded(b'["yesterday", "S2B"]'),
+        _encoded(b'["2024-08-02T10:20:31", 42]'),
+        _encoded(b'[1722594031, "S2B"]'),
+    ],
+)
+def test_invalid_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_scene_cursor(cursor)
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from src.utils.singleflight import SingleFlight
+
+
+@pytest.fixture
+def flight():
+    flight = SingleFlight("test")
+    yield flight
+    SingleFlight.groups.remove(flight)
+
+
+def test_concurrent_calls_share_one_computation(flight):
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"result {key}"
+
+    async def run():
+        return await asyncio.gather(
+            flight.do("a", lambda: compute("a")),
+            flight.do("a", lambda: compute("a")),
+            flight.do("b", lambda: compute("b")),
+        )
+
+    assert asyncio.run(run()) == ["result a", "result a", "result b"]
+    assert calls == ["a", "b"]
+    assert flight.stats() == {
+        "calls": 3,
+        "coalesced": 1,
+        "in_flight": 0,
+        "hit_rate": pytest.approx(1 / 3),
+    }
+
+
+def test_exceptions_are_shared(flight):
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database went away")
+
+    async def run():
+        return await asyncio.gather(
+            flight.do("a", fail), flight.do("a", fail), return_exceptions=True
+        )
+
+    first, second = asyncio.run(run())
+    assert isinstance(first, RuntimeError)
+    assert first is second
+
+
+def test_results_are_not_cached(flight):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def run():
+        return [await flight.do("a", compute), await flight.do("a", compute)]
+
+    assert asyncio.run(run()) == [1, 2]
+    assert flight.coalesced == 0
+
+
+def test_computation_outlives_a_cancelled_caller(flight):
+    async def compute():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flight.do("a", compute))
+        second = asyncio.create_task(flight.do("a", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
@@ -0,0 +1,150 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from src.controller.timeseries import (
+    Frequency,
+    Interpolation,
+    RegularizeOptions,
+    Smoothing,
+    fill_gaps,
+    regularize,
+    savgol_coefficients,
+    smooth,
+    to_grid,
+    to_nullable_lists,
+)
+
+nan = np.nan
+
+
+def test_to_grid_averages_observations_per_cell():
+    days = np.array(["2024-01-01", "2024-01-03", "2024-01-04"], dtype="datetime64[D]")
+    grid, matrix, counts = to_grid(
+        np.array([0, 0, 0]),
+        days,
+        np.array([1.0, 2.0, 4.0]),
+        1,
+        date(2024, 1, 1),
+        date(2024, 1, 7),
+        step_days=2,
+    )
+
+    assert grid.astype(str).tolist() == [
+        "2024-01-01",
+        "2024-01-03",
+        "2024-01-05",
+        "2024-01-07",
+    ]
+    np.testing.assert_array_equal(matrix, [[1.0, 3.0, nan, nan]])
+    np.testing.assert_array_equal(counts, [[1, 2, 0, 0]])
+
+
+def test_fill_gaps_linear_between_observations_only():
+    matrix = np.array([[nan, 1.0, nan, nan, 4.0, nan]])
+
+    filled = fill_gaps(matrix, Interpolation.linear)
+
+    np.testing.assert_allclose(filled, [[nan, 1.0, 2.0, 3.0, 4.0, nan]])
+
+
+def test_fill_gaps_nearest_prefers_the_earlier_observation_on_ties():
+    matrix = np.array([[1.0, nan, nan, nan, 5.0]])
+
+    filled = fill_gaps(matrix, Interpolation.nearest)
+
+    np.testing.assert_array_equal(filled, [[1.0, 1.0, 1.0, 5.0, 5.0]])
+
+
+def test_fill_gaps_leaves_long_gaps_empty():
+    matrix = np.array([[1.0, nan, 3.0, nan, nan, nan, 7.0]])
+
+    filled = fill_gaps(matrix, Interpolation.linear, max_gap_steps=2)
+
+    np.testing.assert_allclose(filled, [[1.0, 2.0, 3.0, nan, nan, nan, 7.0]])
+
+
+def test_fill_gaps_rows_are_independent():
+    matrix = np.array([[0.0, nan, 2.0], [nan, nan, 5.0]])
+
+    filled = fill_gaps(matrix, Interpolation.linear)
+
+    np.testing.assert_allclose(filled, [[0.0, 1.0, 2.0], [nan, nan, 5.0]])
+
+
+def test_fill_gaps_none_returns_the_matrix():
+    matrix = np.array([[1.0, nan, 3.0]])
+
+    assert fill_gaps(matrix, Interpolation.none) is matrix
+
+
+@pytest.mark.parametrize("window,polyorder", [(5, 2), (7, 3), (9, 2)])
+def test_savgol_coefficients_reproduce_polynomials(window, polyorder):
+    coefficients = savgol_coefficients(window, polyorder)
+    x = np.arange(window) - window // 2
+
+    assert coefficients.sum() == pytest.approx(1.0)
+    for order in range(polyorder + 1):
+        # the center value of a polynomial the filter can fit exactly
+        assert coefficients @ (x + 3.0) ** order == pytest.approx(3.0**order)
+
+
+def test_savgol_keeps_lines_and_the_values_next_to_gaps():
+    line = np.arange(8, dtype="float64")
+    matrix = np.array([line, [*line[:3], nan, *line[4:]]])
+
+    smoothed = smooth(matrix, Smoothing.savgol, window=5, polyorder=2)
+
+    np.testing.assert_allclose(smoothed[0], line)
+    np.testing.assert_allclose(smoothed[1], matrix[1])
+
+
+def test_savgol_smooths_a_spike():
+    matrix = np.array([[0.0, 0.0, 0.0, 10.0, 0.0, 0.0, 0.0]])
+
+    smoothed = smooth(matrix, Smoothing.savgol, window=5, polyorder=2)
+
+    assert smoothed[0, 3] == pytest.approx(10.0 * 17 / 35)
+    assert smoothed[0, 3] < 10.0
+
+
+def test_median_ignores_empty_cells_and_keeps_them_empty():
+    matrix = np.array([[1.0, 9.0, nan, 3.0, 4.0]])
+
+    smoothed = smooth(matrix, Smoothing.median, window=3)
+
+    np.testing.assert_allclose(smoothed, [[5.0, 5.0, nan, 3.5, 3.5]])
+
+
+def test_regularize_fills_and_smooths_each_series():
+    days = np.array(
+        ["2024-01-01", "2024-01-04", "2024-01-01", "2024-01-02"],
+        dtype="datetime64[D]",
+    )
+    options = RegularizeOptions(Frequency.daily, Interpolation.linear)
+
+    grid, matrix, counts = regularize(
+        np.array([0, 0, 1, 1]),
+        days,
+        np.array([0.0, 3.0, 5.0, 6.0]),
+        2,
+        date(2024, 1, 1),
+        date(2024, 1, 4),
+        options,
+    )
+
+    assert len(grid) == 4
+    assert to_nullable_lists(matrix) == [[0.0, 1.0, 2.0, 3.0], [5.0, 6.0, None, None]]
+    np.testing.assert_array_equal(counts, [[1, 0, 0, 1], [1, 1, 0, 0]])
+
+
+def test_options_reject_inconsistent_smoothing():
+    with pytest.raises(ValueError):
+        RegularizeOptions(
+            Frequency.daily, smoothing=Smoothing.median, window=4
+        ).validate()
+    with pytest.raises(ValueError):
+        RegularizeOptions(
+            Frequency.daily, smoothing=Smoothing.savgol, window=3, polyorder=3
+        ).validate()
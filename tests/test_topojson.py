@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import MultiPolygon, Polygon, box
+
+from src.utils.topojson import encode_topology
+
+
+def _decode_arcs(topology: dict) -> list[np.ndarray]:
+    scale = np.array(topology["transform"]["scale"])
+    translate = np.array(topology["transform"]["translate"])
+    return [
+        np.cumsum(np.array(arc), axis=0) * scale + translate for arc in topology["arcs"]
+    ]
+
+
+def _decode_ring(arcs: list[np.ndarray], indexes: list[int]) -> np.ndarray:
+    points = []
+    for index in indexes:
+        arc = arcs[index] if index >= 0 else arcs[~index][::-1]
+        # consecutive arcs share their end and start point
+        points.extend(arc if not points else arc[1:])
+    return np.array(points)
+
+
+def _decode(topology: dict, object_name: str = "features") -> list:
+    arcs = _decode_arcs(topology)
+    geometries = topology["objects"][object_name]["geometries"]
+    return [
+        MultiPolygon(
+            [
+                Polygon(
+                    _decode_ring(arcs, rings[0]),
+                    [_decode_ring(arcs, ring) for ring in rings[1:]],
+                )
+                for rings in geometry["arcs"]
+            ]
+        )
+        for geometry in geometries
+    ]
+
+
+def test_shared_border_is_stored_once():
+    left = box(10.0, 46.0, 10.5, 46.5)
+    right = box(10.5, 46.0, 11.0, 46.5)
+
+    topology = encode_topology(
+        [("G1", {"name": "left"}, left), ("G2", {"name": "right"}, right)], 2
+    )
+
+    # the shared edge and the rest of each square
+    assert len(topology["arcs"]) == 3
+    (left_rings,), (right_rings,) = (
+        geometry["arcs"] for geometry in topology["objects"]["features"]["geometries"]
+    )
+    shared = set(left_rings[0]) & {~index for index in right_rings[0]}
+    assert len(shared) == 1
+
+    for original, decoded in zip([left, right], _decode(topology)):
+        assert decoded.equals(original)
+
+
+def test_geometries_keep_ids_properties_and_holes():
+    shell = box(0.0, 0.0, 4.0, 4.0)
+    with_hole = Polygon(shell.exterior, [box(1.0, 1.0, 2.0, 2.0).exterior.coords])
+    other = box(6.0, 0.0, 7.0, 1.0)
+    geometry = MultiPolygon([with_hole, other])
+
+    topology = encode_topology([("G1", {"area_m2": 1.0}, geometry)], 3, "glaciers")
+
+    (encoded,) = topology["objects"]["glaciers"]["geometries"]
+    assert encoded["type"] == "MultiPolygon"
+    assert encoded["id"] == "G1"
+    assert encoded["properties"] == {"area_m2": 1.0}
+    assert [len(rings) for rings in encoded["arcs"]] == [2, 1]
+    assert _decode(topology, "glaciers")[0].equals(geometry)
+
+
+def test_arcs_are_quantized_and_delta_encoded():
+    square = box(10.0, 46.0, 10.02, 46.01)
+
+    topology = encode_topology([("G1", {}, square)], 2)
+
+    assert topology["bbox"] == pytest.approx([10.0, 46.0, 10.02, 46.01])
+    assert topology["transform"]["translate"] == pytest.approx([10.0, 46.0])
+    assert topology["transform"]["scale"] == pytest.approx([0.01, 0.01])
+    (arc,) = topology["arcs"]
+    assert all(isinstance(value, int) for point in arc for value in point)
+    # a closed ring sums back to its first point
+    assert np.sum(arc[1:], axis=0).tolist() == [0, 0]
+    assert shapely.area(_decode(topology)[0]) == pytest.approx(shapely.area(square))
+
+
+def test_rings_collapsing_at_the_precision_are_dropped():
+    tiny = box(10.0, 46.0, 10.001, 46.001)
+
+    topology = encode_topology([("G1", {}, tiny)], 2)
+
+    (encoded,) = topology["objects"]["features"]["geometries"]
+    assert encoded["type"] is None
+    assert encoded["arcs"] == []
+    assert topology["arcs"] == []